@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Benchmark suite for BalanceParser over a synthetic balance-document corpus
+
+Generates reproducible documents (see src/corpus_generator.py), times parsing,
+amount extraction and summary building, records tracemalloc peak memory, and
+writes a JSON report that can be compared against a previous run:
+
+    python bench_parser.py --sizes 100 1000 --output bench_report.json
+    python bench_parser.py --compare bench_report.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from datetime import datetime
+sys.path.insert(0, 'src')
+
+from src.parser import BalanceParser
+from src.corpus_generator import SHAPES, generate_corpus
+
+
+REPORT_SCHEMA = 1
+
+
+def measure(func, repeats):
+    """Return (best seconds, tracemalloc peak KB) for func"""
+    seconds = min(timeit.repeat(func, number=1, repeat=repeats))
+
+    # Traced separately: tracemalloc overhead would distort the timings
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': round(seconds, 6), 'peak_kb': round(peak / 1024, 1)}
+
+
+def bench_document(document, repeats):
+    """Run every benchmark case against one generated document"""
+    path = document['file']
+    results = {}
+
+    for engine, streaming in (('docx', False), ('streaming', True)):
+        results[f'parse[{engine}]'] = measure(lambda: BalanceParser(path, streaming=streaming).parse(), repeats)
+
+    results['parse_compact[streaming]'] = measure(
+        lambda: BalanceParser(path, streaming=True).parse_compact(), repeats
+    )
+
+    # Extraction alone, over text already pulled from the document
+    parser = BalanceParser(path, streaming=True)
+    segments = list(parser._iter_text())
+
+    def extract():
+        for line_ref, text in segments:
+            parser._extract_numbers(text, line_ref)
+
+    results['extract_numbers'] = measure(extract, repeats)
+
+    parser = BalanceParser(path, streaming=True)
+    balances = parser.parse()
+    results['get_summary'] = measure(parser.get_summary, repeats)
+
+    seconds = results['parse[streaming]']['seconds']
+    return {
+        'shape': document['shape'],
+        'size': document['size'],
+        'file_bytes': document['file_bytes'],
+        'segments': len(segments),
+        'balances': len(balances),
+        'balances_per_second': round(len(balances) / seconds) if seconds else None,
+        'cases': results
+    }
+
+
+def compare(report, baseline):
+    """Print per-case time and memory ratios against a baseline report"""
+    previous = {(r['shape'], r['size']): r for r in baseline.get('results', [])}
+    print(f"\nComparison with baseline from {baseline.get('generated_at', 'unknown')}")
+    print(f"{'document':<24} {'case':<26} {'time':>8} {'peak':>8}")
+
+    for result in report['results']:
+        old = previous.get((result['shape'], result['size']))
+        if not old:
+            continue
+        for case, current in result['cases'].items():
+            before = old['cases'].get(case)
+            if not before or not before['seconds'] or not before['peak_kb']:
+                continue
+            print(f"{result['shape'] + ':' + str(result['size']):<24} {case:<26} "
+                  f"{current['seconds'] / before['seconds']:>7.2f}x "
+                  f"{current['peak_kb'] / before['peak_kb']:>7.2f}x")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='BalanceParser benchmark suite')
+    arg_parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES),
+                            help='Document shapes to generate')
+    arg_parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000],
+                            help='Paragraphs or table rows per document')
+    arg_parser.add_argument('--seed', type=int, default=0, help='Corpus random seed')
+    arg_parser.add_argument('--repeats', type=int, default=3, help='Timing repeats (best is kept)')
+    arg_parser.add_argument('--corpus-dir', help='Keep generated documents in this directory')
+    arg_parser.add_argument('--output', default='bench_report.json', help='JSON report path')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON report to compare against')
+    args = arg_parser.parse_args()
+
+    print('BalanceParser Benchmark Suite')
+    print('=' * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir or tmp_dir
+        documents = generate_corpus(corpus_dir, args.shapes, args.sizes, args.seed)
+        print(f'✓ Generated {len(documents)} documents (seed {args.seed})')
+
+        results = []
+        for document in documents:
+            result = bench_document(document, args.repeats)
+            results.append(result)
+            parse = result['cases']['parse[streaming]']
+            print(f"  {document['shape']:<14} {document['size']:>6}  {result['balances']:>7} balances  "
+                  f"{parse['seconds'] * 1000:8.1f} ms  {parse['peak_kb']:9.1f} KB peak")
+
+    report = {
+        'schema': REPORT_SCHEMA,
+        'generated_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform()
+        },
+        'config': {
+            'shapes': args.shapes,
+            'sizes': args.sizes,
+            'seed': args.seed,
+            'repeats': args.repeats
+        },
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'\n✓ Report written to {os.path.abspath(args.output)}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(report, json.load(f))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
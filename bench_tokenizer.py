@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the amount tokenizer used by BalanceParser._extract_numbers"""
+
+import sys
+import re
+import random
+import timeit
+from decimal import Decimal
+sys.path.insert(0, 'src')
+
+from src.parser import BalanceParser
+
+
+def legacy_extract_numbers(text, line_ref):
+    """Reference copy of the original regex/Decimal implementation"""
+    results = []
+    pattern = r'([$€£¥₹]?\s*\d{1,3}(?:[,.\s]\d{3})*(?:[.,]\d{2})?)'
+
+    for match in re.finditer(pattern, text):
+        raw_value = match.group(1)
+
+        currency_match = re.match(r'^([$€£¥₹])', raw_value)
+        currency_symbol = currency_match.group(1) if currency_match else None
+
+        num_str = re.sub(r'[$€£¥₹\s]', '', raw_value)
+
+        if ',' in num_str and '.' in num_str:
+            if num_str.rindex(',') > num_str.rindex('.'):
+                num_str = num_str.replace('.', '').replace(',', '.')
+            else:
+                num_str = num_str.replace(',', '')
+        elif ',' in num_str:
+            parts = num_str.split(',')
+            if len(parts) == 2 and len(parts[1]) == 2:
+                num_str = num_str.replace(',', '.')
+            else:
+                num_str = num_str.replace(',', '')
+
+        try:
+            value = Decimal(num_str)
+            if value >= Decimal('0.01') and value <= Decimal('999999999999'):
+                results.append({
+                    'value': float(value),
+                    'value_decimal': str(value),
+                    'currency_symbol': currency_symbol,
+                    'original_text': match.group(0),
+                    'context': text,
+                    'line_ref': line_ref
+                })
+        except (ValueError, Exception):
+            continue
+
+    return results
+
+
+def build_paragraphs(count, seed=42):
+    """Generate paragraph-heavy statement text with mixed number formats"""
+    rng = random.Random(seed)
+    labels = ['Checking', 'Savings', 'Brokerage', 'Escrow', 'Payroll', 'Card']
+    formats = [
+        lambda v: f"${v:,.2f}",
+        lambda v: f"€{v:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', '.'),
+        lambda v: f"{v:.2f}",
+        lambda v: f"£ {v:,.2f}",
+        lambda v: f"{int(v)}",
+        lambda v: f"¥{int(v):,}",
+    ]
+
+    paragraphs = []
+    for idx in range(count):
+        amounts = ', '.join(
+            rng.choice(formats)(rng.uniform(0.5, 2_000_000))
+            for _ in range(rng.randint(1, 4))
+        )
+        paragraphs.append(
+            f"{rng.choice(labels)} account ref {rng.randint(100, 999)} on 2024-11-{idx % 28 + 1:02d}: {amounts}"
+        )
+    return paragraphs
+
+
+def main():
+    print('Tokenizer Micro-Benchmark')
+    print('=' * 60)
+
+    paragraphs = build_paragraphs(5000)
+    parser = BalanceParser.__new__(BalanceParser)
+
+    # Both implementations must agree before timings mean anything
+    for idx, text in enumerate(paragraphs, 1):
+        if parser._extract_numbers(text, idx) != legacy_extract_numbers(text, idx):
+            print(f'✗ Output mismatch on paragraph {idx}: {text!r}')
+            return 1
+    print(f'✓ Identical output on {len(paragraphs)} paragraphs')
+
+    def run_legacy():
+        for idx, text in enumerate(paragraphs, 1):
+            legacy_extract_numbers(text, idx)
+
+    def run_tokenizer():
+        for idx, text in enumerate(paragraphs, 1):
+            parser._extract_numbers(text, idx)
+
+    repeats = 5
+    legacy_time = min(timeit.repeat(run_legacy, number=1, repeat=repeats))
+    tokenizer_time = min(timeit.repeat(run_tokenizer, number=1, repeat=repeats))
+
+    print(f'\nLegacy regex/Decimal: {legacy_time * 1000:8.1f} ms')
+    print(f'Single-pass tokenizer: {tokenizer_time * 1000:7.1f} ms')
+    print(f'Speedup: {legacy_time / tokenizer_time:.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
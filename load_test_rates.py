@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Offline load test for RateService against the local stub price server
+
+Each scenario starts a stub price API (see src/stub_price_server.py) with its
+own latency, error and partial-response settings, points a fresh RateService
+at it, and calls get_rates() from many threads. The report shows per-call
+latency percentiles, throughput, how many calls reached upstream, how many
+were coalesced, and where the served rates came from:
+
+    python load_test_rates.py --threads 32 --duration 5
+    python load_test_rates.py --scenarios outage --output outage.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+sys.path.insert(0, 'src')
+
+from src.rate_service import RateService
+from src.http_session import PooledSession
+from src.stub_price_server import DEFAULT_PRICES, StubPriceServer
+
+
+REPORT_SCHEMA = 1
+
+# stub: StubPriceServer settings; service: RateService settings; refresher: run the daemon refresher
+SCENARIOS = {
+    'warm': {
+        'description': 'Long TTL with the background refresher: every call should hit the cache',
+        'stub': {'latency': 0.05},
+        'service': {'cache_ttl_minutes': 5},
+        'refresher': True
+    },
+    'expiring': {
+        'description': 'One-second TTL and no stale serving: blocking misses coalesce into one fetch',
+        'stub': {'latency': 0.2, 'volatility': 0.001},
+        'service': {'cache_ttl_minutes': 1 / 60, 'refresh_ahead_seconds': 0, 'max_staleness_minutes': 0},
+        'refresher': False
+    },
+    'stale-while-revalidate': {
+        'description': 'One-second TTL served stale while a background refresh runs',
+        'stub': {'latency': 0.2, 'volatility': 0.001},
+        'service': {'cache_ttl_minutes': 1 / 60, 'refresh_ahead_seconds': 0.2, 'max_staleness_minutes': 1},
+        'refresher': False
+    },
+    'flaky': {
+        'description': '30% errors and 20% partial responses with jittered latency',
+        'stub': {'latency': 0.05, 'jitter': 0.15, 'error_rate': 0.3, 'partial_rate': 0.2, 'volatility': 0.001},
+        'service': {'cache_ttl_minutes': 1 / 60, 'refresh_ahead_seconds': 0.2, 'max_staleness_minutes': 0},
+        'refresher': False
+    },
+    'outage': {
+        'description': 'Every upstream request fails slowly: circuit opens, calls use the fallback',
+        'stub': {'latency': 0.5, 'error_rate': 1.0},
+        'service': {'cache_ttl_minutes': 1 / 60, 'breaker_failures': 2, 'breaker_reset_seconds': 2},
+        'refresher': False
+    },
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(name, threads, duration, providers, seed, work_dir):
+    """Drive get_rates() from many threads against one stub configuration"""
+    config = SCENARIOS[name]
+    stub = StubPriceServer(seed=seed, **config['stub']).start()
+
+    # Seed a last-known-good fallback, as a deployed instance would have
+    fallback_file = os.path.join(work_dir, name, 'fallback_rates.json')
+    os.makedirs(os.path.dirname(fallback_file))
+    with open(fallback_file, 'w') as f:
+        json.dump({'timestamp': datetime.now().isoformat(),
+                   'rates': {code: str(price) for code, price in DEFAULT_PRICES.items()}}, f)
+
+    service = RateService(
+        fallback_file=fallback_file,
+        http=PooledSession(connect_timeout=1, read_timeout=2, max_retries=1, backoff_base=0.05),
+        providers=stub.make_providers(providers),
+        hedge_delay_seconds=0.25,
+        **config['service']
+    )
+    if config['refresher']:
+        service.start_refresher()
+        time.sleep(0.5)  # let the first fetch land
+
+    latencies = [[] for _ in range(threads)]
+    sources = [Counter() for _ in range(threads)]
+    stop_at = time.perf_counter() + duration
+    barrier = threading.Barrier(threads)
+
+    def client(index):
+        barrier.wait()
+        timings = latencies[index]
+        seen = sources[index]
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            snapshot = service.get_snapshot()
+            timings.append(time.perf_counter() - start)
+            seen[snapshot.source] += 1
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    service.stop_refresher()
+    stub.stop()
+
+    timings = sorted(t for per_thread in latencies for t in per_thread)
+    served_by = sum(sources, Counter())
+    stats = service.get_stats()
+    return {
+        'scenario': name,
+        'description': config['description'],
+        'calls': len(timings),
+        'calls_per_second': round(len(timings) / duration),
+        'latency_ms': {
+            'p50': round(percentile(timings, 0.50) * 1000, 3),
+            'p95': round(percentile(timings, 0.95) * 1000, 3),
+            'p99': round(percentile(timings, 0.99) * 1000, 3),
+            'max': round(timings[-1] * 1000, 3)
+        },
+        'served_by': dict(served_by),
+        'upstream': stub.get_stats(),
+        'upstream_fetches': stats['upstream_fetches'],
+        'coalesced_fetches': stats['coalesced_fetches'],
+        'http': stats['http'],
+        'circuits': {name: p['circuit']['state'] for name, p in stats['providers']['providers'].items()}
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='RateService load test against a local stub price API')
+    arg_parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                            help='Scenarios to run')
+    arg_parser.add_argument('--threads', type=int, default=32, help='Concurrent get_rates() callers')
+    arg_parser.add_argument('--duration', type=float, default=5, help='Seconds per scenario')
+    arg_parser.add_argument('--providers', nargs='+', default=['coingecko'],
+                            choices=['coingecko', 'coinbase', 'cryptocompare'],
+                            help='Stubbed providers in order of preference')
+    arg_parser.add_argument('--seed', type=int, default=0, help='Stub random seed')
+    arg_parser.add_argument('--output', default='rate_load_report.json', help='JSON report path')
+    args = arg_parser.parse_args()
+
+    print('RateService Load Test')
+    print('=' * 60)
+    print(f'{args.threads} threads, {args.duration:g}s per scenario, providers: {", ".join(args.providers)}\n')
+    print(f"{'scenario':<24} {'calls/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'upstream':>9} {'coalesced':>10}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.scenarios:
+            result = run_scenario(name, args.threads, args.duration, args.providers, args.seed, work_dir)
+            results.append(result)
+            latency = result['latency_ms']
+            print(f"{name:<24} {result['calls_per_second']:>9} {latency['p50']:>8.3f} {latency['p99']:>8.3f} "
+                  f"{latency['max']:>8.1f} {result['upstream']['hits']:>9} {result['coalesced_fetches']:>10}  "
+                  f"{dict(result['served_by'])}")
+
+    report = {
+        'schema': REPORT_SCHEMA,
+        'generated_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform()
+        },
+        'config': {
+            'scenarios': args.scenarios,
+            'threads': args.threads,
+            'duration': args.duration,
+            'providers': args.providers,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'\n✓ Report written to {os.path.abspath(args.output)}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,10 +6,13 @@ Complete cryptocurrency conversion with wallet integration
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from concurrent.futures import ThreadPoolExecutor
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 from converter import crypto_converter
+from parse_cache import parse_cache
+from rate_service import rate_service
 import logging
 
 # Load environment variables
@@ -21,8 +24,14 @@ CORS(app)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'docx', 'dox'}
+ALLOWED_EXTENSIONS = {'docx', 'dox', 'csv', 'xlsx'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads are parsed in memory; set UPLOAD_AUDIT=true to also keep a copy on disk
+UPLOAD_AUDIT = os.getenv('UPLOAD_AUDIT', 'false').lower() == 'true'
+# Refresh exchange rates ahead of expiry so requests never wait on the API
+RATE_BACKGROUND_REFRESH = os.getenv('RATE_BACKGROUND_REFRESH', 'true').lower() == 'true'
+# Largest number of rows accepted by /api/convert-batch
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '10000'))
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
@@ -43,11 +52,56 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs('logs', exist_ok=True)
 
 
+# Single background writer so audit copies never block a request
+audit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-audit')
+
+if RATE_BACKGROUND_REFRESH:
+    rate_service.start_refresher()
+
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def read_upload(file):
+    """
+    Read an uploaded file into memory and queue the optional audit copy
+    
+    Returns:
+        Tuple of (unique timestamped filename, file bytes)
+    """
+    filename = secure_filename(file.filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    unique_filename = f"{timestamp}_{filename}"
+    file_data = file.read()
+    
+    if UPLOAD_AUDIT:
+        audit_executor.submit(save_upload_copy, unique_filename, file_data)
+    
+    return unique_filename, file_data
+
+
+def parse_time_param(value):
+    """Parse an ISO 8601 or epoch-seconds query parameter into epoch seconds"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def save_upload_copy(unique_filename, file_data):
+    """Write an audit copy of an upload to the upload folder"""
+    try:
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        with open(filepath, 'wb') as f:
+            f.write(file_data)
+    except Exception as e:
+        logger.error(f"Failed to save audit copy of {unique_filename}: {str(e)}")
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -82,7 +136,7 @@ def api_documentation():
                 'description': 'Convert cryptocurrency balances with wallet integration',
                 'content_type': 'multipart/form-data',
                 'parameters': {
-                    'file': 'Balance file (.docx or .dox) - Required',
+                    'file': 'Balance file (.docx, .dox, .csv or .xlsx) - Required',
                     'target_currency': 'Target currency (optional, default: USD)'
                 },
                 'response': {
@@ -96,7 +150,7 @@ def api_documentation():
                 'description': 'Get complete portfolio summary with wallet validation',
                 'content_type': 'multipart/form-data',
                 'parameters': {
-                    'file': 'Balance file (.docx or .dox) - Required'
+                    'file': 'Balance file (.docx, .dox, .csv or .xlsx) - Required'
                 },
                 'response': {
                     'portfolio_summary': 'Complete portfolio analysis',
@@ -109,8 +163,8 @@ def api_documentation():
                 'content_type': 'application/json',
                 'parameters': {
                     'amount': 'Amount to convert (number) - Required',
-                    'from_currency': 'Source currency (string) - Required',
-                    'to_currency': 'Target currency (string, optional, default: USD)'
+                    'from_currency': 'Source currency: USD or any priced crypto (string) - Required',
+                    'to_currency': 'Target currency: USD or any priced crypto (string, optional, default: USD)'
                 },
                 'response': {
                     'converted_amount': 'Converted value',
@@ -118,26 +172,79 @@ def api_documentation():
                     'timestamp': 'Conversion timestamp'
                 }
             },
+            '/api/convert-batch': {
+                'method': 'POST',
+                'description': 'Convert many amounts against one rate snapshot, with columnar results',
+                'content_type': 'application/json',
+                'parameters': {
+                    'amounts': 'Amounts to convert (array of numbers) - Required',
+                    'to_currencies': 'Target currency per amount, or one code for all (array or string) - Required',
+                    'from_currencies': 'Source currency per amount, or one code for all (default: USD)'
+                },
+                'response': {
+                    'columns': 'amount, from_currency, to_currency, converted_amount and rate arrays, row-aligned',
+                    'unpriced': 'Row indices whose currencies have no rate',
+                    'rate_snapshot_id': 'Snapshot every row was converted with'
+                }
+            },
+            '/api/parse-cache': {
+                'method': 'GET',
+                'description': 'Parse cache hit/miss counters for repeated uploads',
+                'response': {
+                    'parse_cache': 'Hits, misses, disk hits and entry count'
+                }
+            },
+            '/api/rate-cache': {
+                'method': 'GET',
+                'description': 'Exchange rate cache age and upstream fetch counters',
+                'response': {
+                    'rate_cache': 'Cache age, upstream fetches and coalesced fetches'
+                }
+            },
+            '/api/rate-snapshots/<snapshot_id>': {
+                'method': 'GET',
+                'description': 'Rates of a published snapshot, as referenced by rate_snapshot_id in conversions',
+                'response': {
+                    'snapshot': 'id, version, timestamp, source and rates'
+                }
+            },
+            '/api/rate-history': {
+                'method': 'GET',
+                'description': 'Fetched rates over time, or the rates in effect at a point in time',
+                'parameters': {
+                    'at': 'Point in time (ISO 8601 or epoch seconds); returns the single record in effect',
+                    'start': 'Range start (ISO 8601 or epoch seconds, optional)',
+                    'end': 'Range end (ISO 8601 or epoch seconds, optional)',
+                    'currency': 'Comma-separated currency codes (optional)',
+                    'limit': 'Maximum records, most recent first kept (default: 1000)'
+                },
+                'response': {
+                    'record': 'fetched_at and rates (with at)',
+                    'records': 'List of fetched_at and rates (with start/end)'
+                }
+            },
             '/api/send-to-wallet': {
                 'method': 'POST',
                 'description': 'Convert balances and send to client wallet',
                 'content_type': 'multipart/form-data',
                 'parameters': {
-                    'file': 'Balance file (.docx or .dox) - Required',
+                    'file': 'Balance file (.docx, .dox, .csv or .xlsx) - Required',
                     'wallet_id': 'Wallet ID (optional, defaults to client address)'
                 },
                 'response': {
                     'conversions': 'Converted amounts',
                     'wallet_transactions': 'Transaction records',
-                    'sent_to_wallet': 'Boolean confirmation'
+                    'sent_to_wallet': 'True when every transfer succeeded',
+                    'conversion_id': 'Saved conversion; retry failed transfers with /api/send-saved'
                 }
             }
         },
-        'supported_formats': ['.docx', '.dox'],
+        'supported_formats': ['.docx', '.dox', '.csv', '.xlsx'],
         'max_file_size': '10MB',
         'examples': {
             'curl_convert': 'curl -X POST -F "file=@balances.docx" http://localhost:5001/api/convert',
-            'curl_single': 'curl -X POST -H "Content-Type: application/json" -d \'{"amount": 1.5, "from_currency": "BTC", "to_currency": "USD"}\' http://localhost:5001/api/convert-single'
+            'curl_single': 'curl -X POST -H "Content-Type: application/json" -d \'{"amount": 1.5, "from_currency": "BTC", "to_currency": "USD"}\' http://localhost:5001/api/convert-single',
+            'curl_batch': 'curl -X POST -H "Content-Type: application/json" -d \'{"amounts": [100, 250.5], "to_currencies": ["BTC", "ETH"]}\' http://localhost:5001/api/convert-batch'
         }
     }
     return jsonify(docs), 200
@@ -185,7 +292,7 @@ def api_docs_html():
                 <div class="description">Convert cryptocurrency balances with wallet integration</div>
                 <div class="params">
                     <strong>Parameters:</strong><br>
-                    • file: Balance file (.docx or .dox) - Required<br>
+                    • file: Balance file (.docx, .dox, .csv or .xlsx) - Required<br>
                     • target_currency: Target currency (optional, default: USD)
                 </div>
                 <div class="example">curl -X POST -F "file=@balances.docx" http://localhost:5001/api/convert</div>
@@ -196,7 +303,7 @@ def api_docs_html():
                 <div class="description">Get complete portfolio summary with wallet validation</div>
                 <div class="params">
                     <strong>Parameters:</strong><br>
-                    • file: Balance file (.docx or .dox) - Required
+                    • file: Balance file (.docx, .dox, .csv or .xlsx) - Required
                 </div>
                 <div class="example">curl -X POST -F "file=@balances.docx" http://localhost:5001/api/portfolio</div>
             </div>
@@ -213,12 +320,24 @@ def api_docs_html():
                 <div class="example">curl -X POST -H "Content-Type: application/json" -d '{{"amount": 1.5, "from_currency": "BTC", "to_currency": "USD"}}' http://localhost:5001/api/convert-single</div>
             </div>
             
+            <div class="endpoint">
+                <span class="method">POST</span><span class="path">/api/convert-batch</span>
+                <div class="description">Convert many amounts against one rate snapshot, with columnar results</div>
+                <div class="params">
+                    <strong>JSON Parameters:</strong><br>
+                    • amounts: Amounts to convert (array) - Required<br>
+                    • to_currencies: Target currency per amount, or one for all - Required<br>
+                    • from_currencies: Source currency per amount, or one for all (optional, default: USD)
+                </div>
+                <div class="example">curl -X POST -H "Content-Type: application/json" -d '{{"amounts": [100, 250.5], "to_currencies": ["BTC", "ETH"]}}' http://localhost:5001/api/convert-batch</div>
+            </div>
+            
             <div class="endpoint">
                 <span class="method">POST</span><span class="path">/api/send-to-wallet</span>
                 <div class="description">Convert balances and send to client wallet</div>
                 <div class="params">
                     <strong>Parameters:</strong><br>
-                    • file: Balance file (.docx or .dox) - Required<br>
+                    • file: Balance file (.docx, .dox, .csv or .xlsx) - Required<br>
                     • wallet_id: Wallet ID (optional, defaults to client address)
                 </div>
                 <div class="example">curl -X POST -F "file=@balances.docx" http://localhost:5001/api/send-to-wallet</div>
@@ -232,7 +351,7 @@ def api_docs_html():
             
             <h2>📝 File Requirements</h2>
             <ul>
-                <li>Supported formats: .docx, .dox</li>
+                <li>Supported formats: .docx, .dox, .csv, .xlsx</li>
                 <li>Maximum file size: 10MB</li>
                 <li>Files should contain cryptocurrency balance information</li>
             </ul>
@@ -255,7 +374,7 @@ def convert_balances():
     Convert cryptocurrency balances with wallet integration
     
     Request:
-        - file: Balance file (.docx or .dox)
+        - file: Balance file (.docx, .dox, .csv or .xlsx)
         - target_currency: Target currency (optional, default: USD)
     
     Response:
@@ -272,20 +391,15 @@ def convert_balances():
         if file.filename == '' or not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file'}), 400
         
-        # Save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        file.save(filepath)
+        # Read file into memory
+        unique_filename, file_data = read_upload(file)
         logger.info(f"File uploaded: {unique_filename}")
         
         # Get target currency from request
         target_currency = request.form.get('target_currency', 'USD')
         
         # Convert balances
-        result = crypto_converter.convert_balances(filepath, target_currency)
+        result = crypto_converter.convert_balances(unique_filename, target_currency, file_data=file_data)
         
         if 'error' in result:
             return jsonify(result), 400
@@ -311,16 +425,11 @@ def get_portfolio_summary():
         if file.filename == '' or not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file'}), 400
         
-        # Save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        file.save(filepath)
+        # Read file into memory
+        unique_filename, file_data = read_upload(file)
         
         # Get portfolio summary
-        result = crypto_converter.get_portfolio_summary(filepath)
+        result = crypto_converter.get_portfolio_summary(unique_filename, file_data=file_data)
         
         if 'error' in result:
             return jsonify(result), 400
@@ -366,19 +475,62 @@ def convert_single_amount():
         return jsonify({'error': f'Conversion failed: {str(e)}'}), 500
 
 
+@app.route('/api/convert-batch', methods=['POST'])
+def convert_batch():
+    """
+    Convert many amounts against one rate snapshot
+    
+    Request JSON:
+        - amounts: Amounts to convert
+        - to_currencies: Target currency per amount, or one code for all
+        - from_currencies: Source currency per amount, or one code for all (optional, default: USD)
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'amounts' not in data or 'to_currencies' not in data:
+            return jsonify({'error': 'Missing required fields: amounts, to_currencies'}), 400
+        
+        amounts = data['amounts']
+        if not isinstance(amounts, list):
+            amounts = [amounts]
+        rows = max(len(column) if isinstance(column, list) else 1
+                   for column in (amounts, data['to_currencies'], data.get('from_currencies', 'USD')))
+        if rows > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large: {rows} rows (maximum {MAX_BATCH_SIZE})'}), 400
+        
+        result = crypto_converter.convert_many(
+            [float(amount) for amount in amounts],
+            data['to_currencies'],
+            data.get('from_currencies', 'USD')
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 400
+        
+        return jsonify(result), 200
+    
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid amount value'}), 400
+    except Exception as e:
+        logger.error(f"Batch conversion error: {str(e)}")
+        return jsonify({'error': f'Conversion failed: {str(e)}'}), 500
+
+
 @app.route('/api/send-to-wallet', methods=['POST'])
 def send_to_wallet():
     """
     Convert balances and send to client wallet
     
     Request:
-        - file: Balance file (.docx or .dox)
+        - file: Balance file (.docx, .dox, .csv or .xlsx)
         - wallet_id: Wallet ID (optional, defaults to client address)
     
     Response:
         - conversions: Converted amounts
         - wallet_transactions: Transaction records
-        - sent_to_wallet: Boolean confirmation
+        - sent_to_wallet: True when every transfer succeeded
+        - conversion_id: Saved conversion; retry failed transfers with /api/send-saved
     """
     try:
         if 'file' not in request.files:
@@ -389,20 +541,15 @@ def send_to_wallet():
         if file.filename == '' or not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file'}), 400
         
-        # Save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        file.save(filepath)
+        # Read file into memory
+        unique_filename, file_data = read_upload(file)
         logger.info(f"File uploaded for wallet sending: {unique_filename}")
         
         # Get wallet ID from request
         wallet_id = request.form.get('wallet_id')
         
         # Convert and send to wallet
-        result = crypto_converter.send_converted_amounts_to_wallet(filepath, wallet_id)
+        result = crypto_converter.send_converted_amounts_to_wallet(unique_filename, wallet_id, file_data=file_data)
         
         if 'error' in result:
             return jsonify(result), 400
@@ -469,6 +616,97 @@ def send_saved_conversion():
         return jsonify({'error': f'Send failed: {str(e)}'}), 500
 
 
+@app.route('/api/parse-cache', methods=['GET'])
+def get_parse_cache_stats():
+    """
+    Get parse cache hit/miss counters
+    
+    Response:
+        - hits, misses, disk_hits: Lookup counters since startup
+        - entries: Number of parse results held in memory
+    """
+    return jsonify({
+        'success': True,
+        'parse_cache': parse_cache.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@app.route('/api/rate-cache', methods=['GET'])
+def get_rate_cache_stats():
+    """
+    Get exchange rate cache counters
+    
+    Response:
+        - upstream_fetches: Fetches sent to the rate provider
+        - coalesced_fetches: Callers served by a fetch already in flight
+    """
+    return jsonify({
+        'success': True,
+        'rate_cache': rate_service.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@app.route('/api/rate-snapshots/<snapshot_id>', methods=['GET'])
+def get_rate_snapshot(snapshot_id):
+    """
+    Get a published rate snapshot by ID
+    
+    Response:
+        - snapshot: id, version, timestamp, source and rates (as strings)
+    """
+    snapshot = rate_service.get_snapshot_by_id(snapshot_id)
+    if snapshot is None:
+        return jsonify({'error': f'Rate snapshot {snapshot_id} not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'snapshot': snapshot.to_dict(),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@app.route('/api/rate-history', methods=['GET'])
+def get_rate_history():
+    """
+    Get historical rates
+    
+    Query Parameters:
+        - at: Return the rates in effect at this time
+        - start, end: Otherwise return records in this range
+        - currency: Comma-separated currency codes to include
+        - limit: Maximum number of records (default: 1000)
+    """
+    history = rate_service.history
+    if history is None:
+        return jsonify({'error': 'Rate history is disabled'}), 404
+    
+    try:
+        at = parse_time_param(request.args.get('at'))
+        start = parse_time_param(request.args.get('start'))
+        end = parse_time_param(request.args.get('end'))
+        limit = int(request.args.get('limit', 1000))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time or limit: {str(e)}'}), 400
+    
+    currency = request.args.get('currency')
+    currencies = currency.split(',') if currency else None
+    
+    if at is not None:
+        record = history.at(at, currencies)
+        if record is None:
+            return jsonify({'error': 'No rates recorded at or before that time'}), 404
+        return jsonify({'success': True, 'record': record}), 200
+    
+    records = history.range(start, end, currencies, limit)
+    return jsonify({
+        'success': True,
+        'count': len(records),
+        'records': records
+    }), 200
+
+
 @app.errorhandler(413)
 def file_too_large(e):
     """Handle file size exceeded error"""
@@ -0,0 +1,152 @@
+"""
+Compact Balance Storage for Lynx Crypto Converter
+Array-backed balances that materialize to the legacy dict format on demand
+"""
+
+from array import array
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+from fixed_point import rescale
+from tokenizer import CURRENCY_SYMBOLS
+
+
+# Symbol code 0 means no symbol; 1..n index into CURRENCY_SYMBOLS
+SYMBOL_CODES = {symbol: code for code, symbol in enumerate(CURRENCY_SYMBOLS, 1)}
+
+
+class BalanceSet:
+    """
+    Parsed balances stored as parallel arrays
+
+    Each balance is a scaled integer (value = units / 10**scale, so amounts
+    keep their exact decimal digits), a symbol code and start/end offsets
+    into the text of the segment (paragraph or cell) it was found in.
+    Segment texts are interned and shared by every balance they contain.
+    """
+
+    __slots__ = ('_segments', '_texts', '_segment_idx', '_units', '_scales',
+                 '_symbols', '_starts', '_ends')
+
+    def __init__(self):
+        self._segments: List[tuple] = []  # (line_ref, text)
+        self._texts: Dict[str, str] = {}
+        self._segment_idx = array('I')
+        self._units = array('q')
+        self._scales = array('B')
+        self._symbols = array('B')
+        self._starts = array('I')
+        self._ends = array('I')
+
+    def add_segment(self, line_ref, text: str) -> int:
+        """Register a text segment and return its index"""
+        text = self._texts.setdefault(text, text)
+        self._segments.append((line_ref, text))
+        return len(self._segments) - 1
+
+    def add(self, segment: int, value_str: str, symbol: Optional[str], start: int, end: int) -> None:
+        """
+        Append a balance found in a segment
+
+        Args:
+            segment: Index returned by add_segment
+            value_str: Canonical decimal string of the amount
+            symbol: Currency symbol or None
+            start, end: Offsets of the matched text within the segment
+        """
+        integer, _, fraction = value_str.partition('.')
+        self._segment_idx.append(segment)
+        self._units.append(int(integer + fraction))
+        self._scales.append(len(fraction))
+        self._symbols.append(SYMBOL_CODES.get(symbol, 0))
+        self._starts.append(start)
+        self._ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for idx in range(len(self._units)):
+            yield self[idx]
+
+    def __getitem__(self, idx: int) -> Dict:
+        """Materialize one balance in the legacy dict format"""
+        line_ref, text = self._segments[self._segment_idx[idx]]
+        value_str = self.value_str(idx)
+        symbol_code = self._symbols[idx]
+
+        return {
+            'value': float(value_str),
+            'value_decimal': value_str,
+            'currency_symbol': CURRENCY_SYMBOLS[symbol_code - 1] if symbol_code else None,
+            'original_text': text[self._starts[idx]:self._ends[idx]],
+            'context': text,
+            'line_ref': line_ref
+        }
+
+    def value_str(self, idx: int) -> str:
+        """Canonical decimal string of a balance without building a dict"""
+        units = self._units[idx]
+        scale = self._scales[idx]
+        if not scale:
+            return str(units)
+
+        digits = str(units).rjust(scale + 1, '0')
+        return f"{digits[:-scale]}.{digits[-scale:]}"
+
+    def float_values(self) -> Iterator[float]:
+        """Balance values as floats, in document order"""
+        for units, scale in zip(self._units, self._scales):
+            yield units / 10 ** scale
+
+    def decimal_values(self) -> Iterator[Decimal]:
+        """Balance values as exact Decimals, in document order"""
+        for units, scale in zip(self._units, self._scales):
+            yield Decimal(units).scaleb(-scale)
+
+    def total_units(self, scale: int = 2) -> int:
+        """
+        Exact sum of all balances as an integer count of 10**-scale
+
+        Amounts are summed at their own precision and the total is rounded
+        down once, e.g. scale=2 gives the total in cents.
+        """
+        by_scale: Dict[int, int] = {}
+        for units, balance_scale in zip(self._units, self._scales):
+            by_scale[balance_scale] = by_scale.get(balance_scale, 0) + units
+
+        if not by_scale:
+            return 0
+        finest = max(by_scale)
+        total = sum(units * 10 ** (finest - s) for s, units in by_scale.items())
+        return rescale(total, finest, scale)
+
+    def to_list(self) -> List[Dict]:
+        """Materialize every balance in the legacy dict format for JSON output"""
+        return list(self)
+
+    def to_dict(self) -> Dict:
+        """Compact JSON-serializable form used for on-disk storage"""
+        return {
+            'segments': [list(segment) for segment in self._segments],
+            'segment_idx': self._segment_idx.tolist(),
+            'units': self._units.tolist(),
+            'scales': self._scales.tolist(),
+            'symbols': self._symbols.tolist(),
+            'starts': self._starts.tolist(),
+            'ends': self._ends.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BalanceSet':
+        """Rebuild a BalanceSet from to_dict() output"""
+        balance_set = cls()
+        for line_ref, text in data['segments']:
+            balance_set.add_segment(line_ref, text)
+
+        balance_set._segment_idx.extend(data['segment_idx'])
+        balance_set._units.extend(data['units'])
+        balance_set._scales.extend(data['scales'])
+        balance_set._symbols.extend(data['symbols'])
+        balance_set._starts.extend(data['starts'])
+        balance_set._ends.extend(data['ends'])
+        return balance_set
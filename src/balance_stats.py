@@ -0,0 +1,143 @@
+"""
+Balance Statistics for Lynx Crypto Converter
+Incremental summary statistics over extracted balances
+"""
+
+import math
+from decimal import Decimal
+from typing import Dict, Optional, Sequence
+
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class BalanceStats:
+    """
+    Running count, sum, min and max over extracted balances
+
+    Values are held as integers in minor units at the finest decimal scale
+    seen so far (cents for 1.50, thousandths for 1.234), so updates and
+    summaries are O(1) and never construct a Decimal.
+    """
+
+    def __init__(self, track_percentiles: bool = False):
+        self.count = 0
+        self.scale = 0
+        self.total_units = 0
+        self.min_units = None
+        self.max_units = None
+        self.sketch = QuantileSketch() if track_percentiles else None
+
+    def add(self, value_str: str) -> None:
+        """Fold a canonical decimal string (e.g. '1234.50') into the statistics"""
+        integer, _, fraction = value_str.partition('.')
+        self.add_units(int(integer + fraction), len(fraction))
+
+    def add_units(self, units: int, scale: int) -> None:
+        """Fold a value of units / 10**scale into the statistics"""
+        if scale > self.scale:
+            self._rescale(scale)
+        elif scale < self.scale:
+            units *= 10 ** (self.scale - scale)
+
+        self.count += 1
+        self.total_units += units
+        if self.min_units is None or units < self.min_units:
+            self.min_units = units
+        if self.max_units is None or units > self.max_units:
+            self.max_units = units
+
+        if self.sketch is not None:
+            self.sketch.add(units / 10 ** self.scale)
+
+    def _rescale(self, scale: int) -> None:
+        """Move all running values to a finer decimal scale"""
+        factor = 10 ** (scale - self.scale)
+        self.total_units *= factor
+        if self.min_units is not None:
+            self.min_units *= factor
+            self.max_units *= factor
+        self.scale = scale
+
+    @property
+    def total(self) -> Decimal:
+        """Exact total of all balances"""
+        return Decimal(self.total_units).scaleb(-self.scale)
+
+    def to_summary(self) -> Dict:
+        """Summary statistics in the format returned by BalanceParser.get_summary"""
+        if not self.count:
+            summary = {
+                'total_values_found': 0,
+                'total_sum': 0,
+                'min_value': 0,
+                'max_value': 0,
+                'avg_value': 0
+            }
+        else:
+            divisor = 10 ** self.scale
+            summary = {
+                'total_values_found': self.count,
+                'total_sum': self.total_units / divisor,
+                'min_value': self.min_units / divisor,
+                'max_value': self.max_units / divisor,
+                'avg_value': self.total_units / (self.count * divisor)
+            }
+
+        if self.sketch is not None:
+            # Bucket midpoints can overshoot the observed range; clamp to it
+            summary['percentiles'] = {
+                name: min(max(value, summary['min_value']), summary['max_value'])
+                for name, value in self.sketch.percentiles().items()
+            }
+
+        return summary
+
+
+class QuantileSketch:
+    """
+    Streaming quantile estimate with bounded relative error
+
+    Positive values are counted in logarithmic buckets (DDSketch-style), so
+    memory depends on the value range rather than the number of values and
+    each estimate is within relative_accuracy of a true sample value.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Record a value"""
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the value at quantile q (0.0 - 1.0), or None when empty"""
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen > rank:
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def percentiles(self, points: Sequence[int] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """Estimated percentiles keyed as p50, p90, ..."""
+        return {f"p{p}": self.quantile(p / 100) or 0 for p in points}
@@ -0,0 +1,127 @@
+"""
+Circuit Breaker for Lynx Crypto Converter
+Stops calling an upstream that keeps failing until a probe succeeds
+"""
+
+import threading
+import time
+from typing import Dict
+from logger import converter_logger
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one upstream
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests are refused immediately. Once the cooldown has passed, one
+    request is let through as a health probe (half-open): success closes
+    the circuit, failure reopens it with the cooldown doubled, up to
+    max_reset_timeout.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3,
+                 reset_timeout: float = 30, max_reset_timeout: float = 600):
+        """
+        Args:
+            name: Upstream name used in logs
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: First cooldown in seconds before a probe
+            max_reset_timeout: Upper bound on the doubled cooldown
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self._cooldown = reset_timeout
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Whether a request may be sent now
+
+        In the open state this returns True exactly once after the
+        cooldown, for the probe request.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN and time.monotonic() >= self._open_until:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                converter_logger.info(f"Circuit for {self.name} closed: probe succeeded")
+            self.state = CLOSED
+            self.failures = 0
+            self._cooldown = self.reset_timeout
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                # Probe failed: back off further before the next one
+                self._cooldown = min(self._cooldown * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        """Open the circuit for the current cooldown (lock held)"""
+        self.state = OPEN
+        self.times_opened += 1
+        self._probe_in_flight = False
+        self._open_until = time.monotonic() + self._cooldown
+        converter_logger.warning(
+            f"Circuit for {self.name} opened after {self.failures} failures; "
+            f"next probe in {self._cooldown:.0f}s"
+        )
+
+    @property
+    def available(self) -> bool:
+        """True when requests go through without waiting for a probe"""
+        return self.state == CLOSED
+
+    def retry_in(self) -> float:
+        """Seconds until a probe is allowed (0 when closed or already due)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self._open_until - time.monotonic(), 0.0)
+
+    def get_stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected,
+            'cooldown_seconds': self._cooldown,
+            'retry_in_seconds': round(self.retry_in(), 1)
+        }
@@ -6,13 +6,16 @@ Milestone 1: Parse balance files from command line
 import argparse
 import sys
 import os
+import glob
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 
 # Add src directory to Python path if not already there
 src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
-from parser import BalanceParser
+from parser import BalanceParser, SUPPORTED_EXTENSIONS
 from tabulate import tabulate
 import json
 import webbrowser
@@ -62,6 +65,10 @@ def format_summary_table(summary):
         ['Average Value', f"${summary['avg_value']:,.2f}"]
     ]
     
+    # Percentile estimates are only present when requested
+    for name, value in summary.get('percentiles', {}).items():
+        summary_data.append([f"Percentile {name} (≈)", f"${value:,.2f}"])
+    
     return tabulate(summary_data, headers=['Metric', 'Value'], tablefmt='grid')
 
 
@@ -71,11 +78,17 @@ def parse_command(args):
         print(f"\n📄 Parsing file: {args.file}")
         print("=" * 60)
         
-        parser = BalanceParser(args.file)
-        balances = parser.parse()
+        parser = BalanceParser(args.file, streaming=args.streaming, percentiles=args.percentiles)
+        
+        # Statistics are collected while parsing; balances are only kept when shown or exported
+        if args.detailed or args.output:
+            balances = parser.parse_compact()
+        else:
+            balances = None
+            parser.scan()
         summary = parser.get_summary()
         
-        print(f"\n✅ Successfully parsed {len(balances)} balance value(s)\n")
+        print(f"\n✅ Successfully parsed {summary['total_values_found']} balance value(s)\n")
         
         # Show summary
         print("📊 SUMMARY STATISTICS")
@@ -89,7 +102,7 @@ def parse_command(args):
         # Export to JSON if requested
         if args.output:
             export_data = {
-                'balances': balances,
+                'balances': balances.to_list(),
                 'summary': summary
             }
             with open(args.output, 'w') as f:
@@ -117,12 +130,14 @@ def validate_command(args):
         print(f"\n🔍 Validating file: {args.file}")
         print("=" * 60)
         
-        parser = BalanceParser(args.file)
-        balances = parser.parse()
+        parser = BalanceParser(args.file, streaming=args.streaming)
         
-        if len(balances) > 0:
+        # Only the running statistics are needed, so don't keep the balances
+        count = parser.scan()['total_values_found']
+        
+        if count > 0:
             print("\n✅ File is valid!")
-            print(f"   Found {len(balances)} balance value(s)")
+            print(f"   Found {count} balance value(s)")
             print(f"   Total amount: ${parser.get_total():,.2f}")
         else:
             print("\n⚠️  File is valid but no numeric values were found")
@@ -134,6 +149,119 @@ def validate_command(args):
         return 1
 
 
+def collect_batch_files(target, recursive=False):
+    """Resolve a directory or glob pattern to a sorted list of balance files"""
+    if os.path.isdir(target):
+        pattern = os.path.join(target, '**' if recursive else '', '*')
+        candidates = glob.glob(pattern, recursive=recursive)
+    else:
+        candidates = glob.glob(target, recursive=True)
+    
+    return sorted(
+        path for path in candidates
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def parse_batch_file(task):
+    """Parse one file in a batch worker process"""
+    file_path, streaming = task
+    start = time.perf_counter()
+    
+    try:
+        parser = BalanceParser(file_path, streaming=streaming)
+        balances = parser.parse()
+        return {
+            'file': file_path,
+            'success': True,
+            'balances': balances,
+            'summary': parser.get_summary(),
+            'elapsed_seconds': time.perf_counter() - start
+        }
+    except Exception as e:
+        return {
+            'file': file_path,
+            'success': False,
+            'error': str(e),
+            'elapsed_seconds': time.perf_counter() - start
+        }
+
+
+def parse_batch_chunk(tasks):
+    """Parse a chunk of files in one worker task"""
+    return [parse_batch_file(task) for task in tasks]
+
+
+def parse_batch_command(args):
+    """Handle parse-batch command"""
+    try:
+        files = collect_batch_files(args.target, args.recursive)
+        
+        print(f"\n📦 Batch parsing: {args.target}")
+        print("=" * 60)
+        
+        if not files:
+            print(f"\n⚠️  No {', '.join(SUPPORTED_EXTENSIONS)} files found")
+            return 1
+        
+        workers = args.workers or os.cpu_count() or 1
+        chunksize = args.chunksize or max(1, len(files) // (workers * 4))
+        print(f"   Files: {len(files)} | Workers: {workers} | Chunk size: {chunksize}")
+        
+        tasks = [(path, args.streaming) for path in files]
+        chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+        succeeded = failed = total_balances = 0
+        start = time.perf_counter()
+        
+        def write_results(future):
+            nonlocal succeeded, failed, total_balances
+            for result in future.result():
+                if result['success']:
+                    succeeded += 1
+                    total_balances += len(result['balances'])
+                else:
+                    failed += 1
+                    print(f"   ❌ {result['file']}: {result['error']}")
+                
+                out.write(json.dumps(result) + '\n')
+        
+        # At most two chunks per worker are in flight; results are written in
+        # completion order (each line names its file), so a slow file never
+        # holds back the ones behind it
+        max_pending = workers * 2
+        with open(args.output, 'w') as out, ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write_results(future)
+                pending.add(executor.submit(parse_batch_chunk, chunk))
+            
+            for future in as_completed(pending):
+                write_results(future)
+        
+        elapsed = time.perf_counter() - start
+        
+        print("\n📊 BATCH SUMMARY")
+        print(tabulate([
+            ['Files Parsed', succeeded],
+            ['Files Failed', failed],
+            ['Balances Found', total_balances],
+            ['Elapsed', f"{elapsed:.2f}s"],
+            ['Throughput (files/s)', f"{len(files) / elapsed:,.1f}" if elapsed else 'n/a'],
+            ['Throughput (balances/s)', f"{total_balances / elapsed:,.1f}" if elapsed else 'n/a']
+        ], headers=['Metric', 'Value'], tablefmt='grid'))
+        
+        print(f"\n💾 Results streamed to: {args.output}")
+        
+        return 0 if failed == 0 else 1
+    
+    except Exception as e:
+        print(f"\n❌ Batch parse failed: {e}")
+        return 1
+
+
 def convert_command(args):
     """Handle convert command"""
     print(f"\n🔄 Converting file: {args.file}")
@@ -631,6 +759,12 @@ Examples:
   Parse and export to JSON:
     python cli.py parse balances.docx --output results.json
   
+  Parse a large file with the streaming engine:
+    python cli.py parse balances.docx --streaming
+  
+  Parse a directory of files in parallel:
+    python cli.py parse-batch statements/ --workers 8 --output results.jsonl
+  
   Validate a file:
     python cli.py validate balances.docx
   
@@ -664,13 +798,25 @@ Examples:
     
     # Parse command
     parse_parser = subparsers.add_parser('parse', help='Parse balance file')
-    parse_parser.add_argument('file', help='Path to balance file (.docx or .dox)')
+    parse_parser.add_argument('file', help='Path to balance file (.docx, .dox, .csv or .xlsx)')
     parse_parser.add_argument('-d', '--detailed', action='store_true', help='Show detailed balance list')
     parse_parser.add_argument('-o', '--output', help='Export results to JSON file')
+    parse_parser.add_argument('-s', '--streaming', action='store_true', help='Use the streaming XML engine for large files')
+    parse_parser.add_argument('-p', '--percentiles', action='store_true', help='Include estimated p50/p90/p99 in the summary')
     
     # Validate command
     validate_parser = subparsers.add_parser('validate', help='Validate balance file')
     validate_parser.add_argument('file', help='Path to balance file')
+    validate_parser.add_argument('-s', '--streaming', action='store_true', help='Use the streaming XML engine for large files')
+    
+    # Batch parse command
+    batch_parser = subparsers.add_parser('parse-batch', help='Parse many balance files in parallel')
+    batch_parser.add_argument('target', help='Directory or glob pattern of balance files')
+    batch_parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    batch_parser.add_argument('-c', '--chunksize', type=int, help='Files per worker task (default: auto)')
+    batch_parser.add_argument('-o', '--output', default='batch_results.jsonl', help='JSON-lines output file (default: batch_results.jsonl)')
+    batch_parser.add_argument('-r', '--recursive', action='store_true', help='Include subdirectories')
+    batch_parser.add_argument('-s', '--streaming', action='store_true', help='Use the streaming XML engine')
     
     # Demo command
     demo_parser = subparsers.add_parser('demo', help='Run demo with sample data')
@@ -708,6 +854,8 @@ Examples:
         return parse_command(args)
     elif args.command == 'validate':
         return validate_command(args)
+    elif args.command == 'parse-batch':
+        return parse_batch_command(args)
     elif args.command == 'demo':
         return demo_command(args)
     elif args.command == 'convert':
@@ -3,26 +3,43 @@ Conversion Storage Service for Lynx Crypto Converter
 Saves conversion results for later selection and sending
 """
 
+import fcntl
 import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List, Optional
 from logger import converter_logger
 
 
 class ConversionStorage:
-    """Manages storage and retrieval of conversion results"""
+    """
+    Manages storage and retrieval of conversion results
+    
+    Changes are read, modified and written back while holding an exclusive
+    lock on a sidecar ``.lock`` file, which the API and the CLI share. The
+    file is replaced through a temp file, so readers never see a partial
+    write. sending() serializes wallet sends, so two requests cannot send
+    the same conversion at once.
+    """
     
     def __init__(self, storage_dir: str = "data/conversions"):
         self.storage_dir = storage_dir
         self.storage_file = os.path.join(storage_dir, "conversions.json")
+        self.lock_file = f"{self.storage_file}.lock"
+        self.send_lock_file = f"{self.storage_file}.send.lock"
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
         
         # Ensure storage directory exists
         os.makedirs(storage_dir, exist_ok=True)
         
         # Initialize storage file if it doesn't exist
-        if not os.path.exists(self.storage_file):
-            self._save_conversions([])
+        with self._locked():
+            if not os.path.exists(self.storage_file):
+                self._save_conversions([])
     
     def save_conversion(self, conversion_data: Dict) -> str:
         """
@@ -54,30 +71,44 @@ class ConversionStorage:
             else:
                 filename_clean = 'unknown'
             
-            # Generate unique ID with filename and timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            conversion_id = f"{filename_clean}_{timestamp}"
+            with self._locked():
+                # Generate unique ID with filename and timestamp
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                conversion_id = f"{filename_clean}_{timestamp}"
             
-            # Add metadata
-            conversion_record = {
-                'id': conversion_id,
-                'timestamp': datetime.now().isoformat(),
-                'source_file': conversion_data.get('source_file', 'unknown'),
-                'total_usd_amount': conversion_data.get('total_usd_amount', 0),
-                'conversions': conversion_data.get('conversions', {}),
-                'wallet_info': conversion_data.get('wallet_info', {}),
-                'rates': conversion_data.get('rates', {}),
-                'sent': False  # Track if already sent
-            }
+                # Load existing conversions
+                conversions = self._load_conversions(for_update=True)
             
-            # Load existing conversions
-            conversions = self._load_conversions()
+                # Sends are recorded by ID, so a second save within the same
+                # second must not reuse an existing one
+                existing_ids = {c['id'] for c in conversions}
+                suffix = 1
+                while conversion_id in existing_ids:
+                    suffix += 1
+                    conversion_id = f"{filename_clean}_{timestamp}_{suffix}"
             
-            # Add new conversion
-            conversions.append(conversion_record)
+                # Add metadata
+                conversion_record = {
+                    'id': conversion_id,
+                    'timestamp': datetime.now().isoformat(),
+                    'source_file': conversion_data.get('source_file', 'unknown'),
+                    'total_usd_amount': conversion_data.get('total_usd_amount', 0),
+                    'total_usd_cents': conversion_data.get('total_usd_cents'),
+                    'conversions': conversion_data.get('conversions', {}),
+                    'base_units': conversion_data.get('base_units', {}),
+                    'asset_decimals': conversion_data.get('asset_decimals', {}),
+                    'wallet_info': conversion_data.get('wallet_info', {}),
+                    # Rates are kept once in the snapshot store; look up by ID
+                    'rate_snapshot_id': conversion_data.get('rate_snapshot_id'),
+                    'sent': False,  # Track if already sent
+                    'sent_currencies': {}  # Currency -> tx hash of each completed transfer
+                }
             
-            # Save updated list
-            self._save_conversions(conversions)
+                # Add new conversion
+                conversions.append(conversion_record)
+            
+                # Save updated list
+                self._save_conversions(conversions)
             
             converter_logger.info(f"Saved conversion {conversion_id} with ${conversion_record['total_usd_amount']:,.2f}")
             return conversion_id
@@ -129,17 +160,18 @@ class ConversionStorage:
     def mark_as_sent(self, conversion_id: str) -> bool:
         """Mark a conversion as sent"""
         try:
-            conversions = self._load_conversions()
-            
-            for conversion in conversions:
-                if conversion['id'] == conversion_id:
-                    conversion['sent'] = True
-                    conversion['sent_timestamp'] = datetime.now().isoformat()
-                    break
-            else:
-                return False
-            
-            self._save_conversions(conversions)
+            with self._locked():
+                conversions = self._load_conversions(for_update=True)
+                
+                for conversion in conversions:
+                    if conversion['id'] == conversion_id:
+                        conversion['sent'] = True
+                        conversion['sent_timestamp'] = datetime.now().isoformat()
+                        break
+                else:
+                    return False
+                
+                self._save_conversions(conversions)
             converter_logger.info(f"Marked conversion {conversion_id} as sent")
             return True
             
@@ -147,37 +179,114 @@ class ConversionStorage:
             converter_logger.error(f"Failed to mark conversion as sent: {e}")
             return False
     
+    def record_sent(self, conversion_id: str, currency: str, tx_hash: Optional[str] = None) -> bool:
+        """
+        Record one currency's completed transfer for a conversion
+        
+        The conversion is marked as sent once every converted currency has
+        been recorded, so a partly sent conversion can be retried for the
+        remaining currencies without repeating transfers.
+        """
+        try:
+            with self._locked():
+                conversions = self._load_conversions(for_update=True)
+                
+                for conversion in conversions:
+                    if conversion['id'] == conversion_id:
+                        sent_currencies = conversion.setdefault('sent_currencies', {})
+                        sent_currencies[currency] = tx_hash
+                        if all(c in sent_currencies for c in conversion.get('conversions', {})):
+                            conversion['sent'] = True
+                            conversion['sent_timestamp'] = datetime.now().isoformat()
+                        break
+                else:
+                    return False
+                
+                self._save_conversions(conversions)
+            converter_logger.info(f"Recorded {currency} transfer for conversion {conversion_id}")
+            return True
+            
+        except Exception as e:
+            converter_logger.error(f"Failed to record sent transfer: {e}")
+            return False
+    
     def delete_conversion(self, conversion_id: str) -> bool:
         """Delete a conversion"""
         try:
-            conversions = self._load_conversions()
-            original_count = len(conversions)
-            
-            conversions = [c for c in conversions if c['id'] != conversion_id]
-            
-            if len(conversions) < original_count:
+            with self._locked():
+                conversions = self._load_conversions(for_update=True)
+                original_count = len(conversions)
+                
+                conversions = [c for c in conversions if c['id'] != conversion_id]
+                
+                if len(conversions) == original_count:
+                    return False
+                
                 self._save_conversions(conversions)
-                converter_logger.info(f"Deleted conversion {conversion_id}")
-                return True
             
-            return False
+            converter_logger.info(f"Deleted conversion {conversion_id}")
+            return True
             
         except Exception as e:
             converter_logger.error(f"Failed to delete conversion: {e}")
             return False
     
-    def _load_conversions(self) -> List[Dict]:
-        """Load conversions from storage file"""
+    @contextmanager
+    def sending(self):
+        """
+        Hold the send lock while sending a conversion
+        
+        Callers re-read the conversion under the lock, so currencies sent
+        by another request are seen before anything is sent again.
+        """
+        with self._send_lock, self._file_lock(self.send_lock_file):
+            yield
+    
+    @contextmanager
+    def _locked(self):
+        """Storage lock held for a read-modify-write of the storage file"""
+        with self._lock, self._file_lock(self.lock_file):
+            yield
+    
+    @contextmanager
+    def _file_lock(self, path: str):
+        """Exclusive lock shared by every process using this storage"""
+        with open(path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _load_conversions(self, for_update: bool = False) -> List[Dict]:
+        """
+        Load conversions from storage file
+        
+        Args:
+            for_update: Raise on an unreadable file instead of returning an
+                empty list, so a corrupt store is never overwritten
+        """
         try:
             with open(self.storage_file, 'r') as f:
                 return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError as e:
+            if for_update:
+                raise
+            converter_logger.error(f"Failed to read {self.storage_file}: {e}")
             return []
     
     def _save_conversions(self, conversions: List[Dict]) -> None:
-        """Save conversions to storage file"""
-        with open(self.storage_file, 'w') as f:
-            json.dump(conversions, f, indent=2)
+        """Atomically replace the storage file (storage lock held)"""
+        fd, temp_file = tempfile.mkstemp(dir=self.storage_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(conversions, f, indent=2)
+            os.replace(temp_file, self.storage_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
 
 
 # Global storage instance
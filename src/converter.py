@@ -3,198 +3,445 @@ Lynx Crypto Converter - Main Conversion Engine
 Handles cryptocurrency conversion with wallet integration
 """
 
-from typing import Dict, List, Optional
+import math
+from typing import Dict, List, Optional, Sequence, Union
 from datetime import datetime
+from balance_set import BalanceSet
+from fixed_point import USD_DECIMALS
 from parser import BalanceParser
+from parse_cache import parse_cache
 from rate_service import rate_service
 from wallet_service import wallet_service
 from conversion_storage import conversion_storage
 from logger import converter_logger
 
 
+class StageError(Exception):
+    """A pipeline stage cannot produce its output; the message is returned as the error"""
+
+
+class ConversionContext:
+    """
+    Stage outputs for one request's conversion pipeline
+
+    The pipeline runs parse -> price -> associate -> persist, and each
+    stage stores its output here the first time it runs. Composite
+    operations (portfolio summary, convert-and-send) share one context, so
+    the file is parsed, priced and validated once and the result is saved
+    to conversion storage once.
+    """
+
+    __slots__ = ('file_path', 'file_data', 'balance_set', 'pricing', 'wallet_info', 'conversion_id')
+
+    def __init__(self, file_path: str, file_data: Optional[bytes] = None):
+        """
+        Args:
+            file_path: Path to balance file (original file name when file_data is given)
+            file_data: Raw file bytes to parse in memory instead of reading file_path
+        """
+        self.file_path = file_path
+        self.file_data = file_data
+        self.balance_set: Optional[BalanceSet] = None
+        self.pricing: Optional[Dict] = None
+        self.wallet_info: Optional[Dict] = None
+        self.conversion_id: Optional[str] = None
+
+
 class CryptoConverter:
     """Main cryptocurrency converter class"""
 
     def __init__(self):
         pass
 
-    def convert_balances(self, file_path: str, target_currency: str = 'USD', send_to_wallet: bool = False) -> Dict:
+    def parse_stage(self, context: ConversionContext) -> BalanceSet:
+        """Balances in the file, reusing earlier results for identical content"""
+        if context.balance_set is not None:
+            return context.balance_set
+
+        file_path, file_data = context.file_path, context.file_data
+        if file_data is not None:
+            digest = parse_cache.bytes_digest(file_data)
+        else:
+            digest = parse_cache.file_digest(file_path)
+        balance_set = parse_cache.get(digest)
+
+        if balance_set is None:
+            balance_set = BalanceParser(file_path, file_data=file_data).parse_compact()
+            parse_cache.put(digest, balance_set)
+        else:
+            converter_logger.debug(f"Parse cache hit for {file_path} ({digest[:12]})")
+
+        if not balance_set:
+            raise StageError('No valid balances found in file')
+
+        converter_logger.info(f"Parsed {len(balance_set)} balances from {file_path}")
+        context.balance_set = balance_set
+        return balance_set
+
+    def price_stage(self, context: ConversionContext) -> Dict:
+        """Total in cents converted to every priced currency against one rate snapshot"""
+        if context.pricing is not None:
+            return context.pricing
+
+        # Calculate total USD amount from parsed balances, exactly, in cents
+        total_cents = self.parse_stage(context).total_units(USD_DECIMALS)
+        total_usd = total_cents / 100
+        converter_logger.info(f"Total USD amount: ${total_usd:,.2f}")
+
+        # Get current crypto rates (USD to crypto)
+        snapshot = rate_service.get_snapshot()
+
+        if not snapshot.rates:
+            raise StageError('Failed to fetch exchange rates')
+
+        # Convert USD to each cryptocurrency in integer base units
+        # (satoshi, wei, ...); floats are only a view for display
+        conversions = {}
+        base_units = {}
+        asset_decimals = {}
+
+        for currency, unit_rate in snapshot.unit_rates.items():
+            units = unit_rate.to_base_units(total_cents)
+            decimals = unit_rate.asset.decimals
+            base_units[currency] = units
+            asset_decimals[currency] = decimals
+            conversions[currency] = units / 10 ** decimals
+            converter_logger.info(f"Converted ${total_usd:,.2f} USD to {units} {unit_rate.asset.unit} of {currency}")
+
+        context.pricing = {
+            'total_usd': total_usd,
+            'total_cents': total_cents,
+            'snapshot': snapshot,
+            'conversions': conversions,
+            'base_units': base_units,
+            'asset_decimals': asset_decimals
+        }
+        return context.pricing
+
+    def associate_stage(self, context: ConversionContext) -> Dict:
+        """Converted amounts linked with validated wallet addresses"""
+        if context.wallet_info is None:
+            context.wallet_info = wallet_service.associate_amounts_with_wallets(
+                self.price_stage(context)['conversions']
+            )
+        return context.wallet_info
+
+    def persist_stage(self, context: ConversionContext, result: Dict) -> str:
+        """Save the conversion, unsent, once per context"""
+        if context.conversion_id is None:
+            context.conversion_id = conversion_storage.save_conversion(result)
+        return context.conversion_id
+
+    def _build_result(self, context: ConversionContext) -> Dict:
+        """Result of the parse, price and associate stages in the API format"""
+        balance_set = self.parse_stage(context)
+        pricing = self.price_stage(context)
+        snapshot = pricing['snapshot']
+
+        return {
+            'success': True,
+            'source_file': context.file_path,
+            'parsed_balances': balance_set.to_list(),
+            'total_usd_amount': pricing['total_usd'],
+            'total_usd_cents': pricing['total_cents'],
+            'rates': dict(snapshot.float_rates),
+            'rate_snapshot_id': snapshot.id,
+            'conversions': dict(pricing['conversions']),
+            # Strings: wei amounts exceed the integer range of JSON clients
+            'base_units': {currency: str(units) for currency, units in pricing['base_units'].items()},
+            'asset_decimals': dict(pricing['asset_decimals']),
+            'wallet_info': self.associate_stage(context),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def _send_conversions(self, conversion_id: str, conversions: Dict[str, float],
+                          base_units: Dict[str, Optional[int]], wallet_id: str = None) -> List[Dict]:
+        """
+        Send each converted amount of a saved conversion to wallet in its exact base units
+
+        Each completed transfer is recorded on the saved conversion as soon as
+        it succeeds, and currencies already recorded are skipped, so a failed
+        or interrupted send can be retried without repeating transfers. If a
+        transfer cannot be recorded, sending stops: a retry would repeat it.
+        Callers hold conversion_storage.sending().
+        """
+        saved = conversion_storage.get_conversion(conversion_id) or {}
+        already_sent = saved.get('sent_currencies', {})
+        wallet_transactions = []
+        for currency, amount in conversions.items():
+            if currency in already_sent:
+                continue
+            try:
+                transaction = wallet_service.send_to_wallet(
+                    currency, amount, wallet_id, base_units=base_units.get(currency)
+                )
+            except Exception as e:
+                converter_logger.error(f"Failed to send {currency}: {e}")
+                transaction = {
+                    'success': False,
+                    'error': f'Transaction failed: {str(e)}',
+                    'currency': currency,
+                    'amount': amount,
+                    'timestamp': datetime.now().isoformat()
+                }
+            if transaction.get('success') and not conversion_storage.record_sent(
+                    conversion_id, currency, transaction.get('tx_hash')):
+                converter_logger.error(
+                    f"Sent {currency} for conversion {conversion_id} (tx {transaction.get('tx_hash')}) "
+                    f"but could not record it; stopping before any further transfers"
+                )
+                raise StageError(
+                    f"Sent {currency} (tx {transaction.get('tx_hash')}) but could not record it on "
+                    f"conversion {conversion_id}; check the transfer before sending again"
+                )
+            wallet_transactions.append(transaction)
+        return wallet_transactions
+
+    def _send_stage(self, context: ConversionContext, result: Dict, wallet_id: str = None) -> None:
+        """Save the conversion, then send it and report whether every transfer succeeded"""
+        result['conversion_id'] = self.persist_stage(context, result)
+        pricing = self.price_stage(context)
+        with conversion_storage.sending():
+            transactions = self._send_conversions(
+                context.conversion_id, pricing['conversions'], pricing['base_units'], wallet_id
+            )
+        result['wallet_transactions'] = transactions
+        result['sent_to_wallet'] = all(tx.get('success') for tx in transactions)
+
+    def convert_balances(self, file_path: str, target_currency: str = 'USD', send_to_wallet: bool = False,
+                         file_data: Optional[bytes] = None, context: Optional[ConversionContext] = None) -> Dict:
         """
         Convert USD balances from file to cryptocurrencies
 
         Args:
-            file_path: Path to balance file
+            file_path: Path to balance file (original file name when file_data is given)
             target_currency: Target currency (default: USD, used as source)
             send_to_wallet: Whether to send converted amounts to wallet
+            file_data: Raw file bytes to parse in memory instead of reading file_path
+            context: Stage outputs to reuse from an earlier call for the same file
 
         Returns:
             Dict with conversion results and wallet info
         """
         try:
-            # Parse balances from file
-            parser = BalanceParser(file_path)
-            balance_list = parser.parse()
-
-            if not balance_list:
-                return {'error': 'No valid balances found in file'}
-
-            converter_logger.info(f"Parsed {len(balance_list)} balances from {file_path}")
+            context = context or ConversionContext(file_path, file_data)
+            result = self._build_result(context)
 
-            # Calculate total USD amount from parsed balances
-            total_usd = sum(item['value'] for item in balance_list)
-            converter_logger.info(f"Total USD amount: ${total_usd:,.2f}")
+            # Save conversion for later use, then send to wallet if requested
+            if send_to_wallet:
+                self._send_stage(context, result)
+            else:
+                result['conversion_id'] = self.persist_stage(context, result)
 
-            # Get current crypto rates (USD to crypto)
-            rates = rate_service.get_rates()
+            return result
 
-            if not rates:
-                return {'error': 'Failed to fetch exchange rates'}
+        except StageError as e:
+            return {'error': str(e)}
+        except Exception as e:
+            converter_logger.error(f"Conversion failed: {e}")
+            return {'error': f'Conversion failed: {str(e)}'}
+    
+    def convert_single_amount(self, amount: float, from_currency: str, to_currency: str = 'BTC') -> Dict:
+        """
+        Convert a single amount between any two priced currencies
 
-            # Convert USD to each cryptocurrency
-            conversions = {}
+        Args:
+            amount: Amount in from_currency to convert
+            from_currency: Source currency (USD or a priced cryptocurrency)
+            to_currency: Target currency (USD or a priced cryptocurrency)
 
-            for currency, usd_rate in rates.items():
-                # Calculate how much crypto we can buy with total USD
-                # Rate is in USD per 1 crypto, so we divide
-                crypto_amount = total_usd / float(usd_rate)
-                conversions[currency] = crypto_amount
-                converter_logger.info(f"Converted ${total_usd:,.2f} USD to {crypto_amount:.8f} {currency}")
+        Returns:
+            Dict with conversion result
+        """
+        try:
+            # Precomputed for the current snapshot: conversion is one lookup
+            cross_rates = rate_service.get_cross_rates()
+            from_currency = from_currency.upper()
+            to_currency = to_currency.upper()
 
-            # Associate with wallets
-            wallet_info = wallet_service.associate_amounts_with_wallets(conversions)
+            if cross_rates.size < 2:
+                return {'error': 'Failed to fetch exchange rates'}
 
-            # Send to wallet if requested
-            wallet_transactions = []
-            if send_to_wallet:
-                for currency, amount in conversions.items():
-                    transaction = wallet_service.send_to_wallet(currency, amount)
-                    wallet_transactions.append(transaction)
+            for currency in (from_currency, to_currency):
+                if currency not in cross_rates.index:
+                    return {'error': f'Rate not available for {currency}'}
 
-            # Prepare rates for output (convert Decimal to float)
-            rates_output = {k: float(v) for k, v in rates.items()}
+            converted_amount = amount * cross_rates.rate(from_currency, to_currency)
+            # Price of one to_currency unit in from_currency (USD price when converting from USD)
+            rate = cross_rates.rate(to_currency, from_currency)
 
-            result = {
+            return {
                 'success': True,
-                'source_file': file_path,
-                'parsed_balances': balance_list,
-                'total_usd_amount': total_usd,
-                'rates': rates_output,
-                'conversions': conversions,
-                'wallet_info': wallet_info,
+                'original_amount': amount,
+                'original_currency': from_currency,
+                'converted_amount': converted_amount,
+                'target_currency': to_currency,
+                'rate': rate,
+                'rate_snapshot_id': cross_rates.snapshot_id,
+                'calculation': f'{amount} {from_currency} / {rate} {from_currency} per {to_currency} = {converted_amount:.8f} {to_currency}',
                 'timestamp': datetime.now().isoformat()
             }
 
-            if send_to_wallet:
-                result['wallet_transactions'] = wallet_transactions
-
-            # Save conversion for later use
-            conversion_id = conversion_storage.save_conversion(result)
-            result['conversion_id'] = conversion_id
-
-            return result
-
         except Exception as e:
-            converter_logger.error(f"Conversion failed: {e}")
+            converter_logger.error(f"Single conversion failed: {e}")
             return {'error': f'Conversion failed: {str(e)}'}
     
-    def convert_single_amount(self, amount: float, from_currency: str, to_currency: str = 'BTC') -> Dict:
+    def convert_many(self, amounts: Sequence[float], to_currencies: Union[str, Sequence[str]],
+                     from_currencies: Union[str, Sequence[str]] = 'USD') -> Dict:
         """
-        Convert a single USD amount to cryptocurrency
+        Convert many amounts against one rate snapshot in a single pass
+
+        Currency columns may be a single code or a list; a single code (or a
+        one-element list) applies to every amount, and a one-element amounts
+        list applies to every currency pair.
 
         Args:
-            amount: Amount in USD to convert
-            from_currency: Source currency (should be USD)
-            to_currency: Target cryptocurrency (BTC, ETH, USDT, SOL)
+            amounts: Amounts in the matching from currency
+            to_currencies: Target currencies (USD or priced cryptocurrencies)
+            from_currencies: Source currencies (default: USD)
 
         Returns:
-            Dict with conversion result
+            Dict with columnar results: row i of every column belongs to
+            the same conversion. Rows with an unknown currency have None
+            for converted_amount and rate and are listed in 'unpriced'.
+            Empty or non-finite amounts and currency columns that are
+            neither a code nor a list of codes give an 'error' instead.
         """
         try:
-            # Get all crypto rates
-            rates = rate_service.get_rates()
+            amounts = [float(amount) for amount in amounts]
+            if not amounts:
+                return {'error': 'No amounts to convert'}
+            # NaN and infinity have no JSON representation
+            if not all(map(math.isfinite, amounts)):
+                return {'error': 'Amounts must be finite numbers'}
+
+            columns = [amounts]
+            for codes in (from_currencies, to_currencies):
+                if isinstance(codes, str):
+                    columns.append([codes.upper()])
+                elif isinstance(codes, (list, tuple)) and all(isinstance(c, str) for c in codes):
+                    columns.append([c.upper() for c in codes])
+                else:
+                    return {'error': 'Currencies must be a currency code or a list of codes'}
 
-            if not rates:
+            count = max(len(column) for column in columns)
+            for idx, column in enumerate(columns):
+                if len(column) == 1:
+                    columns[idx] = column * count
+                elif len(column) != count:
+                    return {'error': f'Column lengths differ: expected {count} or 1, got {len(column)}'}
+            amounts, from_currencies, to_currencies = columns
+
+            # One snapshot for the whole batch
+            cross_rates = rate_service.get_cross_rates()
+            if cross_rates.size < 2:
                 return {'error': 'Failed to fetch exchange rates'}
 
-            # Handle USD to crypto conversion
-            if from_currency.upper() == 'USD':
-                if to_currency.upper() not in rates:
-                    return {'error': f'Rate not available for {to_currency}'}
-
-                usd_rate = float(rates[to_currency.upper()])
-                converted_amount = amount / usd_rate
-
-                return {
-                    'success': True,
-                    'original_amount': amount,
-                    'original_currency': from_currency.upper(),
-                    'converted_amount': converted_amount,
-                    'target_currency': to_currency.upper(),
-                    'rate': usd_rate,
-                    'calculation': f'{amount} USD / {usd_rate} USD per {to_currency} = {converted_amount:.8f} {to_currency}',
-                    'timestamp': datetime.now().isoformat()
-                }
+            offsets = cross_rates.positions(from_currencies, to_currencies)
+            inverse_offsets = cross_rates.positions(to_currencies, from_currencies)
+            unpriced = [idx for idx, offset in enumerate(offsets) if offset < 0]
+
+            if not unpriced:
+                converted = cross_rates.convert_many(amounts, offsets).tolist()
+                rates = list(map(cross_rates.values.__getitem__, inverse_offsets))
             else:
-                return {'error': 'Only USD to crypto conversion supported. Use from_currency="USD"'}
+                priced = [idx for idx, offset in enumerate(offsets) if offset >= 0]
+                converted = [None] * count
+                rates = [None] * count
+                results = cross_rates.convert_many([amounts[idx] for idx in priced],
+                                                   [offsets[idx] for idx in priced])
+                for idx, value in zip(priced, results):
+                    converted[idx] = value
+                    rates[idx] = cross_rates.values[inverse_offsets[idx]]
+
+            if not all(math.isfinite(value) for value in converted if value is not None):
+                return {'error': 'Converted amount out of range'}
+
+            return {
+                'success': True,
+                'count': count,
+                'columns': {
+                    'amount': amounts,
+                    'from_currency': from_currencies,
+                    'to_currency': to_currencies,
+                    'converted_amount': converted,
+                    # Price of one to_currency unit in from_currency, as in convert_single_amount
+                    'rate': rates
+                },
+                'unpriced': unpriced,
+                'rate_snapshot_id': cross_rates.snapshot_id,
+                'timestamp': datetime.now().isoformat()
+            }
 
         except Exception as e:
-            converter_logger.error(f"Single conversion failed: {e}")
+            converter_logger.error(f"Batch conversion failed: {e}")
             return {'error': f'Conversion failed: {str(e)}'}
-    
-    def get_portfolio_summary(self, file_path: str) -> Dict:
+
+    def get_portfolio_summary(self, file_path: str, file_data: Optional[bytes] = None,
+                              context: Optional[ConversionContext] = None) -> Dict:
         """
         Get portfolio summary with wallet validation
         
         Args:
-            file_path: Path to balance file
+            file_path: Path to balance file (original file name when file_data is given)
+            file_data: Raw file bytes to parse in memory instead of reading file_path
+            context: Stage outputs to reuse from an earlier call for the same file
             
         Returns:
             Dict with portfolio summary
         """
-        result = self.convert_balances(file_path)
+        context = context or ConversionContext(file_path, file_data)
+        result = self.convert_balances(file_path, context=context)
         
         if not result.get('success'):
             return result
         
         # Add wallet validation summary
+        wallet_info = self.associate_stage(context)
         wallet_summary = {
-            'total_wallets': len(result['wallet_info']),
-            'valid_wallets': sum(1 for w in result['wallet_info'].values() if w['valid']),
-            'invalid_wallets': sum(1 for w in result['wallet_info'].values() if not w['valid']),
-            'missing_wallets': sum(1 for w in result['wallet_info'].values() if w['address'] is None)
+            'total_wallets': len(wallet_info),
+            'valid_wallets': sum(1 for w in wallet_info.values() if w['valid']),
+            'invalid_wallets': sum(1 for w in wallet_info.values() if not w['valid']),
+            'missing_wallets': sum(1 for w in wallet_info.values() if w['address'] is None)
         }
         
         result['wallet_summary'] = wallet_summary
         return result
     
-    def send_converted_amounts_to_wallet(self, file_path: str, wallet_id: str = None) -> Dict:
+    def send_converted_amounts_to_wallet(self, file_path: str, wallet_id: str = None,
+                                         file_data: Optional[bytes] = None,
+                                         context: Optional[ConversionContext] = None) -> Dict:
         """
         Convert balances and send to client's wallet
         
+        The conversion is saved before sending and marked as sent once every
+        transfer has succeeded; a partly sent conversion can be completed
+        with send_saved_conversion().
+        
         Args:
-            file_path: Path to balance file
+            file_path: Path to balance file (original file name when file_data is given)
             wallet_id: Wallet ID (defaults to client address)
+            file_data: Raw file bytes to parse in memory instead of reading file_path
+            context: Stage outputs to reuse from an earlier call for the same file
             
         Returns:
             Dict with conversion and transaction results
         """
-        # First convert the balances
-        result = self.convert_balances(file_path)
-        
-        if not result.get('success'):
+        try:
+            context = context or ConversionContext(file_path, file_data)
+            result = self._build_result(context)
+            
+            self._send_stage(context, result, wallet_id)
+            
+            sent = sum(1 for tx in result['wallet_transactions'] if tx.get('success'))
+            converter_logger.info(f"Sent {sent} of {len(result['wallet_transactions'])} converted amounts to wallet")
             return result
         
-        # Send each converted amount to wallet
-        wallet_transactions = []
-        for currency, amount in result['conversions'].items():
-            transaction = wallet_service.send_to_wallet(currency, amount, wallet_id)
-            wallet_transactions.append(transaction)
-        
-        result['wallet_transactions'] = wallet_transactions
-        result['sent_to_wallet'] = True
-        
-        converter_logger.info(f"Sent {len(wallet_transactions)} converted amounts to wallet")
-        return result
+        except StageError as e:
+            return {'error': str(e)}
+        except Exception as e:
+            converter_logger.error(f"Conversion failed: {e}")
+            return {'error': f'Conversion failed: {str(e)}'}
     
     def send_saved_conversion(self, conversion_id: str, wallet_id: str = None) -> Dict:
         """
@@ -208,30 +455,30 @@ class CryptoConverter:
             Dict with transaction results
         """
         try:
-            # Get saved conversion
-            conversion = conversion_storage.get_conversion(conversion_id)
-            
-            if not conversion:
-                return {'error': f'Conversion {conversion_id} not found'}
-            
-            if conversion.get('sent', False):
-                return {'error': f'Conversion {conversion_id} already sent'}
-            
-            # Send each converted amount to wallet
-            wallet_transactions = []
-            for currency, amount in conversion['conversions'].items():
-                transaction = wallet_service.send_to_wallet(currency, amount, wallet_id)
-                wallet_transactions.append(transaction)
-            
-            # Mark as sent
-            conversion_storage.mark_as_sent(conversion_id)
+            # Checked under the send lock, so a concurrent send of the same
+            # conversion is seen before anything is sent again
+            with conversion_storage.sending():
+                conversion = conversion_storage.get_conversion(conversion_id)
+                
+                if not conversion:
+                    return {'error': f'Conversion {conversion_id} not found'}
+                
+                if conversion.get('sent', False):
+                    return {'error': f'Conversion {conversion_id} already sent'}
+                
+                # Send the currencies not sent yet; records saved before base
+                # units were stored fall back to the float amount
+                base_units = {currency: int(units) for currency, units in conversion.get('base_units', {}).items()}
+                wallet_transactions = self._send_conversions(
+                    conversion_id, conversion['conversions'], base_units, wallet_id
+                )
             
             result = {
                 'success': True,
                 'conversion_id': conversion_id,
                 'conversions': conversion['conversions'],
                 'wallet_transactions': wallet_transactions,
-                'sent_to_wallet': True,
+                'sent_to_wallet': all(tx.get('success') for tx in wallet_transactions),
                 'original_file': conversion.get('source_file', 'unknown'),
                 'total_usd_amount': conversion.get('total_usd_amount', 0),
                 'timestamp': datetime.now().isoformat()
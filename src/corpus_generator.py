@@ -0,0 +1,148 @@
+"""
+Synthetic Balance Corpus Generator for Lynx Crypto Converter
+Builds reproducible .docx statements of configurable size and shape
+"""
+
+import os
+import random
+from typing import Dict, List, Sequence
+from xml.sax.saxutils import escape
+
+
+SHAPES = ('paragraphs', 'tables', 'mixed-locale', 'nested-tables')
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+ACCOUNT_LABELS = [
+    'Checking Account', 'Savings Account', 'Investment Portfolio', 'Emergency Fund',
+    'Crypto Wallet', 'Brokerage', 'Escrow', 'Payroll', 'Credit Card', 'Money Market'
+]
+
+
+def format_amount(value: float, locale: str = 'us') -> str:
+    """Render an amount the way statements in a locale typically write it"""
+    if locale == 'eu':
+        grouped = f"{value:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', '.')
+        return f"€{grouped}"
+    if locale == 'fr':
+        return f"{value:,.2f}".replace(',', ' ').replace('.', ',') + ' €'
+    if locale == 'uk':
+        return f"£{value:,.2f}"
+    if locale == 'jp':
+        return f"¥{int(value):,}"
+    if locale == 'in':
+        return f"₹{value:,.2f}"
+    if locale == 'plain':
+        return f"{value:.2f}"
+    return f"${value:,.2f}"
+
+
+def generate_document(file_path: str, shape: str, size: int, seed: int = 0) -> Dict:
+    """
+    Write a synthetic balance statement
+
+    Args:
+        file_path: Output .docx path
+        shape: One of SHAPES
+        size: Number of paragraphs (paragraph shapes) or table rows (table shapes)
+        seed: Random seed; the same arguments always produce the same document
+
+    Returns:
+        Dict describing the generated document
+    """
+    from docx import Document
+    from docx.oxml import parse_xml
+
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown corpus shape: {shape}. Expected one of: {', '.join(SHAPES)}")
+
+    rng = random.Random(f"{shape}:{size}:{seed}")
+    doc = Document()
+    doc.add_heading(f'Account Balances - synthetic {shape} ({size})', 0)
+
+    locales = ['us', 'eu', 'fr', 'uk', 'jp', 'in', 'plain'] if shape == 'mixed-locale' else ['us']
+    amounts = 0
+
+    if shape in ('paragraphs', 'mixed-locale'):
+        for idx in range(size):
+            count = rng.randint(1, 3)
+            parts = [
+                f"{rng.choice(ACCOUNT_LABELS)}: {format_amount(rng.uniform(1, 250_000), rng.choice(locales))}"
+                for _ in range(count)
+            ]
+            doc.add_paragraph(f"Ref {idx:06d} - " + '; '.join(parts))
+            amounts += count
+    else:
+        # Tables are written as raw XML; python-docx cell access is quadratic in row count
+        rows_per_table = 200
+        for start in range(0, size, rows_per_table):
+            rows = min(rows_per_table, size - start)
+            xml, table_amounts = _table_xml(rng, rows, nested=(shape == 'nested-tables'))
+            doc.element.body.sectPr.addprevious(parse_xml(xml))
+            doc.add_paragraph(f"Subtotal section {start // rows_per_table + 1}")
+            amounts += table_amounts
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    doc.save(file_path)
+
+    return {
+        'file': file_path,
+        'shape': shape,
+        'size': size,
+        'seed': seed,
+        'amounts_written': amounts,
+        'file_bytes': os.path.getsize(file_path)
+    }
+
+
+def generate_corpus(out_dir: str, shapes: Sequence[str] = SHAPES, sizes: Sequence[int] = (100, 1000),
+                    seed: int = 0) -> List[Dict]:
+    """Generate one document per (shape, size) combination under out_dir"""
+    documents = []
+    for shape in shapes:
+        for size in sizes:
+            file_path = os.path.join(out_dir, f"{shape}_{size}_s{seed}.docx")
+            documents.append(generate_document(file_path, shape, size, seed))
+    return documents
+
+
+def _table_xml(rng: random.Random, rows: int, nested: bool = False) -> tuple:
+    """Build a 4-column balance table, optionally with a nested table per row"""
+    grid = ''.join('<w:gridCol w:w="2000"/>' for _ in range(4))
+    body = [_row_xml(['Account', 'Opening', 'Closing', 'Notes'])]
+    amounts = 0
+
+    for _ in range(rows):
+        opening = rng.uniform(1, 500_000)
+        closing = opening + rng.uniform(-1_000, 1_000)
+        cells = [
+            rng.choice(ACCOUNT_LABELS),
+            format_amount(opening),
+            format_amount(abs(closing)),
+            f"Fee {format_amount(rng.uniform(1, 50))}",
+        ]
+        amounts += 3
+
+        inner = None
+        if nested:
+            inner = _table_xml_flat([[f"Pending {format_amount(rng.uniform(1, 5_000))}"]])
+        body.append(_row_xml(cells, inner))
+
+    xml = (
+        f'<w:tbl xmlns:w="{W_NS}"><w:tblPr><w:tblStyle w:val="TableGrid"/></w:tblPr>'
+        f'<w:tblGrid>{grid}</w:tblGrid>{"".join(body)}</w:tbl>'
+    )
+    return xml, amounts
+
+
+def _table_xml_flat(rows: List[List[str]]) -> str:
+    grid = ''.join('<w:gridCol w:w="1000"/>' for _ in rows[0])
+    return f'<w:tbl><w:tblGrid>{grid}</w:tblGrid>{"".join(_row_xml(row) for row in rows)}</w:tbl>'
+
+
+def _row_xml(cells: List[str], nested_table: str = None) -> str:
+    tcs = []
+    for idx, text in enumerate(cells):
+        inner = nested_table if nested_table and idx == len(cells) - 1 else ''
+        tcs.append(f'<w:tc>{inner}<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p></w:tc>')
+    return f'<w:tr>{"".join(tcs)}</w:tr>'
@@ -0,0 +1,97 @@
+"""
+Cross Rates for Lynx Crypto Converter
+Precomputed any-to-any conversion rates for one rate snapshot
+"""
+
+from array import array
+from operator import mul
+from typing import Dict, List, Optional, Sequence
+from rate_snapshot import RateSnapshot
+
+
+class CrossRateMatrix:
+    """
+    N×N matrix of conversion rates between every pair of currencies
+
+    Built once per snapshot from its USD prices (USD itself included), so a
+    conversion is one index lookup and one multiplication instead of
+    divisions per request. Rates are kept row-major in a flat array of
+    doubles: values[i * n + j] is the units of currency j per unit of
+    currency i.
+    """
+
+    __slots__ = ('snapshot_id', 'currencies', 'index', 'size', 'values')
+
+    def __init__(self, snapshot: RateSnapshot, quote: str = 'USD'):
+        """
+        Args:
+            snapshot: Snapshot whose USD prices the matrix is built from
+            quote: Currency the snapshot prices are quoted in
+        """
+        prices = {c: r for c, r in snapshot.float_rates.items() if r > 0 and c != quote}
+        currencies = [quote] + sorted(prices)
+        usd_prices = [1.0] + [prices[c] for c in currencies[1:]]
+
+        # One division per currency, then the matrix is all multiplications
+        inverses = [1.0 / price for price in usd_prices]
+        values = array('d')
+        for price in usd_prices:
+            values.extend([price * inverse for inverse in inverses])
+
+        self.snapshot_id = snapshot.id
+        self.currencies: List[str] = currencies
+        self.index: Dict[str, int] = {c: i for i, c in enumerate(currencies)}
+        self.size = len(currencies)
+        self.values = values
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """Units of to_currency per unit of from_currency, or None if either is unknown"""
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        return self.values[i * self.size + j]
+
+    def row(self, from_currency: str) -> Optional[Dict[str, float]]:
+        """Rates from one currency to every other currency"""
+        i = self.index.get(from_currency)
+        if i is None:
+            return None
+        start = i * self.size
+        return dict(zip(self.currencies, self.values[start:start + self.size]))
+
+    def positions(self, from_currencies: Sequence[str], to_currencies: Sequence[str]) -> List[int]:
+        """
+        Flat offsets into values for pairs of currencies, -1 where either is unknown
+
+        Codes are resolved once per distinct pair, so a batch that repeats a
+        few currencies costs a dict lookup per element.
+        """
+        size = self.size
+        index = self.index
+        resolved: Dict[tuple, int] = {}
+        offsets = []
+        for pair in zip(from_currencies, to_currencies):
+            offset = resolved.get(pair)
+            if offset is None:
+                i = index.get(pair[0])
+                j = index.get(pair[1])
+                offset = resolved[pair] = -1 if i is None or j is None else i * size + j
+            offsets.append(offset)
+        return offsets
+
+    def convert_many(self, amounts: Sequence[float], offsets: Sequence[int]) -> array:
+        """
+        Convert every amount at its offset (from positions()) in one pass
+
+        Unknown offsets (-1) must be filtered out first. The gather and the
+        multiply each run as a single map over the batch.
+        """
+        return array('d', map(mul, amounts, map(self.values.__getitem__, offsets)))
+
+    def get_stats(self) -> Dict:
+        return {
+            'snapshot_id': self.snapshot_id,
+            'currencies': self.size,
+            'bytes': self.values.itemsize * len(self.values)
+        }
@@ -0,0 +1,216 @@
+"""
+Streaming .docx Text Reader for Lynx Crypto Converter
+Reads paragraph and table-cell text straight from the zip without python-docx
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Tuple, Union
+
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+OFFICE_DOCUMENT_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+DEFAULT_DOCUMENT_PART = 'word/document.xml'
+
+# Tag names used while walking the body
+W_P = f'{W_NS}p'
+W_R = f'{W_NS}r'
+W_HYPERLINK = f'{W_NS}hyperlink'
+W_TBL = f'{W_NS}tbl'
+W_TBL_GRID = f'{W_NS}tblGrid'
+W_GRID_COL = f'{W_NS}gridCol'
+W_TR = f'{W_NS}tr'
+W_TC = f'{W_NS}tc'
+W_TC_PR = f'{W_NS}tcPr'
+W_GRID_SPAN = f'{W_NS}gridSpan'
+W_V_MERGE = f'{W_NS}vMerge'
+W_VAL = f'{W_NS}val'
+W_TYPE = f'{W_NS}type'
+
+# Run inner-content elements and their plain-text equivalents
+RUN_TEXT_TAGS = {
+    f'{W_NS}tab': '\t',
+    f'{W_NS}ptab': '\t',
+    f'{W_NS}cr': '\n',
+    f'{W_NS}noBreakHyphen': '-',
+}
+W_T = f'{W_NS}t'
+W_BR = f'{W_NS}br'
+
+
+def iter_docx_text(source: Union[str, object]) -> Iterator[Tuple[object, str]]:
+    """
+    Yield (line_ref, text) pairs from a .docx file using incremental XML parsing
+
+    Output matches what python-docx produces for ``doc.paragraphs`` followed by
+    ``doc.tables``: body paragraphs are numbered from 1 (empty ones included
+    in the numbering), table cells use ``table-<row_idx>`` and merged cells are
+    repeated the same way python-docx repeats them.
+
+    Args:
+        source: Path or binary file-like object of the .docx package
+
+    Yields:
+        Tuple of line reference and stripped, non-empty text
+    """
+    with zipfile.ZipFile(source) as package:
+        part_name = _main_document_part(package)
+
+        with package.open(part_name) as xml_stream:
+            depth = 0
+            para_idx = 0
+            body = None
+            table = None
+            table_texts: List[Tuple[str, str]] = []
+
+            for event, elem in ET.iterparse(xml_stream, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 2:
+                        body = elem
+                    elif depth == 3 and elem.tag == W_TBL:
+                        table = _TableState()
+                    continue
+
+                # Table grid and rows are consumed as soon as they close
+                if depth == 4 and table is not None:
+                    if elem.tag == W_TBL_GRID:
+                        table.col_count = sum(1 for child in elem if child.tag == W_GRID_COL)
+                    elif elem.tag == W_TR:
+                        table.add_row(elem)
+                        elem.clear()
+
+                elif depth == 3:
+                    if elem.tag == W_P:
+                        para_idx += 1
+                        text = _paragraph_text(elem).strip()
+                        if text:
+                            yield para_idx, text
+                    elif elem.tag == W_TBL and table is not None:
+                        table_texts.extend(table.iter_cell_texts())
+                        table = None
+
+                    # Drop processed body content so the tree never accumulates
+                    if body is not None:
+                        body.clear()
+
+                depth -= 1
+
+    # python-docx reports all body paragraphs before any table content
+    for line_ref, text in table_texts:
+        yield line_ref, text
+
+
+class _TableState:
+    """
+    Flat grid of cell texts for one body-level table, built row by row
+
+    The column count comes from ``w:tblGrid``. Tables written without a grid
+    keep each row as its own list, so the widest row sets the width, and a
+    merged-down cell copies the cell above it.
+    """
+
+    def __init__(self):
+        self.col_count = 0
+        self.row_count = 0
+        self.cells: List[str] = []
+        self.rows: List[List[str]] = []  # only used without a grid
+
+    def add_row(self, tr) -> None:
+        """Append the grid cells of a ``w:tr`` element, honouring spans and merges"""
+        self.row_count += 1
+        gridless = not self.col_count
+        above = self.rows[-1] if gridless and self.rows else []
+        cells = [] if gridless else self.cells
+
+        for tc in tr:
+            if tc.tag != W_TC:
+                continue
+            grid_span, v_merge = _cell_properties(tc)
+            for span_idx in range(grid_span):
+                if v_merge == 'continue':
+                    if gridless:
+                        cells.append(above[len(cells)] if len(cells) < len(above) else '')
+                    else:
+                        cells.append(cells[-self.col_count])
+                elif span_idx > 0:
+                    cells.append(cells[-1])
+                else:
+                    cells.append(_cell_text(tc))
+
+        if gridless:
+            self.rows.append(cells)
+
+    def iter_cell_texts(self) -> Iterator[Tuple[str, str]]:
+        """Yield (line_ref, text) for each non-empty cell, row by row"""
+        if self.rows:
+            rows = self.rows
+        else:
+            col_count = self.col_count
+            rows = (self.cells[start:start + col_count]
+                    for start in range(0, self.row_count * col_count, col_count))
+
+        for row_idx, row in enumerate(rows):
+            for text in row:
+                text = text.strip()
+                if text:
+                    yield f"table-{row_idx}", text
+
+
+def _main_document_part(package: zipfile.ZipFile) -> str:
+    """Resolve the main document part name from the package relationships"""
+    try:
+        with package.open('_rels/.rels') as rels:
+            for rel in ET.parse(rels).getroot().iter(f'{REL_NS}Relationship'):
+                if rel.get('Type') == OFFICE_DOCUMENT_REL:
+                    return posixpath.normpath(rel.get('Target', '').lstrip('/'))
+    except KeyError:
+        pass
+    return DEFAULT_DOCUMENT_PART
+
+
+def _cell_properties(tc) -> Tuple[int, object]:
+    """Return (grid_span, vMerge value) for a ``w:tc`` element"""
+    tc_pr = tc.find(W_TC_PR)
+    if tc_pr is None:
+        return 1, None
+
+    grid_span = tc_pr.find(W_GRID_SPAN)
+    v_merge = tc_pr.find(W_V_MERGE)
+
+    span = int(grid_span.get(W_VAL)) if grid_span is not None else 1
+    merge = v_merge.get(W_VAL, 'continue') if v_merge is not None else None
+    return span, merge
+
+
+def _cell_text(tc) -> str:
+    """Text of a table cell: its direct paragraphs joined by newlines"""
+    return '\n'.join(_paragraph_text(p) for p in tc if p.tag == W_P)
+
+
+def _paragraph_text(p) -> str:
+    """Text of a paragraph from its runs and hyperlinks"""
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(r) for r in child if r.tag == W_R)
+    return ''.join(parts)
+
+
+def _run_text(r) -> str:
+    """Text of a run, translating tabs, breaks and hyphens like python-docx"""
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or '')
+        elif tag == W_BR:
+            if child.get(W_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag in RUN_TEXT_TAGS:
+            parts.append(RUN_TEXT_TAGS[tag])
+    return ''.join(parts)
@@ -0,0 +1,110 @@
+"""
+Fixed-Point Amounts for Lynx Crypto Converter
+Exact conversion between USD cents and asset base units (satoshi, wei, ...)
+"""
+
+from decimal import Decimal
+from typing import Dict, Union
+
+
+USD_DECIMALS = 2
+
+
+class Asset:
+    """Precision metadata: amounts are integers of 10**-decimals of one coin"""
+
+    __slots__ = ('code', 'decimals', 'unit')
+
+    def __init__(self, code: str, decimals: int, unit: str):
+        self.code = code
+        self.decimals = decimals
+        self.unit = unit
+
+
+# Smallest units as the networks define them; tokens use their contract decimals
+ASSETS: Dict[str, Asset] = {asset.code: asset for asset in (
+    Asset('USD', USD_DECIMALS, 'cent'),
+    Asset('BTC', 8, 'satoshi'),
+    Asset('ETH', 18, 'wei'),
+    Asset('USDT', 6, 'micro-USDT'),
+    Asset('USDC', 6, 'micro-USDC'),
+    Asset('EURC', 6, 'micro-EURC'),
+    Asset('DAI', 18, 'wei'),
+    Asset('SOL', 9, 'lamport'),
+    Asset('BCH', 8, 'satoshi'),
+    Asset('LTC', 8, 'litoshi'),
+    Asset('DOGE', 8, 'koinu'),
+    Asset('XRP', 6, 'drop'),
+    Asset('ADA', 6, 'lovelace'),
+    Asset('TRX', 6, 'sun'),
+    Asset('DOT', 10, 'planck'),
+    Asset('XLM', 7, 'stroop'),
+    Asset('XMR', 12, 'piconero'),
+    Asset('ATOM', 6, 'uatom'),
+    Asset('TON', 9, 'nanoton'),
+    Asset('BNB', 18, 'wei'),
+    Asset('MATIC', 18, 'wei'),
+    Asset('AVAX', 18, 'wei'),
+    Asset('LINK', 18, 'wei'),
+    Asset('UNI', 18, 'wei'),
+)}
+
+# Precision for assets without metadata
+DEFAULT_DECIMALS = 8
+
+
+def get_asset(code: str) -> Asset:
+    """Precision metadata for a currency code"""
+    code = code.upper()
+    return ASSETS.get(code) or Asset(code, DEFAULT_DECIMALS, 'unit')
+
+
+def rescale(units: int, from_decimals: int, to_decimals: int) -> int:
+    """Change the precision of an integer amount, rounding down when dropping digits"""
+    if to_decimals >= from_decimals:
+        return units * 10 ** (to_decimals - from_decimals)
+    return units // 10 ** (from_decimals - to_decimals)
+
+
+def to_units(value: Union[Decimal, str, int], decimals: int) -> int:
+    """Exact integer amount of a decimal value, rounded down to the precision"""
+    numerator, denominator = Decimal(value).as_integer_ratio()
+    return numerator * 10 ** decimals // denominator
+
+
+def to_decimal(units: int, decimals: int) -> Decimal:
+    """Exact Decimal value of an integer amount"""
+    return Decimal(units).scaleb(-decimals)
+
+
+class UnitRate:
+    """
+    USD price of an asset as an exact integer ratio
+
+    base units = cents * numerator // denominator, so a conversion is one
+    integer multiply and divide with no float or Decimal rounding. Results
+    are rounded down, so a conversion never yields more than was paid for.
+    """
+
+    __slots__ = ('asset', 'numerator', 'denominator')
+
+    def __init__(self, asset: Asset, usd_price: Union[Decimal, str]):
+        """
+        Args:
+            asset: Precision metadata of the priced asset
+            usd_price: USD per whole coin; must be positive
+        """
+        price_num, price_den = Decimal(usd_price).as_integer_ratio()
+        if price_num <= 0:
+            raise ValueError(f"Price of {asset.code} must be positive, got {usd_price}")
+
+        # units = cents / 10**2 / price * 10**decimals
+        self.asset = asset
+        self.numerator = price_den * 10 ** asset.decimals
+        self.denominator = price_num * 10 ** USD_DECIMALS
+
+    def to_base_units(self, cents: int) -> int:
+        return cents * self.numerator // self.denominator
+
+    def to_cents(self, base_units: int) -> int:
+        return base_units * self.denominator // self.numerator
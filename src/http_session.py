@@ -0,0 +1,120 @@
+"""
+Pooled HTTP Session for Lynx Crypto Converter
+Keep-alive connections, bounded retries and split timeouts for upstream APIs
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from logger import converter_logger
+
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PooledSession:
+    """
+    requests.Session with a keep-alive connection pool and retry policy
+
+    Connections are reused across refreshes, so only the first request to
+    a host pays the TCP/TLS handshake. Failed attempts are retried up to
+    max_retries times with full-jitter exponential backoff.
+    """
+
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 10,
+                 max_retries: int = 2, backoff_base: float = 0.25, backoff_cap: float = 4.0,
+                 pool_maxsize: int = 10):
+        """
+        Args:
+            connect_timeout: Seconds to wait for a TCP/TLS connection, per attempt
+            read_timeout: Seconds to wait between response bytes, per attempt
+            max_retries: Extra attempts after the first failure
+            backoff_base: First backoff ceiling in seconds; doubles per retry
+            backoff_cap: Upper bound on any single backoff
+            pool_maxsize: Connections kept alive per host
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def get_json(self, url: str, params: Optional[Dict] = None):
+        """
+        GET a JSON document, retrying transient failures
+
+        Raises:
+            requests.RequestException: When every attempt failed
+        """
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.attempts += 1
+                if attempt:
+                    self.retries += 1
+
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    converter_logger.warning(f"Upstream returned {response.status_code}, retrying")
+                    response.close()
+                else:
+                    response.raise_for_status()
+                    return response.json()
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                converter_logger.warning(f"Upstream request failed ({e.__class__.__name__}), retrying")
+
+            except requests.RequestException:
+                with self._lock:
+                    self.failures += 1
+                raise
+
+            time.sleep(self._backoff(attempt))
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry number"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def get_stats(self) -> Dict:
+        """Attempt, retry and connection reuse counters"""
+        with self._lock:
+            stats = {
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'failures': self.failures
+            }
+
+        # urllib3 pools count connections created and requests sent
+        opened = 0
+        served = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                served += pool.num_requests
+
+        stats['connections_opened'] = opened
+        stats['connections_reused'] = max(served - opened, 0)
+        return stats
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
@@ -0,0 +1,163 @@
+"""
+Parse Cache for Lynx Crypto Converter
+Caches parsed balances by SHA-256 of the uploaded file contents
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from balance_set import BalanceSet
+from logger import converter_logger
+
+
+# Bump when extraction rules change so stale on-disk entries are ignored
+CACHE_VERSION = 3
+
+
+class ParseCache:
+    """Bounded in-memory LRU of parse results with optional on-disk store"""
+
+    def __init__(self, max_entries: int = 128, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Ensure disk store exists when enabled
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Return the SHA-256 hex digest of a file's bytes"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def bytes_digest(data: bytes) -> str:
+        """Return the SHA-256 hex digest of in-memory file contents"""
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, digest: str) -> Optional[BalanceSet]:
+        """
+        Look up parsed balances for a content digest
+
+        Args:
+            digest: SHA-256 hex digest of the file contents
+
+        Returns:
+            BalanceSet (treat as read-only), or None on a cache miss
+        """
+        with self._lock:
+            balances = self._entries.get(digest)
+            if balances is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return balances
+
+        balances = self._load_from_disk(digest)
+
+        with self._lock:
+            if balances is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(digest, balances)
+            return balances
+
+    def put(self, digest: str, balances: BalanceSet) -> None:
+        """Cache parsed balances for a content digest"""
+        with self._lock:
+            self._store(digest, balances)
+
+        self._save_to_disk(digest, balances)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.disk_hits = 0
+
+    def get_stats(self) -> Dict:
+        """Get cache hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_store': self.disk_dir
+            }
+
+    def _store(self, digest: str, balances: BalanceSet) -> None:
+        """Insert into the LRU, evicting the least recently used entry (lock held)"""
+        self._entries[digest] = balances
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, digest: str) -> str:
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def _load_from_disk(self, digest: str) -> Optional[BalanceSet]:
+        """Load a cached parse result from the disk store"""
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(digest)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            if data.get('version') != CACHE_VERSION:
+                return None
+
+            return BalanceSet.from_dict(data['balances'])
+
+        except Exception as e:
+            converter_logger.error(f"Failed to load parse cache entry {digest}: {e}")
+            return None
+
+    def _save_to_disk(self, digest: str, balances: BalanceSet) -> None:
+        """Write a parse result to the disk store atomically"""
+        if not self.disk_dir:
+            return
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'version': CACHE_VERSION, 'balances': balances.to_dict()}, f)
+                os.replace(tmp_path, self._disk_path(digest))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            converter_logger.error(f"Failed to save parse cache entry {digest}: {e}")
+
+
+# Global parse cache instance
+parse_cache = ParseCache(
+    max_entries=int(os.getenv('PARSE_CACHE_SIZE', '128')),
+    disk_dir=os.getenv('PARSE_CACHE_DIR')
+)
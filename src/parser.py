@@ -1,31 +1,77 @@
 """
 Balance File Parser for Lynx Crypto Converter
-Extracts numeric balance values from .docx/.dox files
+Extracts numeric balance values from .docx/.dox documents and CSV/XLSX exports
 """
 
 from docx import Document
-import re
 from decimal import Decimal
-from typing import List, Dict, Optional
+import io
+from typing import Iterator, List, Dict, Optional, Tuple
 import os
+from docx_stream import iter_docx_text
+from tabular_stream import iter_csv_text, iter_xlsx_text, tokenize_cell
+from tokenizer import tokenize_amounts
+from balance_set import BalanceSet
+from balance_stats import BalanceStats
+
+
+# Row-streaming backends for tabular exports, keyed by file extension.
+# Each takes a path or binary stream and yields (line_ref, text) pairs,
+# read with tokenize_cell() so exact numeric cells keep their precision.
+TABULAR_BACKENDS = {
+    '.csv': iter_csv_text,
+    '.xlsx': iter_xlsx_text,
+}
+DOCUMENT_EXTENSIONS = ['.docx', '.dox']
+SUPPORTED_EXTENSIONS = DOCUMENT_EXTENSIONS + list(TABULAR_BACKENDS)
 
 
 class BalanceParser:
     """Parse balance information from document files"""
     
-    def __init__(self, file_path: str):
+    # Document tokenizer; _validate_file() switches tabular files to tokenize_cell
+    _tokenize = staticmethod(tokenize_amounts)
+    
+    def __init__(self, file_path: str, streaming: bool = False, file_data=None,
+                 percentiles: bool = False):
+        """
+        Args:
+            file_path: Path to balance file, or its original name when
+                file_data is given
+            streaming: Read the document XML incrementally instead of
+                loading it through the python-docx object model
+            file_data: Raw file bytes or binary file-like object to parse
+                in memory instead of reading file_path from disk
+            percentiles: Also estimate p50/p90/p99 in get_summary()
+        """
         self.file_path = file_path
+        self.streaming = streaming
+        self.file_data = file_data
         self.balances = []
+        self.stats = BalanceStats(track_percentiles=percentiles)
         self._validate_file()
     
     def _validate_file(self) -> None:
         """Validate file exists and has correct extension"""
-        if not os.path.exists(self.file_path):
+        if self.file_data is None and not os.path.exists(self.file_path):
             raise FileNotFoundError(f"File not found: {self.file_path}")
         
         ext = os.path.splitext(self.file_path)[1].lower()
-        if ext not in ['.docx', '.dox']:
-            raise ValueError(f"Invalid file type: {ext}. Expected .docx or .dox")
+        if ext not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Invalid file type: {ext}. Expected one of: {', '.join(SUPPORTED_EXTENSIONS)}")
+        self.extension = ext
+        self._tokenize = tokenize_cell if ext in TABULAR_BACKENDS else tokenize_amounts
+    
+    def _open_source(self):
+        """Path or binary stream to hand to the parsing engine"""
+        if self.file_data is None:
+            return self.file_path
+        
+        if isinstance(self.file_data, (bytes, bytearray, memoryview)):
+            return io.BytesIO(self.file_data)
+        
+        self.file_data.seek(0)
+        return self.file_data
     
     def parse(self) -> List[Dict]:
         """
@@ -38,31 +84,98 @@ class BalanceParser:
             - context: Surrounding text
             - line_number: Line position in document
         """
+        self.balances.extend(self.iter_balances())
+        return self.balances
+    
+    def iter_balances(self) -> Iterator[Dict]:
+        """
+        Lazily yield balances as they are discovered in the document
+        
+        Running statistics are updated as each balance is yielded, so
+        get_total() and get_summary() are available after a single pass
+        without keeping the balances in memory.
+        
+        Yields:
+            Balance dictionaries in the same format as parse()
+        """
         try:
-            doc = Document(self.file_path)
-            
-            for idx, para in enumerate(doc.paragraphs, 1):
-                text = para.text.strip()
-                if text:
-                    numbers = self._extract_numbers(text, idx)
-                    if numbers:
-                        self.balances.extend(numbers)
-            
-            # Also check tables
-            for table in doc.tables:
-                for row_idx, row in enumerate(table.rows):
-                    for cell in row.cells:
-                        text = cell.text.strip()
-                        if text:
-                            numbers = self._extract_numbers(text, f"table-{row_idx}")
-                            if numbers:
-                                self.balances.extend(numbers)
-            
-            return self.balances
+            for line_ref, text in self._iter_text():
+                for balance in self._extract_numbers(text, line_ref):
+                    self.stats.add(balance['value_decimal'])
+                    yield balance
         
         except Exception as e:
             raise Exception(f"Error parsing document: {str(e)}")
     
+    def parse_compact(self) -> BalanceSet:
+        """
+        Extract numeric balances into a compact array-backed BalanceSet
+        
+        Balances are only materialized as dicts when the set is iterated
+        or converted with to_list(), e.g. for JSON output.
+        
+        Returns:
+            BalanceSet with the same balances, in the same order, as parse()
+        """
+        balance_set = BalanceSet()
+        
+        try:
+            for line_ref, text in self._iter_text():
+                segment = None
+                for value_str, symbol, start, end in self._tokenize(text):
+                    if segment is None:
+                        segment = balance_set.add_segment(line_ref, text)
+                    balance_set.add(segment, value_str, symbol, start, end)
+                    self.stats.add(value_str)
+        
+        except Exception as e:
+            raise Exception(f"Error parsing document: {str(e)}")
+        
+        return balance_set
+    
+    def scan(self) -> Dict:
+        """
+        Compute summary statistics without keeping any balances
+        
+        Returns:
+            Summary in the same format as get_summary()
+        """
+        try:
+            for _, text in self._iter_text():
+                for value_str, _, _, _ in self._tokenize(text):
+                    self.stats.add(value_str)
+        
+        except Exception as e:
+            raise Exception(f"Error parsing document: {str(e)}")
+        
+        return self.get_summary()
+    
+    def _iter_text(self) -> Iterator[Tuple[object, str]]:
+        """Yield (line_ref, text) pairs from the selected parsing engine"""
+        backend = TABULAR_BACKENDS.get(self.extension)
+        if backend:
+            return backend(self._open_source())
+        if self.streaming:
+            return iter_docx_text(self._open_source())
+        return self._iter_document_text()
+    
+    def _iter_document_text(self) -> Iterator[Tuple[object, str]]:
+        """Yield (line_ref, text) pairs using the python-docx object model"""
+        doc = Document(self._open_source())
+        
+        for idx, para in enumerate(doc.paragraphs, 1):
+            text = para.text.strip()
+            if text:
+                yield idx, text
+        
+        # Also check tables
+        for table in doc.tables:
+            for row_idx, row in enumerate(table.rows):
+                for cell in row.cells:
+                    text = cell.text.strip()
+                    if text:
+                        yield f"table-{row_idx}", text
+    
     def _extract_numbers(self, text: str, line_ref) -> List[Dict]:
         """
         Extract numeric values with optional currency symbols
@@ -75,78 +188,22 @@ class BalanceParser:
         """
         results = []
         
-        # Pattern for currency symbols and numbers
-        # Matches: $1,234.56 or €1.234,56 or 1234.56
-        pattern = r'([$€£¥₹]?\s*\d{1,3}(?:[,.\s]\d{3})*(?:[.,]\d{2})?)'
-        
-        matches = re.finditer(pattern, text)
-        
-        for match in matches:
-            raw_value = match.group(1)
-            
-            # Extract currency symbol if present
-            currency_match = re.match(r'^([$€£¥₹])', raw_value)
-            currency_symbol = currency_match.group(1) if currency_match else None
-            
-            # Clean number string
-            num_str = re.sub(r'[$€£¥₹\s]', '', raw_value)
-            
-            # Handle different decimal separators
-            # If comma is decimal separator (European format)
-            if ',' in num_str and '.' in num_str:
-                # Assume dot is thousands separator, comma is decimal
-                if num_str.rindex(',') > num_str.rindex('.'):
-                    num_str = num_str.replace('.', '').replace(',', '.')
-                else:
-                    num_str = num_str.replace(',', '')
-            elif ',' in num_str:
-                # Check if it's likely a decimal separator
-                parts = num_str.split(',')
-                if len(parts) == 2 and len(parts[1]) == 2:
-                    num_str = num_str.replace(',', '.')
-                else:
-                    num_str = num_str.replace(',', '')
-            
-            try:
-                value = Decimal(num_str)
-                
-                # Filter out unrealistic values (too small or suspiciously large)
-                if value >= Decimal('0.01') and value <= Decimal('999999999999'):
-                    results.append({
-                        'value': float(value),  # Convert to float for JSON serialization
-                        'value_decimal': str(value),  # Keep string representation
-                        'currency_symbol': currency_symbol,
-                        'original_text': match.group(0),
-                        'context': text,
-                        'line_ref': line_ref
-                    })
-            except (ValueError, Exception):
-                # Skip invalid numbers
-                continue
+        for value_str, currency_symbol, start, end in self._tokenize(text):
+            results.append({
+                'value': float(value_str),  # Convert to float for JSON serialization
+                'value_decimal': value_str,  # Keep string representation
+                'currency_symbol': currency_symbol,
+                'original_text': text[start:end],
+                'context': text,
+                'line_ref': line_ref
+            })
         
         return results
     
     def get_total(self) -> Decimal:
         """Calculate total of all extracted balances"""
-        return sum(Decimal(b['value_decimal']) for b in self.balances)
+        return self.stats.total
     
     def get_summary(self) -> Dict:
         """Get summary statistics of parsed balances"""
-        if not self.balances:
-            return {
-                'total_values_found': 0,
-                'total_sum': 0,
-                'min_value': 0,
-                'max_value': 0,
-                'avg_value': 0
-            }
-        
-        values = [Decimal(b['value_decimal']) for b in self.balances]
-        
-        return {
-            'total_values_found': len(self.balances),
-            'total_sum': float(sum(values)),
-            'min_value': float(min(values)),
-            'max_value': float(max(values)),
-            'avg_value': float(sum(values) / len(values))
-        }
+        return self.stats.to_summary()
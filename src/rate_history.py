@@ -0,0 +1,322 @@
+"""
+Rate History for Lynx Crypto Converter
+Append-only, memory-mapped record of fetched rates with point-in-time lookup
+"""
+
+import fcntl
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Dict, List, Mapping, Optional, Sequence
+from logger import converter_logger
+
+
+# File layout (little-endian):
+#   header:  magic (8 bytes), column count (uint32), reserved (uint32),
+#            one 16-byte ASCII currency code per column
+#   records: fetched_at epoch seconds (float64), then one float64 USD rate
+#            per column (NaN where the currency was not priced)
+MAGIC = b'LXRHIST1'
+HEADER = struct.Struct('<8sII')
+CODE_SIZE = 16
+
+
+class _Timestamps:
+    """Sequence view of the record timestamps, so bisect can search the file"""
+
+    __slots__ = ('buf', 'offset', 'size', 'count')
+
+    def __init__(self, buf, offset: int, size: int, count: int):
+        self.buf = buf
+        self.offset = offset
+        self.size = size
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> float:
+        return struct.unpack_from('<d', self.buf, self.offset + index * self.size)[0]
+
+
+def _filter_currencies(records: List[Dict], currencies: Optional[Sequence[str]]) -> List[Dict]:
+    """Restrict each record's rates to the given currency codes"""
+    if currencies:
+        wanted = {c.strip().upper() for c in currencies}
+        for record in records:
+            record['rates'] = {c: r for c, r in record['rates'].items() if c in wanted}
+    return records
+
+
+class RateHistory:
+    """
+    Time-indexed history of fetched rates in one fixed-width binary file
+
+    Records are appended in timestamp order, so the file is sorted and a
+    point-in-time lookup is a binary search over the memory-mapped records
+    (O(log n)) rather than a scan. Old records are thinned by compact():
+    beyond downsample_after only the last record per downsample_interval
+    is kept, and beyond retention records are dropped.
+
+    Writes (append, rewrite, compact) hold an exclusive lock on a sidecar
+    ``.lock`` file, so several processes can share one history file.
+    Appends may rewrite the file and trigger compact(); RateService runs
+    them on its background writer, off the fetch path.
+    """
+
+    def __init__(self, history_file: str = "data/rate_history.bin",
+                 retention_days: float = 90, downsample_after_hours: float = 24,
+                 downsample_interval_minutes: float = 60, compact_every_minutes: float = 60):
+        """
+        Args:
+            history_file: Binary history file
+            retention_days: Drop records older than this (0 keeps everything)
+            downsample_after_hours: Thin records older than this
+            downsample_interval_minutes: Keep one record per interval when thinning
+            compact_every_minutes: How often appends trigger compact()
+        """
+        self.history_file = history_file
+        self.retention = retention_days * 86400
+        self.downsample_after = downsample_after_hours * 3600
+        self.downsample_interval = downsample_interval_minutes * 60
+        self.compact_every = compact_every_minutes * 60
+        self.lock_file = f"{history_file}.lock"
+
+        self._columns: List[str] = []
+        self._record = None
+        self._header_size = 0
+        self._map = None
+        self._map_key = None  # (inode, size) of the mapped file
+        self._last_compact = time.time()
+        self._lock = threading.Lock()
+
+        # Ensure data directory exists
+        os.makedirs(os.path.dirname(os.path.abspath(self.history_file)), exist_ok=True)
+
+    def append(self, fetched_at: float, rates: Mapping[str, Decimal]) -> bool:
+        """
+        Record the rates fetched at fetched_at
+
+        Returns:
+            False when the record is not newer than the last one (the file
+            stays sorted, so out-of-order records are skipped)
+        """
+        with self._lock, self._file_lock():
+            self._remap()
+            view = self._timestamps()
+            if view is not None and len(view) and fetched_at <= view[len(view) - 1]:
+                return False
+
+            new_columns = [c for c in sorted(rates) if c not in self._columns]
+            if new_columns or self._map is None:
+                # Universe grew (or first record): rewrite with the extra columns
+                records = self._read_records(0, len(view)) if view else []
+                self._rewrite(self._columns + new_columns, records)
+
+            values = [float(rates[c]) if c in rates else math.nan for c in self._columns]
+            try:
+                with open(self.history_file, 'ab') as f:
+                    f.write(self._record.pack(fetched_at, *values))
+            except OSError as e:
+                converter_logger.error(f"Failed to append rate history: {e}")
+                return False
+
+        if self.compact_every and time.time() - self._last_compact >= self.compact_every:
+            self.compact()
+        return True
+
+    def at(self, timestamp: float, currencies: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """
+        Rates in effect at timestamp: the last record at or before it
+
+        Returns:
+            Dict with fetched_at and rates, or None when the history starts later
+        """
+        with self._lock:
+            self._remap()
+            view = self._timestamps()
+            if not view:
+                return None
+            index = bisect_right(view, timestamp) - 1
+            if index < 0:
+                return None
+            records = self._read_records(index, index + 1)
+        return _filter_currencies(records, currencies)[0]
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None,
+              currencies: Optional[Sequence[str]] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Records with start <= fetched_at <= end, oldest first
+
+        Args:
+            start: Lower bound in epoch seconds (None: from the beginning)
+            end: Upper bound in epoch seconds (None: up to the latest)
+            currencies: Only include these currency codes
+            limit: Return at most this many records (the most recent ones)
+        """
+        with self._lock:
+            self._remap()
+            view = self._timestamps()
+            if not view:
+                return []
+            first = bisect_left(view, start) if start is not None else 0
+            last = bisect_right(view, end) if end is not None else len(view)
+            if limit is not None:
+                first = max(first, last - limit)
+            records = self._read_records(first, last)
+        return _filter_currencies(records, currencies)
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """
+        Apply the retention and downsampling policy
+
+        Returns:
+            Number of records removed
+        """
+        now = now if now is not None else time.time()
+        with self._lock, self._file_lock():
+            self._last_compact = now
+            self._remap()
+            view = self._timestamps()
+            if not view:
+                return 0
+
+            kept = []
+            bucket_of_kept = None
+            for record in self._read_records(0, len(view)):
+                age = now - record['fetched_at']
+                if self.retention and age > self.retention:
+                    continue
+                if self.downsample_interval and age > self.downsample_after:
+                    bucket = record['fetched_at'] // self.downsample_interval
+                    if kept and bucket == bucket_of_kept:
+                        kept[-1] = record  # keep the last record of each bucket
+                        continue
+                    bucket_of_kept = bucket
+                else:
+                    bucket_of_kept = None
+                kept.append(record)
+
+            removed = len(view) - len(kept)
+            if removed:
+                self._rewrite(self._columns, kept)
+                converter_logger.info(f"Compacted rate history: removed {removed} of {len(view)} records")
+            return removed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._remap()
+            view = self._timestamps()
+            count = len(view) if view else 0
+            return {
+                'file': self.history_file,
+                'records': count,
+                'currencies': list(self._columns),
+                'oldest': view[0] if count else None,
+                'newest': view[count - 1] if count else None,
+                'bytes': self._header_size + count * self._record.size if self._record else 0
+            }
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process writing this history file"""
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _remap(self) -> None:
+        """Map the file again if it grew or was replaced by compaction (lock held)"""
+        try:
+            stat = os.stat(self.history_file)
+        except FileNotFoundError:
+            self._close_map()
+            return
+
+        key = (stat.st_ino, stat.st_size)
+        if key == self._map_key:
+            return
+
+        self._close_map()
+        if stat.st_size < HEADER.size:
+            return
+
+        with open(self.history_file, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, _ = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            buf.close()
+            raise ValueError(f"{self.history_file} is not a rate history file")
+
+        self._columns = [
+            buf[HEADER.size + i * CODE_SIZE:HEADER.size + (i + 1) * CODE_SIZE].rstrip(b'\0').decode('ascii')
+            for i in range(count)
+        ]
+        self._record = struct.Struct(f'<{count + 1}d')
+        self._header_size = HEADER.size + count * CODE_SIZE
+        self._map = buf
+        self._map_key = key
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._map_key = None
+
+    def _timestamps(self) -> Optional[_Timestamps]:
+        if self._map is None:
+            return None
+        count = (len(self._map) - self._header_size) // self._record.size
+        return _Timestamps(self._map, self._header_size, self._record.size, count)
+
+    def _read_records(self, first: int, last: int) -> List[Dict]:
+        """Decode records [first, last) from the mapped file (lock held)"""
+        records = []
+        for index in range(first, last):
+            fetched_at, *values = self._record.unpack_from(
+                self._map, self._header_size + index * self._record.size
+            )
+            records.append({
+                'fetched_at': fetched_at,
+                'rates': {c: v for c, v in zip(self._columns, values) if not math.isnan(v)}
+            })
+        return records
+
+    def _rewrite(self, columns: List[str], records: List[Dict]) -> None:
+        """Atomically replace the file with the given columns and records (both locks held)"""
+        record = struct.Struct(f'<{len(columns) + 1}d')
+        fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.history_file)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, len(columns), 0))
+                for code in columns:
+                    f.write(code.encode('ascii')[:CODE_SIZE].ljust(CODE_SIZE, b'\0'))
+                for entry in records:
+                    rates = entry['rates']
+                    f.write(record.pack(entry['fetched_at'], *(rates.get(c, math.nan) for c in columns)))
+            os.replace(temp_file, self.history_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
+
+        self._close_map()
+        self._remap()
+
+
+# Global rate history instance
+rate_history = RateHistory(
+    os.getenv('RATE_HISTORY_FILE', 'data/rate_history.bin'),
+    retention_days=float(os.getenv('RATE_HISTORY_RETENTION_DAYS', '90')),
+    downsample_after_hours=float(os.getenv('RATE_HISTORY_DOWNSAMPLE_AFTER_HOURS', '24')),
+    downsample_interval_minutes=float(os.getenv('RATE_HISTORY_DOWNSAMPLE_MINUTES', '60'))
+)
@@ -0,0 +1,406 @@
+"""
+Rate Providers for Lynx Crypto Converter
+Upstream price sources and hedged fetching across them
+"""
+
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from http_session import PooledSession
+from logger import converter_logger
+
+
+# CoinGecko identifies assets by id rather than ticker; extend per deployment
+# with TICKER=coingecko-id entries in RATE_CURRENCIES
+COINGECKO_IDS = {
+    'BTC': 'bitcoin', 'ETH': 'ethereum', 'USDT': 'tether', 'SOL': 'solana',
+    'USDC': 'usd-coin', 'BNB': 'binancecoin', 'XRP': 'ripple', 'ADA': 'cardano',
+    'DOGE': 'dogecoin', 'TRX': 'tron', 'DOT': 'polkadot', 'MATIC': 'matic-network',
+    'LTC': 'litecoin', 'BCH': 'bitcoin-cash', 'LINK': 'chainlink', 'AVAX': 'avalanche-2',
+    'XLM': 'stellar', 'ATOM': 'cosmos', 'XMR': 'monero', 'ETC': 'ethereum-classic',
+    'UNI': 'uniswap', 'DAI': 'dai', 'EURC': 'euro-coin', 'SHIB': 'shiba-inu',
+    'TON': 'the-open-network', 'NEAR': 'near', 'APT': 'aptos', 'ARB': 'arbitrum',
+    'OP': 'optimism', 'FIL': 'filecoin', 'ALGO': 'algorand', 'AAVE': 'aave'
+}
+
+# Shared pool for the batched requests of all providers
+_batch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='rate-batch')
+
+
+def parse_currencies(spec: str) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Parse a currency universe such as "BTC,ETH,PEPE=pepe"
+
+    Returns:
+        Tuple of (ticker list, CoinGecko id overrides)
+    """
+    currencies = []
+    coin_ids = {}
+    for entry in spec.split(','):
+        ticker, _, coin_id = entry.strip().partition('=')
+        ticker = ticker.strip().upper()
+        if not ticker or ticker in currencies:
+            continue
+        currencies.append(ticker)
+        if coin_id.strip():
+            coin_ids[ticker] = coin_id.strip()
+    return currencies, coin_ids
+
+
+def split_batches(items: Sequence[str], max_batch: Optional[int]) -> List[List[str]]:
+    """Split items into the fewest batches of at most max_batch, sized evenly"""
+    items = list(items)
+    if not max_batch or len(items) <= max_batch:
+        return [items]
+
+    count = math.ceil(len(items) / max_batch)
+    size = math.ceil(len(items) / count)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class RateProvider:
+    """
+    Base class for an upstream source of USD prices
+
+    Subclasses implement fetch_batch(); fetch() splits the currency list
+    into batches of at most max_batch, requests them concurrently and
+    merges whatever batches succeed.
+    """
+
+    name = 'provider'
+    default_url = ''
+    max_batch: Optional[int] = None  # None: the whole universe in one request
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or self.default_url
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+        self.last_latency_ms = None
+
+    def fetch(self, http: PooledSession, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        """
+        Fetch USD prices for the given currency codes
+
+        Returns:
+            Dict of currency code to USD price; may omit currencies the
+            provider does not list or whose batch failed
+
+        Raises:
+            Exception: The first batch error, when every batch failed
+        """
+        batches = split_batches(currencies, self.max_batch)
+        if len(batches) == 1:
+            return self.fetch_batch(http, batches[0])
+
+        rates = {}
+        errors = []
+        futures = [_batch_executor.submit(self.fetch_batch, http, batch) for batch in batches]
+        for future in futures:
+            try:
+                rates.update(future.result())
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            if len(errors) == len(batches):
+                raise errors[0]
+            converter_logger.warning(f"{self.name}: {len(errors)} of {len(batches)} rate batches failed")
+        return rates
+
+    def fetch_batch(self, http: PooledSession, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        """Fetch USD prices for one batch of currency codes"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        return {
+            'url': self.url,
+            'requests': self.requests,
+            'wins': self.wins,
+            'failures': self.failures,
+            'last_latency_ms': self.last_latency_ms
+        }
+
+
+class CoinGeckoProvider(RateProvider):
+    """CoinGecko /simple/price"""
+
+    name = 'coingecko'
+    default_url = "https://api.coingecko.com/api/v3/simple/price"
+    max_batch = 100
+
+    def __init__(self, url: Optional[str] = None, coin_ids: Optional[Dict[str, str]] = None):
+        super().__init__(url)
+        self.coin_ids = {**COINGECKO_IDS, **(coin_ids or {})}
+
+    def fetch_batch(self, http: PooledSession, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        ids = {self.coin_ids[c]: c for c in currencies if c in self.coin_ids}
+        if not ids:
+            return {}
+        data = http.get_json(self.url, params={'ids': ','.join(ids), 'vs_currencies': 'usd'})
+
+        rates = {}
+        for api_name, currency_code in ids.items():
+            if api_name in data and 'usd' in data[api_name]:
+                rates[currency_code] = Decimal(str(data[api_name]['usd']))
+        return rates
+
+
+class CoinbaseProvider(RateProvider):
+    """Coinbase /v2/exchange-rates (units per USD, inverted to USD prices)"""
+
+    name = 'coinbase'  # one request returns every listed currency
+    default_url = "https://api.coinbase.com/v2/exchange-rates"
+
+    def fetch_batch(self, http: PooledSession, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        data = http.get_json(self.url, params={'currency': 'USD'})
+        quoted = data.get('data', {}).get('rates', {})
+
+        rates = {}
+        for currency in currencies:
+            per_usd = quoted.get(currency)
+            if per_usd and Decimal(per_usd) > 0:
+                rates[currency] = (1 / Decimal(per_usd)).quantize(Decimal('0.00000001'))
+        return rates
+
+
+class CryptoCompareProvider(RateProvider):
+    """CryptoCompare /data/pricemulti"""
+
+    name = 'cryptocompare'
+    default_url = "https://min-api.cryptocompare.com/data/pricemulti"
+    max_batch = 50  # fsyms is limited to 300 characters
+
+    def fetch_batch(self, http: PooledSession, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        data = http.get_json(self.url, params={'fsyms': ','.join(currencies), 'tsyms': 'USD'})
+
+        rates = {}
+        for currency in currencies:
+            price = data.get(currency, {}).get('USD')
+            if price is not None:
+                rates[currency] = Decimal(str(price))
+        return rates
+
+
+PROVIDERS = {
+    CoinGeckoProvider.name: CoinGeckoProvider,
+    CoinbaseProvider.name: CoinbaseProvider,
+    CryptoCompareProvider.name: CryptoCompareProvider,
+}
+
+
+def build_providers(names: str, coin_ids: Optional[Dict[str, str]] = None,
+                    base_url: Optional[str] = None) -> List[RateProvider]:
+    """
+    Instantiate providers from a comma-separated list of names
+
+    Args:
+        names: Provider names in order of preference
+        coin_ids: Extra CoinGecko ids by ticker
+        base_url: Send every provider's requests to this scheme and host
+            instead (e.g. a local stub price server), keeping their paths
+    """
+    providers = []
+    for name in names.split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown rate provider: {name}. Expected one of: {', '.join(PROVIDERS)}")
+
+        provider_class = PROVIDERS[name]
+        url = base_url.rstrip('/') + urlsplit(provider_class.default_url).path if base_url else None
+        if name == CoinGeckoProvider.name:
+            providers.append(CoinGeckoProvider(url, coin_ids=coin_ids))
+        else:
+            providers.append(provider_class(url))
+    return providers
+
+
+class HedgedFetcher:
+    """
+    Query providers in parallel and combine their answers
+
+    The first provider is asked immediately and each further provider is
+    added after hedge_delay without a complete answer, so a slow source
+    costs at most hedge_delay instead of a full timeout. Each provider has
+    a circuit breaker; providers whose circuit is open are skipped, so an
+    outage costs no upstream wait at all.
+
+    Strategies:
+        first: Return the first complete response
+        median: Ask every provider at once; after the first complete
+            response allow the others up to hedge_delay to answer, then
+            take the per-currency median of everything received
+    """
+
+    STRATEGIES = ('first', 'median')
+
+    def __init__(self, providers: List[RateProvider], http: PooledSession,
+                 hedge_delay: float = 0.5, strategy: str = 'first',
+                 failure_threshold: int = 3, reset_timeout: float = 30,
+                 max_reset_timeout: float = 600):
+        if not providers:
+            raise ValueError("At least one rate provider is required")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown rate aggregation: {strategy}. Expected one of: {', '.join(self.STRATEGIES)}")
+
+        self.providers = providers
+        self.http = http
+        self.hedge_delay = hedge_delay
+        self.strategy = strategy
+        self.last_source = None
+        self.breakers = {
+            provider: CircuitBreaker(provider.name, failure_threshold, reset_timeout, max_reset_timeout)
+            for provider in providers
+        }
+        self._executor = ThreadPoolExecutor(max_workers=len(providers) * 2, thread_name_prefix='rate-provider')
+        self._lock = threading.Lock()
+
+    def fetch(self, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        """
+        Fetch rates for currencies
+
+        Providers that answer for only part of the universe are kept: when
+        no provider returns every currency, their responses are merged.
+
+        Raises:
+            CircuitOpenError: When every provider's circuit is open
+            RuntimeError: When no provider returned any rates
+        """
+        pending = {}
+        responses = {}
+        errors = []
+        skipped = []
+        next_provider = 0
+        deadline = None
+        complete = False
+
+        while True:
+            # Median asks everyone up front; first-wins hedges one at a time
+            while next_provider < len(self.providers) and not complete:
+                provider = self.providers[next_provider]
+                next_provider += 1
+                if not self.breakers[provider].allow_request():
+                    skipped.append(provider.name)
+                    continue
+                pending[self._executor.submit(self._call, provider, currencies)] = provider
+                if self.strategy == 'first':
+                    break
+
+            if not pending:
+                break
+
+            if complete:
+                timeout = max(deadline - time.monotonic(), 0)
+            elif next_provider < len(self.providers):
+                timeout = self.hedge_delay
+            else:
+                timeout = None
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done and complete:
+                break
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    rates = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+
+                if not rates:
+                    errors.append(f"{provider.name}: empty response")
+                    continue
+
+                responses[provider] = rates
+                if not complete and all(currency in rates for currency in currencies):
+                    complete = True
+                    deadline = time.monotonic() + self.hedge_delay
+                    if self.strategy == 'first':
+                        # Return this answer, not an earlier partial one
+                        responses = {provider: rates}
+
+            if complete and (self.strategy == 'first' or not pending):
+                break
+
+        if not responses:
+            if skipped and not errors:
+                raise CircuitOpenError(f"Circuit open for {', '.join(skipped)}")
+            raise RuntimeError('; '.join(errors) or 'No rate provider responded')
+
+        return self._combine(responses, currencies)
+
+    def _call(self, provider: RateProvider, currencies: Sequence[str]) -> Dict[str, Decimal]:
+        start = time.perf_counter()
+        with self._lock:
+            provider.requests += 1
+        breaker = self.breakers[provider]
+        try:
+            rates = provider.fetch(self.http, currencies)
+        except Exception:
+            with self._lock:
+                provider.failures += 1
+            breaker.record_failure()
+            raise
+        else:
+            breaker.record_success()
+            return rates
+        finally:
+            provider.last_latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    def _combine(self, responses: Dict[RateProvider, Dict[str, Decimal]],
+                 currencies: Sequence[str]) -> Dict[str, Decimal]:
+        """Pick or merge responses according to the strategy"""
+        with self._lock:
+            for provider in responses:
+                provider.wins += 1
+
+        if len(responses) == 1:
+            provider, rates = next(iter(responses.items()))
+            self.last_source = provider.name
+            return dict(rates)
+
+        names = ','.join(p.name for p in responses)
+        if self.strategy == 'median':
+            self.last_source = f"median({names})"
+            combined = {}
+            for currency in currencies:
+                values = [rates[currency] for rates in responses.values() if currency in rates]
+                if values:
+                    combined[currency] = statistics.median(values)
+            return combined
+
+        # Only partial answers: earlier (preferred) providers win per currency
+        self.last_source = f"merged({names})"
+        combined = {}
+        for provider in sorted(responses, key=self.providers.index, reverse=True):
+            combined.update(responses[provider])
+        return combined
+
+    @property
+    def available(self) -> bool:
+        """True when at least one provider's circuit is closed"""
+        return any(breaker.available for breaker in self.breakers.values())
+
+    def retry_in(self) -> float:
+        """Seconds until the next provider may be probed (0 if one is usable now)"""
+        return min(breaker.retry_in() for breaker in self.breakers.values())
+
+    def get_stats(self) -> Dict:
+        return {
+            'strategy': self.strategy,
+            'hedge_delay_ms': self.hedge_delay * 1000,
+            'last_source': self.last_source,
+            'providers': {
+                p.name: {**p.get_stats(), 'circuit': self.breakers[p].get_stats()}
+                for p in self.providers
+            }
+        }
@@ -1,26 +1,119 @@
 """
 Rate Service for Lynx Crypto Converter
-Fetches live rates from CoinGecko API with fallback mechanism
+Fetches live rates from upstream price providers with fallback mechanism
 """
 
-import requests
 import json
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
 from logger import converter_logger
+from circuit_breaker import CircuitOpenError
+from cross_rates import CrossRateMatrix
+from http_session import PooledSession
+from rate_history import RateHistory, rate_history
+from rate_snapshot import RateSnapshot, SnapshotStore, snapshot_store
+from rate_providers import HedgedFetcher, RateProvider, build_providers, parse_currencies
+from shared_rate_cache import SharedRateCache
+
+
+# Currencies priced on every refresh unless RATE_CURRENCIES says otherwise
+DEFAULT_CURRENCIES = 'BTC,ETH,USDT,SOL'
+
+# Last-resort rates when neither the API nor the fallback file is available
+EMERGENCY_RATES = {
+    'BTC': Decimal('45000.00'),
+    'ETH': Decimal('2800.00'),
+    'USDT': Decimal('1.00'),
+    'SOL': Decimal('180.00')
+}
 
 
 class RateService:
     """Manages cryptocurrency exchange rates with API and fallback"""
     
-    def __init__(self, fallback_file="data/fallback_rates.json", cache_ttl_minutes=15):
-        self.api_url = "https://api.coingecko.com/api/v3/simple/price"
+    def __init__(self, fallback_file="data/fallback_rates.json", cache_ttl_minutes=15,
+                 refresh_ahead_seconds=60, max_staleness_minutes=60,
+                 shared_cache: Optional[SharedRateCache] = None,
+                 http: Optional[PooledSession] = None,
+                 providers: Optional[List[RateProvider]] = None,
+                 hedge_delay_seconds=0.5, aggregation='first',
+                 currencies: Optional[List[str]] = None,
+                 snapshot_store: Optional[SnapshotStore] = None,
+                 history: Optional[RateHistory] = None,
+                 breaker_failures=3, breaker_reset_seconds=30, breaker_max_reset_seconds=600,
+                 shared_sync_seconds=1):
+        """
+        Args:
+            fallback_file: JSON file holding the last good rates
+            cache_ttl_minutes: How long fetched rates count as fresh
+            refresh_ahead_seconds: Start a background refresh this long
+                before the cached rates expire
+            max_staleness_minutes: How long past expiry cached rates may
+                still be served while a background refresh runs
+            shared_cache: Snapshot store shared with other worker processes;
+                when set, one process fetches and the rest reuse its rates
+            http: Pooled keep-alive session used for upstream requests
+            providers: Price sources in order of preference (default: CoinGecko)
+            hedge_delay_seconds: Ask the next provider after this long
+                without a complete answer
+            aggregation: 'first' (fastest complete answer) or 'median'
+                (per-currency median across responders)
+            currencies: Currency codes to price (default: BTC, ETH, USDT, SOL)
+            snapshot_store: Where published rate snapshots are kept
+                (default: in memory only)
+            history: Time-indexed record of every upstream fetch
+                (default: none)
+            breaker_failures: Consecutive failures that open a provider's circuit
+            breaker_reset_seconds: First wait before probing an open provider
+            breaker_max_reset_seconds: Cap on that wait, which doubles per failed probe
+            shared_sync_seconds: While the local copy is fresh, check the shared
+                cache for a newer snapshot at most this often
+        """
         self.fallback_file = fallback_file
+        self.currencies = list(currencies or parse_currencies(DEFAULT_CURRENCIES)[0])
         self.cache_ttl = timedelta(minutes=cache_ttl_minutes)
+        self.refresh_ahead = timedelta(seconds=refresh_ahead_seconds)
+        self.max_staleness = timedelta(minutes=max_staleness_minutes)
         self.last_fetch = None
         self.cached_rates = None
+        self.snapshot: Optional[RateSnapshot] = None
+        self.cross_rates: Optional[CrossRateMatrix] = None
+        self.snapshot_store = snapshot_store or SnapshotStore(None)
+        self.history = history
+        self.shared_cache = shared_cache
+        self.http = http or PooledSession()
+        self.fetcher = HedgedFetcher(
+            providers or build_providers('coingecko'), self.http,
+            hedge_delay=hedge_delay_seconds, strategy=aggregation,
+            failure_threshold=breaker_failures, reset_timeout=breaker_reset_seconds,
+            max_reset_timeout=breaker_max_reset_seconds
+        )
+        self._fetched_at = None  # epoch seconds of cached_rates, for shared cache comparison
+        self.shared_sync_interval = shared_sync_seconds
+        self._shared_checked = None  # monotonic time of the last shared cache check
+        
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._inflight = None  # (done event, result holder) of the running fetch
+        self.upstream_fetches = 0
+        self.coalesced_fetches = 0
+        self._refresher = None
+        self._stop_refresher = threading.Event()
+        
+        # Fallback file and history: written off the fetching thread by one
+        # background writer; the fallback file is read once per change
+        self._writer = None
+        self._writer_pid = None
+        self._fallback_lock = threading.Lock()
+        self._fallback_pending = None  # newest rates waiting to be written
+        self._fallback_loaded = None  # (inode, mtime_ns, size, rates) of the last read
         
         # Ensure data directory exists
         os.makedirs(os.path.dirname(self.fallback_file), exist_ok=True)
@@ -30,96 +123,357 @@ class RateService:
         Get current exchange rates for supported cryptocurrencies
         
         Returns:
-            Dict mapping currency codes to USD rates
+            Read-only mapping of currency codes to USD rates
+        """
+        return self.get_snapshot().rates
+    
+    def get_snapshot(self) -> RateSnapshot:
+        """
+        Get the current rate snapshot
+        
+        Cached rates are served without waiting on the API: near expiry, or
+        up to max_staleness past it, a background refresh is started and the
+        last good snapshot is returned while it runs.
+        
+        Returns:
+            Immutable RateSnapshot; its id identifies these exact rates
+        """
+        age = self._cache_age()
+        cached = self.snapshot
+        if age is not None:
+            if age < self.cache_ttl:
+                if age >= self.cache_ttl - self.refresh_ahead:
+                    self._refresh_in_background()
+                converter_logger.debug("Using cached rates")
+                return cached
+            
+            if age < self.cache_ttl + self.max_staleness:
+                converter_logger.debug("Using stale cached rates while refreshing")
+                self._refresh_in_background()
+                return cached
+        
+        # No usable cache - fetch inline, sharing any fetch already running.
+        # While every provider's circuit is open, probe in the background
+        # once a probe is due and answer from the fallback without waiting
+        # on upstream.
+        if self.fetcher.available:
+            if self._refresh(unless_fresh=True):
+                return self.snapshot
+        else:
+            self._refresh_in_background()
+        
+        # Fallback to cached rates
+        fallback_rates = self._load_fallback_rates()
+        if fallback_rates:
+            converter_logger.fallback_rates_used()
+            return self.snapshot_store.publish(fallback_rates, 'fallback')
+        
+        # Last resort - hardcoded rates (should rarely happen)
+        converter_logger.error("No rates available - using emergency fallback")
+        return self.snapshot_store.publish(self._get_emergency_rates(), 'emergency')
+    
+    def get_cross_rates(self) -> CrossRateMatrix:
+        """
+        Get the cross-rate matrix for the current snapshot
+        
+        The matrix is built when a snapshot is published; fallback and
+        emergency snapshots get theirs on first use.
+        """
+        snapshot = self.get_snapshot()
+        matrix = self.cross_rates
+        if matrix is None or matrix.snapshot_id != snapshot.id:
+            matrix = CrossRateMatrix(snapshot)
+            self.cross_rates = matrix
+        return matrix
+    
+    def get_snapshot_by_id(self, snapshot_id: str) -> Optional[RateSnapshot]:
+        """Look up a previously published snapshot"""
+        return self.snapshot_store.get(snapshot_id)
+    
+    def _refresh(self, unless_fresh: bool = False) -> Optional[Dict[str, Decimal]]:
+        """
+        Fetch rates from the API and update the cache, or None on failure
+        
+        Concurrent callers share one upstream fetch: the first caller runs
+        it and the rest wait for and return its result.
+        
+        Args:
+            unless_fresh: Return the cached rates instead of fetching when
+                another caller refreshed them since this one checked
         """
-        # Check if cached rates are still valid
-        if self._is_cache_valid():
-            converter_logger.debug("Using cached rates")
-            return self.cached_rates
+        with self._refresh_lock:
+            # Local check only: the shared cache is consulted outside the lock
+            if unless_fresh and self._is_cache_valid(sync=False):
+                return self.cached_rates
+            
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = (threading.Event(), [])
+                self.upstream_fetches += 1
+            else:
+                self.coalesced_fetches += 1
+        
+        done, result = flight
+        if not leader:
+            done.wait()
+            return result[0]
         
-        # Try to fetch from API
         try:
+            result.append(self._fetch_and_store(unless_fresh))
+        finally:
+            if not result:
+                result.append(None)
+            with self._refresh_lock:
+                self._inflight = None
+            done.set()
+        
+        return result[0]
+    
+    def _fetch_and_store(self, unless_fresh: bool = False) -> Optional[Dict[str, Decimal]]:
+        """Fetch rates from the API and update the cache (single-flight leader only)"""
+        shared = self.shared_cache
+        if shared and not shared.acquire_lease():
+            # Another process is fetching; reuse its snapshot when published
+            shared_snapshot = shared.wait_for_snapshot(newer_than=self._fetched_at)
+            if shared_snapshot:
+                self._set_cached(*shared_snapshot, source='shared-cache')
+                converter_logger.debug("Using rates fetched by another worker")
+                return self.cached_rates
+        
+        try:
+            if shared and unless_fresh:
+                self._sync_shared()
+                if self._is_cache_valid():
+                    return self.cached_rates
+            
             rates = self._fetch_from_api()
             if rates:
-                self.cached_rates = rates
-                self.last_fetch = datetime.now()
+                fetched_at = time.time()
+                self._set_cached(rates, fetched_at, source=self.fetcher.last_source or 'api')
+                if shared:
+                    shared.store(rates, fetched_at)
+                if self.history:
+                    self._get_writer().submit(self._append_history, fetched_at, rates)
                 self._save_fallback_rates(rates)
-                converter_logger.info("Successfully fetched rates from CoinGecko API")
+                converter_logger.info(f"Successfully fetched rates from {self.fetcher.last_source or 'API'}")
                 return rates
+        except CircuitOpenError as e:
+            converter_logger.debug(f"Skipped rate fetch: {e}")
         except Exception as e:
             converter_logger.api_failure(str(e))
+        finally:
+            if shared:
+                shared.release_lease()
         
-        # Fallback to cached rates
-        fallback_rates = self._load_fallback_rates()
-        if fallback_rates:
-            converter_logger.fallback_rates_used()
-            return fallback_rates
+        return None
+    
+    def _set_cached(self, rates: Dict[str, Decimal], fetched_at: float, source: str) -> None:
+        """Publish fetched rates as the current snapshot"""
+        snapshot = self.snapshot_store.publish(
+            rates, source, datetime.fromtimestamp(fetched_at).isoformat()
+        )
+        if self.cross_rates is None or self.cross_rates.snapshot_id != snapshot.id:
+            self.cross_rates = CrossRateMatrix(snapshot)
+        self.snapshot = snapshot
+        self.cached_rates = snapshot.rates
+        self.last_fetch = datetime.fromtimestamp(fetched_at)
+        self._fetched_at = fetched_at
+    
+    def _sync_shared(self) -> None:
+        """Adopt the shared snapshot if another process published a newer one"""
+        if not self.shared_cache:
+            return
         
-        # Last resort - hardcoded rates (should rarely happen)
-        converter_logger.error("No rates available - using emergency fallback")
-        return self._get_emergency_rates()
+        self._shared_checked = time.monotonic()
+        fetched_at = self.shared_cache.fetched_at()
+        if fetched_at is None or (self._fetched_at is not None and fetched_at <= self._fetched_at):
+            return
+        
+        shared_snapshot = self.shared_cache.load()
+        if shared_snapshot:
+            self._set_cached(*shared_snapshot, source='shared-cache')
     
-    def _fetch_from_api(self) -> Optional[Dict[str, Decimal]]:
-        """Fetch rates from CoinGecko API"""
-        params = {
-            'ids': 'bitcoin,ethereum,tether,solana',
-            'vs_currencies': 'usd'
-        }
+    def _refresh_in_background(self) -> None:
+        """Start a refresh thread unless a fetch is running or no probe is due yet"""
+        # With every circuit open a fetch would be rejected at once, so
+        # wait until the next probe is allowed instead of starting a thread
+        if not self.fetcher.available and self.fetcher.retry_in() > 0:
+            return
         
-        response = requests.get(self.api_url, params=params, timeout=10)
-        response.raise_for_status()
+        with self._refresh_lock:
+            if self._inflight or (self._refresh_thread and self._refresh_thread.is_alive()):
+                return
+            
+            self._refresh_thread = threading.Thread(
+                target=self._refresh, name='rate-refresh', daemon=True
+            )
+            self._refresh_thread.start()
+    
+    def start_refresher(self) -> None:
+        """
+        Keep rates warm from a daemon thread
         
-        data = response.json()
+        The thread refreshes refresh_ahead before each expiry, so request
+        threads normally never see an expired cache. Failed refreshes are
+        retried after refresh_ahead.
+        """
+        with self._refresh_lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            
+            self._stop_refresher.clear()
+            self._refresher = threading.Thread(
+                target=self._run_refresher, name='rate-refresher', daemon=True
+            )
+            self._refresher.start()
+    
+    def stop_refresher(self) -> None:
+        """Stop the background refresher thread"""
+        self._stop_refresher.set()
+        if self._refresher:
+            self._refresher.join()
+            self._refresher = None
+    
+    def _run_refresher(self) -> None:
+        while not self._stop_refresher.is_set():
+            age = self._cache_age()
+            if age is None or age >= self.cache_ttl - self.refresh_ahead:
+                if not self._refresh():
+                    # Retry when the next circuit probe is due, if one is open
+                    retry = self.fetcher.retry_in() or self.refresh_ahead.total_seconds()
+                    self._stop_refresher.wait(max(retry, 1))
+                continue
+            
+            wait = self.cache_ttl - self.refresh_ahead - age
+            self._stop_refresher.wait(wait.total_seconds())
+    
+    def _fetch_from_api(self) -> Optional[Dict[str, Decimal]]:
+        """
+        Fetch rates from the configured providers, hedging slow ones
         
-        # Map API response to our format
-        rate_mapping = {
-            'bitcoin': 'BTC',
-            'ethereum': 'ETH', 
-            'tether': 'USDT',
-            'solana': 'SOL'
-        }
+        Currencies missing from a partial response keep their previous
+        rate, so one failed batch does not discard the whole fetch.
+        """
+        rates = self.fetcher.fetch(self.currencies)
         
-        rates = {}
-        for api_name, currency_code in rate_mapping.items():
-            if api_name in data and 'usd' in data[api_name]:
-                rates[currency_code] = Decimal(str(data[api_name]['usd']))
+        missing = [c for c in self.currencies if c not in rates]
+        if missing:
+            previous = self.cached_rates or self._load_fallback_rates() or {}
+            carried = [c for c in missing if c in previous]
+            for currency in carried:
+                rates[currency] = previous[currency]
+            converter_logger.warning(
+                f"No upstream rate for {len(missing)} of {len(self.currencies)} currencies "
+                f"({', '.join(missing[:10])}); kept previous rate for {len(carried)}"
+            )
         
-        return rates if len(rates) == 4 else None
+        return rates or None
     
-    def _is_cache_valid(self) -> bool:
+    def _is_cache_valid(self, sync: bool = True) -> bool:
         """Check if cached rates are still valid"""
-        if not self.cached_rates or not self.last_fetch:
-            return False
+        age = self._cache_age(sync)
+        return age is not None and age < self.cache_ttl
+    
+    def _cache_age(self, sync: bool = True) -> Optional[timedelta]:
+        """
+        Age of the cached rates, or None when nothing is cached
         
-        return datetime.now() - self.last_fetch < self.cache_ttl
+        The shared cache is only read when the local copy is missing or
+        due for refresh, or shared_sync_interval has passed since the last
+        check, so fresh cache hits stay in memory.
+        """
+        age = self._local_age()
+        if sync and self.shared_cache and (
+            age is None or age >= self.cache_ttl - self.refresh_ahead
+            or self._shared_checked is None
+            or time.monotonic() - self._shared_checked >= self.shared_sync_interval
+        ):
+            self._sync_shared()
+            age = self._local_age()
+        return age
+    
+    def _local_age(self) -> Optional[timedelta]:
+        if not self.cached_rates or not self.last_fetch:
+            return None
+        return datetime.now() - self.last_fetch
     
     def _save_fallback_rates(self, rates: Dict[str, Decimal]) -> None:
-        """Save rates to fallback file"""
+        """Queue rates to be written to the fallback file"""
+        with self._fallback_lock:
+            queued = self._fallback_pending is not None
+            self._fallback_pending = rates
+        
+        # A write already queued will pick up these newer rates
+        if not queued:
+            self._get_writer().submit(self._write_fallback_rates)
+    
+    def _get_writer(self) -> ThreadPoolExecutor:
+        """Single writer thread, recreated in forked workers where it did not survive"""
+        with self._fallback_lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-writer')
+                self._writer_pid = os.getpid()
+            return self._writer
+    
+    def _append_history(self, fetched_at: float, rates: Mapping[str, Decimal]) -> None:
+        """Record a fetch in the history; failures are logged and never affect serving"""
+        try:
+            self.history.append(fetched_at, rates)
+        except Exception as e:
+            converter_logger.error(f"Failed to record rate history: {e}")
+    
+    def _write_fallback_rates(self) -> None:
+        """Write the newest queued rates to the fallback file atomically"""
+        with self._fallback_lock:
+            rates, self._fallback_pending = self._fallback_pending, None
+        if rates is None:
+            return
+        
         try:
             fallback_data = {
                 'timestamp': datetime.now().isoformat(),
                 'rates': {k: str(v) for k, v in rates.items()}
             }
             
-            with open(self.fallback_file, 'w') as f:
-                json.dump(fallback_data, f, indent=2)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.fallback_file), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(fallback_data, f, separators=(',', ':'))
+                os.replace(tmp_path, self.fallback_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
             
             converter_logger.debug(f"Saved fallback rates to {self.fallback_file}")
         except Exception as e:
             converter_logger.error(f"Failed to save fallback rates: {e}")
     
-    def _load_fallback_rates(self) -> Optional[Dict[str, Decimal]]:
-        """Load rates from fallback file"""
+    def flush_fallback_rates(self) -> None:
+        """Wait until queued fallback and history writes have reached their files"""
+        self._get_writer().submit(lambda: None).result()
+    
+    def _load_fallback_rates(self) -> Optional[Mapping[str, Decimal]]:
+        """Load rates from fallback file, re-reading it only when it changed"""
+        try:
+            stat = os.stat(self.fallback_file)
+        except FileNotFoundError:
+            return None
+        
+        loaded = self._fallback_loaded
+        # Writes replace the file, so a new inode also marks a change
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if loaded and loaded[:3] == key:
+            return loaded[3]
+        
         try:
-            if not os.path.exists(self.fallback_file):
-                return None
-            
             with open(self.fallback_file, 'r') as f:
                 data = json.load(f)
             
-            rates = {}
-            for currency, rate_str in data['rates'].items():
-                rates[currency] = Decimal(rate_str)
+            rates = MappingProxyType({
+                currency: Decimal(rate_str) for currency, rate_str in data['rates'].items()
+            })
+            self._fallback_loaded = key + (rates,)
             
             converter_logger.debug(f"Loaded fallback rates from {self.fallback_file}")
             return rates
@@ -130,24 +484,60 @@ class RateService:
     
     def _get_emergency_rates(self) -> Dict[str, Decimal]:
         """Emergency hardcoded rates (last resort)"""
-        return {
-            'BTC': Decimal('45000.00'),
-            'ETH': Decimal('2800.00'),
-            'USDT': Decimal('1.00'),
-            'SOL': Decimal('180.00')
-        }
+        return {c: rate for c, rate in EMERGENCY_RATES.items() if c in self.currencies}
     
     def get_rate_for_currency(self, currency: str) -> Optional[Decimal]:
         """Get rate for specific currency"""
         rates = self.get_rates()
         return rates.get(currency.upper())
     
+    def get_stats(self) -> Dict:
+        """Get rate cache and upstream fetch counters"""
+        age = self._cache_age()
+        return {
+            'cached': self.cached_rates is not None,
+            'snapshot_id': self.snapshot.id if self.snapshot else None,
+            'snapshot_version': self.snapshot.version if self.snapshot else None,
+            'snapshots_stored': len(self.snapshot_store),
+            'cross_rates': self.cross_rates.get_stats() if self.cross_rates else None,
+            'last_fetch': self.last_fetch.isoformat() if self.last_fetch else None,
+            'age_seconds': age.total_seconds() if age is not None else None,
+            'upstream_fetches': self.upstream_fetches,
+            'coalesced_fetches': self.coalesced_fetches,
+            'refresh_in_flight': self._inflight is not None,
+            'upstream_available': self.fetcher.available,
+            'shared_cache': self.shared_cache.db_path if self.shared_cache else None,
+            'http': self.http.get_stats(),
+            'providers': self.fetcher.get_stats(),
+            'history': self.history.get_stats() if self.history else None
+        }
+    
     def force_refresh(self) -> Dict[str, Decimal]:
         """Force refresh rates from API"""
-        self.cached_rates = None
-        self.last_fetch = None
-        return self.get_rates()
+        return self._refresh() or self.get_rates()
 
 
 # Global rate service instance
-rate_service = RateService()
\ No newline at end of file
+_currencies, _coin_ids = parse_currencies(os.getenv('RATE_CURRENCIES', DEFAULT_CURRENCIES))
+rate_service = RateService(
+    cache_ttl_minutes=float(os.getenv('RATE_CACHE_TTL_MINUTES', '15')),
+    refresh_ahead_seconds=float(os.getenv('RATE_REFRESH_AHEAD_SECONDS', '60')),
+    max_staleness_minutes=float(os.getenv('RATE_MAX_STALENESS_MINUTES', '60')),
+    shared_cache=SharedRateCache(os.getenv('RATE_SHARED_CACHE')) if os.getenv('RATE_SHARED_CACHE') else None,
+    http=PooledSession(
+        connect_timeout=float(os.getenv('RATE_CONNECT_TIMEOUT', '3.05')),
+        read_timeout=float(os.getenv('RATE_READ_TIMEOUT', '10')),
+        max_retries=int(os.getenv('RATE_MAX_RETRIES', '2'))
+    ),
+    providers=build_providers(os.getenv('RATE_PROVIDERS', 'coingecko,coinbase,cryptocompare'), _coin_ids,
+                              base_url=os.getenv('RATE_PROVIDER_BASE_URL')),
+    hedge_delay_seconds=float(os.getenv('RATE_HEDGE_DELAY_MS', '500')) / 1000,
+    aggregation=os.getenv('RATE_AGGREGATION', 'first'),
+    currencies=_currencies,
+    snapshot_store=snapshot_store,
+    history=rate_history,
+    breaker_failures=int(os.getenv('RATE_BREAKER_FAILURES', '3')),
+    breaker_reset_seconds=float(os.getenv('RATE_BREAKER_RESET_SECONDS', '30')),
+    breaker_max_reset_seconds=float(os.getenv('RATE_BREAKER_MAX_RESET_SECONDS', '600')),
+    shared_sync_seconds=float(os.getenv('RATE_SHARED_SYNC_SECONDS', '1'))
+)
@@ -0,0 +1,244 @@
+"""
+Rate Snapshots for Lynx Crypto Converter
+Immutable, versioned rate sets and a deduplicating store keyed by snapshot ID
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+from fixed_point import UnitRate, get_asset
+from logger import converter_logger
+
+
+def compute_snapshot_id(rates: Mapping[str, Decimal]) -> str:
+    """Content-derived ID: identical rates always get the same ID"""
+    canonical = ';'.join(f"{currency}={rates[currency]}" for currency in sorted(rates))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class RateSnapshot:
+    """
+    One published set of USD rates
+
+    Snapshots are read-only once created. Float copies of the rates and
+    exact integer UnitRates are computed once here so conversions do not
+    convert Decimals per request.
+    """
+
+    __slots__ = ('id', 'version', 'timestamp', 'source', 'rates', 'float_rates', 'unit_rates')
+
+    def __init__(self, rates: Mapping[str, Decimal], timestamp: str, source: str, version: int = 0):
+        """
+        Args:
+            rates: Currency code to USD rate
+            timestamp: ISO time the rates were first published
+            source: Where the rates came from (provider name, fallback, ...)
+            version: Sequence number assigned by the SnapshotStore
+        """
+        rates = {currency: Decimal(rate) for currency, rate in rates.items()}
+        set_attr = super().__setattr__
+        set_attr('id', compute_snapshot_id(rates))
+        set_attr('version', version)
+        set_attr('timestamp', timestamp)
+        set_attr('source', source)
+        set_attr('rates', MappingProxyType(rates))
+        set_attr('float_rates', MappingProxyType({c: float(r) for c, r in rates.items()}))
+        set_attr('unit_rates', MappingProxyType({
+            c: UnitRate(get_asset(c), r) for c, r in rates.items() if r > 0
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"RateSnapshot is immutable (cannot set {name})")
+
+    def with_source(self, source: str) -> 'RateSnapshot':
+        """The same snapshot reported as coming from source, sharing its rate data"""
+        snapshot = object.__new__(RateSnapshot)
+        set_attr = super(RateSnapshot, snapshot).__setattr__
+        for name in self.__slots__:
+            set_attr(name, getattr(self, name))
+        set_attr('source', source)
+        return snapshot
+
+    def to_dict(self) -> Dict:
+        """Serialize for storage or API responses (rates as strings)"""
+        return {
+            'id': self.id,
+            'version': self.version,
+            'timestamp': self.timestamp,
+            'source': self.source,
+            'rates': {currency: str(rate) for currency, rate in self.rates.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RateSnapshot':
+        return cls(data['rates'], data['timestamp'], data['source'], data.get('version', 0))
+
+
+class SnapshotStore:
+    """
+    Deduplicating store of rate snapshots, persisted as append-only JSON lines
+
+    Publishing rates identical to an existing snapshot returns that
+    snapshot instead of creating a new one, so a stable market or repeated
+    fallback loads add nothing to storage. The source is not part of the
+    deduplicated content: rates republished from another source return
+    the existing snapshot reporting the new source.
+
+    Only the max_snapshots most recently published snapshots are kept, in
+    memory and on load; older IDs are no longer found. The file is
+    rewritten with just those once it holds twice as many lines.
+    """
+
+    def __init__(self, storage_file: Optional[str] = "data/rate_snapshots.jsonl",
+                 max_snapshots: int = 1000):
+        """
+        Args:
+            storage_file: JSON-lines file of snapshots; None keeps them in memory only
+            max_snapshots: Number of most recent snapshots to keep
+        """
+        self.storage_file = storage_file
+        self.max_snapshots = max(1, max_snapshots)
+        self._snapshots: Dict[str, RateSnapshot] = {}  # oldest first
+        self._latest_version = 0
+        self._file_lines = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        # Ensure storage directory exists
+        if self.storage_file:
+            os.makedirs(os.path.dirname(os.path.abspath(self.storage_file)), exist_ok=True)
+
+    def publish(self, rates: Mapping[str, Decimal], source: str,
+                timestamp: Optional[str] = None) -> RateSnapshot:
+        """
+        Get the snapshot for a set of rates, creating it if new
+
+        Returns:
+            The existing snapshot with identical rates (reporting this
+            source), or a new one with the next version number
+        """
+        key = compute_snapshot_id(rates)
+        with self._lock:
+            self._ensure_loaded()
+            snapshot = self._snapshots.pop(key, None)
+            if snapshot is not None:
+                if snapshot.source != source:
+                    snapshot = snapshot.with_source(source)
+                self._snapshots[key] = snapshot  # most recently published last
+                return snapshot
+
+            self._latest_version += 1
+            snapshot = RateSnapshot(rates, timestamp or datetime.now().isoformat(), source, self._latest_version)
+            self._snapshots[key] = snapshot
+            self._evict()
+            self._append(snapshot)
+
+        converter_logger.debug(f"Published rate snapshot {snapshot.id} v{snapshot.version} from {source}")
+        return snapshot
+
+    def get(self, snapshot_id: str) -> Optional[RateSnapshot]:
+        """Look up a snapshot by ID"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._snapshots.get(snapshot_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._snapshots)
+
+    def _ensure_loaded(self) -> None:
+        """Read persisted snapshots on first use (lock held)"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if not self.storage_file or not os.path.exists(self.storage_file):
+            return
+
+        try:
+            # Only the newest lines are decoded; older snapshots are dropped
+            with open(self.storage_file, 'r') as f:
+                recent = deque(maxlen=self.max_snapshots)
+                for line in f:
+                    if line.strip():
+                        self._file_lines += 1
+                        recent.append(line)
+            for line in recent:
+                snapshot = RateSnapshot.from_dict(json.loads(line))
+                self._snapshots.pop(snapshot.id, None)
+                self._snapshots[snapshot.id] = snapshot
+                self._latest_version = max(self._latest_version, snapshot.version)
+        except Exception as e:
+            converter_logger.error(f"Failed to load rate snapshots: {e}")
+
+    def _evict(self) -> None:
+        """Drop the oldest snapshots beyond max_snapshots (lock held)"""
+        while len(self._snapshots) > self.max_snapshots:
+            del self._snapshots[next(iter(self._snapshots))]
+
+    def _append(self, snapshot: RateSnapshot) -> None:
+        """Persist a new snapshot, compacting the file when it is full (lock held)"""
+        if not self.storage_file:
+            return
+
+        try:
+            line = json.dumps(snapshot.to_dict(), separators=(',', ':')) + '\n'
+            with self._file_lock():
+                if self._file_lines >= 2 * self.max_snapshots:
+                    self._rewrite(line)
+                else:
+                    with open(self.storage_file, 'a') as f:
+                        f.write(line)
+                    self._file_lines += 1
+        except Exception as e:
+            converter_logger.error(f"Failed to save rate snapshot {snapshot.id}: {e}")
+
+    def _rewrite(self, new_line: str) -> None:
+        """
+        Replace the file with its newest lines plus new_line (both locks held)
+
+        The kept lines come from the file rather than from memory, so lines
+        appended by other processes survive.
+        """
+        recent = deque(maxlen=self.max_snapshots - 1)
+        if os.path.exists(self.storage_file):
+            with open(self.storage_file, 'r') as f:
+                recent.extend(line for line in f if line.strip())
+        recent.append(new_line)
+
+        fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.storage_file)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.writelines(recent)
+            os.replace(temp_file, self.storage_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
+        self._file_lines = len(recent)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process writing this snapshot file"""
+        with open(f"{self.storage_file}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# Global snapshot store instance
+snapshot_store = SnapshotStore(
+    os.getenv('RATE_SNAPSHOT_FILE', 'data/rate_snapshots.jsonl'),
+    max_snapshots=int(os.getenv('RATE_SNAPSHOT_MAX', '1000'))
+)
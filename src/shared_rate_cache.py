@@ -0,0 +1,148 @@
+"""
+Shared Rate Cache for Lynx Crypto Converter
+SQLite-backed rate snapshot shared by all worker processes on a host
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+from logger import converter_logger
+
+
+class SharedRateCache:
+    """
+    Latest rate snapshot plus a fetch lease, stored in one SQLite file
+
+    Every process reads the same snapshot, and only the process holding the
+    lease fetches from upstream, so N workers make one request per refresh
+    instead of N.
+    """
+
+    def __init__(self, db_path: str = "data/rate_cache.db", lease_seconds: float = 30):
+        """
+        Args:
+            db_path: SQLite database file shared between processes
+            lease_seconds: How long a fetch lease lasts before another
+                process may take it over (covers a crashed holder)
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+
+        # Ensure data directory and schema exist
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_snapshot ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), fetched_at REAL NOT NULL, rates TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fetch_lease ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @property
+    def holder(self) -> str:
+        """Lease holder id; includes the pid so forked workers never share it"""
+        return f"{os.getpid()}-{id(self)}"
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections are not shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self) -> Optional[Tuple[Dict[str, Decimal], float]]:
+        """
+        Read the shared snapshot
+
+        Returns:
+            Tuple of (rates, fetched_at epoch seconds), or None when empty
+        """
+        try:
+            row = self._connect().execute(
+                "SELECT rates, fetched_at FROM rate_snapshot WHERE id = 1"
+            ).fetchone()
+        except sqlite3.Error as e:
+            converter_logger.error(f"Failed to read shared rate cache: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        rates = {currency: Decimal(rate) for currency, rate in json.loads(row[0]).items()}
+        return rates, row[1]
+
+    def store(self, rates: Dict[str, Decimal], fetched_at: float) -> None:
+        """Publish a snapshot unless a newer one is already stored"""
+        try:
+            self._connect().execute(
+                "INSERT INTO rate_snapshot (id, fetched_at, rates) VALUES (1, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET fetched_at = excluded.fetched_at, rates = excluded.rates "
+                "WHERE excluded.fetched_at > rate_snapshot.fetched_at",
+                (fetched_at, json.dumps({k: str(v) for k, v in rates.items()}))
+            )
+        except sqlite3.Error as e:
+            converter_logger.error(f"Failed to write shared rate cache: {e}")
+
+    def fetched_at(self) -> Optional[float]:
+        """Timestamp of the shared snapshot without decoding its rates"""
+        try:
+            row = self._connect().execute(
+                "SELECT fetched_at FROM rate_snapshot WHERE id = 1"
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def acquire_lease(self) -> bool:
+        """Try to become the process that fetches from upstream"""
+        now = time.time()
+        try:
+            cursor = self._connect().execute(
+                "INSERT INTO fetch_lease (id, holder, expires_at) VALUES (1, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE fetch_lease.expires_at < ? OR fetch_lease.holder = excluded.holder",
+                (self.holder, now + self.lease_seconds, now)
+            )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            converter_logger.error(f"Failed to acquire rate fetch lease: {e}")
+            return True  # fetch anyway rather than stall on a broken cache file
+
+    def release_lease(self) -> None:
+        """Give up the fetch lease"""
+        try:
+            self._connect().execute(
+                "DELETE FROM fetch_lease WHERE id = 1 AND holder = ?", (self.holder,)
+            )
+        except sqlite3.Error as e:
+            converter_logger.error(f"Failed to release rate fetch lease: {e}")
+
+    def wait_for_snapshot(self, newer_than: Optional[float],
+                          poll_seconds: float = 0.05) -> Optional[Tuple[Dict[str, Decimal], float]]:
+        """
+        Wait for the lease holder to publish a snapshot newer than newer_than
+
+        Returns:
+            The new snapshot, or None once this process has taken over the
+            lease instead (the holder finished without publishing, or its
+            lease expired) and should fetch itself
+        """
+        while True:
+            fetched_at = self.fetched_at()
+            if fetched_at is not None and (newer_than is None or fetched_at > newer_than):
+                snapshot = self.load()
+                if snapshot:
+                    return snapshot
+            if self.acquire_lease():
+                return None
+            time.sleep(poll_seconds)
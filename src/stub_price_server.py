@@ -0,0 +1,212 @@
+"""
+Stub Price Server for Lynx Crypto Converter
+Local stand-in for the upstream price APIs, for offline tests and load tests
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+from rate_providers import COINGECKO_IDS, PROVIDERS, RateProvider
+
+
+# Starting USD prices; other tickers get a stable price derived from the code
+DEFAULT_PRICES = {'BTC': 50000, 'ETH': 3000, 'USDT': 1, 'SOL': 100}
+
+
+class StubPriceHandler(BaseHTTPRequestHandler):
+    """Serves CoinGecko, Coinbase and CryptoCompare response shapes"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+
+    def do_GET(self):
+        stub = self.server.stub
+        failing, delay = stub._begin_request()
+        time.sleep(delay)
+
+        if failing:
+            self.send_response(stub.error_status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith('/data/pricemulti'):
+            codes = query.get('fsyms', [''])[0].split(',')
+            prices = stub.quote(codes)
+            payload = {code: {'USD': price} for code, price in prices.items()}
+        elif url.path.startswith('/v2/exchange-rates'):
+            prices = stub.quote(stub.listed)
+            payload = {'data': {'currency': 'USD', 'rates': {
+                code: str(1 / price) for code, price in prices.items()
+            }}}
+        elif url.path.startswith('/api/v3/simple/price'):
+            tickers = {v: k for k, v in COINGECKO_IDS.items()}
+            ids = query.get('ids', [''])[0].split(',')
+            prices = stub.quote([tickers.get(coin_id, coin_id.upper()) for coin_id in ids])
+            payload = {coin_id: {'usd': prices[tickers.get(coin_id, coin_id.upper())]}
+                       for coin_id in ids if tickers.get(coin_id, coin_id.upper()) in prices}
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubPriceServer:
+    """
+    Configurable local price API
+
+    All settings are plain attributes and may be changed while the server
+    runs, e.g. raising error_rate mid-test to simulate an outage.
+
+    Attributes:
+        latency: Seconds added to every response
+        jitter: Extra random delay of up to this many seconds
+        error_rate: Fraction of requests answered with error_status
+        partial_rate: Fraction of responses that omit about half the currencies
+        volatility: Per-request standard deviation of each price's
+            log-normal random walk (0 keeps prices fixed)
+        fail_next: Answer this many upcoming requests with error_status
+        hits, errors, partials: Request counters
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, partial_rate: float = 0.0,
+                 volatility: float = 0.0, prices: Optional[Dict[str, float]] = None,
+                 error_status: int = 503, seed: Optional[int] = None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            prices: Starting USD prices, merged over DEFAULT_PRICES
+            error_status: HTTP status of injected errors
+            seed: Random seed for reproducible latency, errors and prices
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.partial_rate = partial_rate
+        self.volatility = volatility
+        self.error_status = error_status
+        self.fail_next = 0
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self.listed = list(self.prices)  # currencies in Coinbase-style full listings
+
+        self.hits = 0
+        self.errors = 0
+        self.partials = 0
+        self._walk: Dict[str, float] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), StubPriceHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.url = f'http://{host}:{self.httpd.server_port}'
+        self._thread = None
+
+    def start(self) -> 'StubPriceServer':
+        """Serve from a daemon thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stub-prices', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def provider_url(self, name: str) -> str:
+        """URL of the stub endpoint standing in for a provider"""
+        return self.url + urlparse(PROVIDERS[name].default_url).path
+
+    def make_providers(self, names: Sequence[str] = ('coingecko',)) -> List[RateProvider]:
+        """Providers pointed at this server, in the given order of preference"""
+        return [PROVIDERS[name](self.provider_url(name)) for name in names]
+
+    def base_price(self, code: str) -> float:
+        return self.prices.get(code, 10 + sum(map(ord, code)) % 1000)
+
+    def quote(self, codes: Sequence[str]) -> Dict[str, float]:
+        """Current prices for codes, advancing the random walk one step"""
+        with self._lock:
+            partial = self.partial_rate and self._random.random() < self.partial_rate
+            if partial:
+                self.partials += 1
+                codes = [c for c in codes if self._random.random() < 0.5]
+
+            prices = {}
+            for code in codes:
+                if not code:
+                    continue
+                price = self.base_price(code)
+                step = self._walk.get(code, 1.0)
+                if self.volatility:
+                    step *= math.exp(self._random.gauss(0, self.volatility))
+                    self._walk[code] = step
+                prices[code] = round(price * step, 8) if step != 1.0 else price
+            return prices
+
+    def _begin_request(self):
+        """Count a request and decide whether it fails and how long it takes"""
+        with self._lock:
+            self.hits += 1
+            failing = self.fail_next > 0 or (self.error_rate and self._random.random() < self.error_rate)
+            if self.fail_next > 0:
+                self.fail_next -= 1
+            if failing:
+                self.errors += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        return failing, delay
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'hits': self.hits, 'errors': self.errors, 'partials': self.partials}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Local stub of the upstream price APIs')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8089)
+    arg_parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response')
+    arg_parser.add_argument('--jitter-ms', type=float, default=0, help='Extra random delay up to this')
+    arg_parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests failing')
+    arg_parser.add_argument('--partial-rate', type=float, default=0, help='Fraction of partial responses')
+    arg_parser.add_argument('--volatility', type=float, default=0.001, help='Random-walk step per request')
+    arg_parser.add_argument('--seed', type=int)
+    args = arg_parser.parse_args()
+
+    stub = StubPriceServer(args.host, args.port, latency=args.latency_ms / 1000,
+                           jitter=args.jitter_ms / 1000, error_rate=args.error_rate,
+                           partial_rate=args.partial_rate, volatility=args.volatility, seed=args.seed)
+    print(f'Stub price server on {stub.url}')
+    for name in PROVIDERS:
+        print(f'  {name:<14} {stub.provider_url(name)}')
+    print(f'Point the app at it with RATE_PROVIDER_BASE_URL={stub.url}')
+
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
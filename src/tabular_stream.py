@@ -0,0 +1,173 @@
+"""
+Streaming CSV / XLSX Readers for Lynx Crypto Converter
+Yield cell text row by row so very large exports never load into memory
+"""
+
+import csv
+import io
+import re
+from decimal import Decimal, InvalidOperation
+from numbers import Number
+from typing import Iterable, Iterator, Optional, Sequence, Set, Tuple, Union
+from tokenizer import CURRENCY_SYMBOLS, MAX_VALUE, tokenize_amounts
+
+
+# Bare machine-formatted numbers such as 1234.5 or -0.75
+PLAIN_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+# Header text marking a column of bare numbers as money; other numeric
+# columns (IDs, years, quantities) are not balances
+AMOUNT_HEADER = re.compile(
+    rf'[{CURRENCY_SYMBOLS}]|\b(?:amount|balance|total|funds|price|cost|payment|deposit|'
+    r'credit|debit|usd|eur|gbp|jpy|inr)s?\b',
+    re.IGNORECASE
+)
+
+# BalanceSet keeps amounts as int64 units, so exact values keep at most 18 digits
+MAX_AMOUNT_DIGITS = 18
+
+
+def iter_csv_text(source: Union[str, object], encoding: str = 'utf-8-sig',
+                  chunk_size: int = 1024 * 1024) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (line_ref, text) pairs for each non-empty CSV cell
+
+    The file is read through a buffered text stream and parsed one row at
+    a time, so memory use does not grow with the number of rows.
+
+    Args:
+        source: Path or buffered binary file-like object
+        encoding: Text encoding of the export
+        chunk_size: Read buffer size in bytes when opening a path
+
+    Yields:
+        Tuple of ``row-<n>`` (1-based) and cell text
+    """
+    if isinstance(source, str):
+        stream = open(source, 'r', encoding=encoding, newline='', buffering=chunk_size)
+        release = stream.close
+    else:
+        stream = io.TextIOWrapper(source, encoding=encoding, newline='')
+        release = stream.detach  # leave the caller's stream open
+
+    try:
+        yield from _iter_rows_text(csv.reader(stream), 'row-')
+    finally:
+        release()
+
+
+def iter_xlsx_text(source: Union[str, object]) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (line_ref, text) pairs for each non-empty XLSX cell
+
+    Worksheets are read with openpyxl in read-only mode, which streams rows
+    from the sheet XML instead of building the full workbook.
+
+    Args:
+        source: Path or binary file-like object
+
+    Yields:
+        Tuple of ``<sheet>-row-<n>`` (1-based) and cell text
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _iter_rows_text(sheet.iter_rows(values_only=True), f"{sheet.title}-row-")
+    finally:
+        workbook.close()
+
+
+def _iter_rows_text(rows: Iterable[Sequence], ref_prefix: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (line_ref, text) for the cells of one table
+
+    The first non-empty row is the header when it holds no bare numbers;
+    its columns named like money (see AMOUNT_HEADER) are amount columns.
+    Without such a header, bare numbers are not read as amounts.
+    """
+    amount_columns: Optional[Set[int]] = None
+
+    for row_num, row in enumerate(rows, 1):
+        if amount_columns is None and any(_has_value(value) for value in row):
+            amount_columns = set() if any(_is_bare_number(value) for value in row) else {
+                idx for idx, value in enumerate(row)
+                if isinstance(value, str) and AMOUNT_HEADER.search(value)
+            }
+
+        line_ref = f"{ref_prefix}{row_num}"
+        for idx, value in enumerate(row):
+            text = cell_text(value, amount_column=bool(amount_columns) and idx in amount_columns)
+            if text:
+                yield line_ref, text
+
+
+def cell_text(value, amount_column: bool = False) -> Optional[str]:
+    """
+    Render a cell value as text for tokenize_cell()
+
+    Numeric cells and bare numeric strings in an amount column are written
+    as their exact decimal value, at full precision; outside amount columns
+    they are skipped. Other values that are not text, such as dates and
+    booleans, are skipped too. Text (including amounts with a currency
+    marker) is passed through for the document tokenizer.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+
+    if isinstance(value, Number):
+        return _exact_amount(str(value)) if amount_column else None
+
+    if not isinstance(value, str):
+        return None
+
+    text = value.strip()
+    if PLAIN_NUMBER.fullmatch(text):
+        return _exact_amount(text) if amount_column else None
+    return text
+
+
+def tokenize_cell(text: str) -> Iterator[Tuple[str, Optional[str], int, int]]:
+    """
+    Yield amounts found in cell text, like tokenizer.tokenize_amounts()
+
+    Exact values written by cell_text() for amount columns are taken as
+    they are, so sub-cent amounts and long fractions are kept. Any other
+    text goes through the document tokenizer.
+    """
+    if PLAIN_NUMBER.fullmatch(text):
+        yield text, None, 0, len(text)
+    else:
+        yield from tokenize_amounts(text)
+
+
+def _exact_amount(number: str) -> Optional[str]:
+    """Canonical full-precision value of a bare number, or None if out of range or zero"""
+    try:
+        # Signs are ignored, as for amounts in document text
+        value = Decimal(number).copy_abs()
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or not value or value > MAX_VALUE:
+        return None
+
+    text = format(value, 'f')
+    integer, dot, fraction = text.partition('.')
+    if len(integer) + len(fraction) > MAX_AMOUNT_DIGITS:
+        text = f"{integer}.{fraction[:MAX_AMOUNT_DIGITS - len(integer)]}".rstrip('0').rstrip('.')
+        if not Decimal(text):
+            return None  # nothing left within the kept digits
+    return text
+
+
+def _has_value(value) -> bool:
+    return value is not None and (not isinstance(value, str) or bool(value.strip()))
+
+
+def _is_bare_number(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, Number):
+        return True
+    return isinstance(value, str) and PLAIN_NUMBER.fullmatch(value.strip()) is not None
@@ -0,0 +1,105 @@
+"""
+Amount Tokenizer for Lynx Crypto Converter
+Single-pass extraction of monetary amounts from free text
+"""
+
+import re
+from decimal import Decimal
+from typing import Iterator, Optional, Tuple
+
+
+CURRENCY_SYMBOLS = '$€£¥₹'
+
+# Symbol and number captured separately so no per-match re-scan is needed
+# Matches: $1,234.56 or €1.234,56 or 1234.56
+AMOUNT_PATTERN = re.compile(
+    r'(?P<symbol>[$€£¥₹])?\s*(?P<number>\d{1,3}(?:[,.\s]\d{3})*(?:[.,]\d{2})?)'
+)
+
+# Accepted range: 0.01 <= value <= 999999999999
+MIN_VALUE = Decimal('0.01')
+MAX_VALUE = Decimal('999999999999')
+MAX_INTEGER_DIGITS = 12
+
+
+def tokenize_amounts(text: str) -> Iterator[Tuple[str, Optional[str], int, int]]:
+    """
+    Yield amounts found in text
+
+    Separators are normalised (European and US styles), the range filter is
+    applied and the canonical value string is produced without constructing
+    a Decimal for ASCII input.
+
+    Args:
+        text: Paragraph or cell text
+
+    Yields:
+        Tuple of (canonical value string, currency symbol or None,
+        start offset, end offset) where text[start:end] is the matched text
+    """
+    for match in AMOUNT_PATTERN.finditer(text):
+        value = normalize_amount(match.group('number'))
+        if value is not None:
+            start, end = match.span()
+            yield value, match.group('symbol'), start, end
+
+
+def normalize_amount(number: str) -> Optional[str]:
+    """
+    Convert a matched number to the string ``str(Decimal(...))`` would give
+
+    Returns:
+        Canonical value string, or None if the number is invalid or out of range
+    """
+    if not number.isdigit():
+        # Drop whitespace thousands separators
+        num_str = ''.join(number.split())
+
+        # Handle different decimal separators
+        if ',' in num_str and '.' in num_str:
+            # Whichever separator comes last is the decimal point
+            if num_str.rindex(',') > num_str.rindex('.'):
+                num_str = num_str.replace('.', '').replace(',', '.')
+            else:
+                num_str = num_str.replace(',', '')
+        elif ',' in num_str:
+            # A single comma followed by two digits is a decimal separator
+            parts = num_str.split(',')
+            if len(parts) == 2 and len(parts[1]) == 2:
+                num_str = num_str.replace(',', '.')
+            else:
+                num_str = num_str.replace(',', '')
+    else:
+        num_str = number
+
+    if not num_str.isascii():
+        # Non-ASCII digits are rare; let Decimal interpret them
+        return _normalize_with_decimal(num_str)
+
+    integer, dot, fraction = num_str.partition('.')
+    if '.' in fraction:
+        return None
+
+    integer = integer.lstrip('0') or '0'
+
+    # Range filter on digit strings
+    if len(integer) > MAX_INTEGER_DIGITS:
+        return None
+    if integer == '9' * MAX_INTEGER_DIGITS and fraction.strip('0'):
+        return None
+    if integer == '0' and fraction[:2].ljust(2, '0') == '00':
+        return None
+
+    return f"{integer}.{fraction}" if dot else integer
+
+
+def _normalize_with_decimal(num_str: str) -> Optional[str]:
+    """Decimal-based normalisation used for non-ASCII digits"""
+    try:
+        value = Decimal(num_str)
+    except Exception:
+        return None
+
+    if MIN_VALUE <= value <= MAX_VALUE:
+        return str(value)
+    return None
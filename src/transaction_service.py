@@ -10,6 +10,7 @@ from web3 import Web3, HTTPProvider
 from eth_account import Account
 from eth_utils import to_checksum_address
 from dotenv import load_dotenv
+from fixed_point import get_asset, rescale
 from logger import converter_logger
 
 
@@ -147,8 +148,14 @@ class TransactionService:
             self.account = None
             return False
 
-    async def send_eth(self, to_address: str = None, amount_eth: float = 0, currency: str = 'ETH') -> Dict:
-        """Send ETH or tokens to an address"""
+    async def send_eth(self, to_address: str = None, amount_eth: float = 0, currency: str = 'ETH',
+                       base_units: Optional[int] = None) -> Dict:
+        """
+        Send ETH or tokens to an address
+
+        base_units, when given, is the exact amount in the asset's base units
+        (fixed_point.ASSETS) and is sent instead of the float amount_eth.
+        """
         # Use default wallet address if none provided
         if not to_address:
             to_address = self.get_wallet_address(currency)
@@ -170,7 +177,7 @@ class TransactionService:
             # For tokens (USDT, USDC), use token transfer
             if currency.upper() in self.token_addresses:
                 converter_logger.info(f"Using token transfer for {currency}")
-                return await self._send_token(to_address, amount_eth, currency.upper())
+                return await self._send_token(to_address, amount_eth, currency.upper(), base_units)
             
             # For ETH
             if currency.upper() != 'ETH':
@@ -179,7 +186,10 @@ class TransactionService:
             converter_logger.info(f"Using ETH transfer for {currency}")
             
             # Convert amount to wei
-            amount_wei = self.web3.to_wei(amount_eth, 'ether')
+            if base_units is not None:
+                amount_wei = rescale(base_units, get_asset('ETH').decimals, 18)
+            else:
+                amount_wei = self.web3.to_wei(amount_eth, 'ether')
             
             # Get nonce
             nonce = self.web3.eth.get_transaction_count(self.account.address)
@@ -223,7 +233,8 @@ class TransactionService:
             converter_logger.error(f"Error sending {currency}: {e}")
             return {'error': str(e)}
 
-    async def _send_token(self, to_address: str, amount: float, token_symbol: str) -> Dict:
+    async def _send_token(self, to_address: str, amount: float, token_symbol: str,
+                          base_units: Optional[int] = None) -> Dict:
         """Send ERC20 token to specified address"""
         try:
             converter_logger.info(f"Starting token transfer: {amount} {token_symbol} to {to_address}")
@@ -249,7 +260,10 @@ class TransactionService:
                 decimals = 6 if token_symbol == 'USDT' else 18
                 converter_logger.warning(f"Could not get decimals from contract, using fallback: {decimals}. Error: {e}")
             
-            amount_wei = int(amount * (10 ** decimals))
+            if base_units is not None:
+                amount_wei = rescale(base_units, get_asset(token_symbol).decimals, decimals)
+            else:
+                amount_wei = int(amount * (10 ** decimals))
             converter_logger.info(f"Amount in wei: {amount_wei}")
             
             # Check balance
@@ -128,7 +128,8 @@ class WalletService:
         
         return result
     
-    def send_to_wallet(self, currency: str, amount: float, wallet_id: str = None) -> Dict:
+    def send_to_wallet(self, currency: str, amount: float, wallet_id: str = None,
+                       base_units: Optional[int] = None) -> Dict:
         """
         Send converted amount to wallet (actual blockchain transaction)
         
@@ -136,6 +137,8 @@ class WalletService:
             currency: Currency code (ETH, USDT, USDC)
             amount: Amount to send
             wallet_id: Optional wallet ID (defaults to client address)
+            base_units: Exact amount in the asset's base units (see
+                fixed_point.ASSETS); sent instead of amount when given
             
         Returns:
             Dict with transaction result
@@ -204,7 +207,8 @@ class WalletService:
             result = asyncio.run(transaction_service.send_eth(
                 to_address=wallet_address,
                 amount_eth=amount,
-                currency=currency
+                currency=currency,
+                base_units=base_units
             ))
             
             # Return transaction result
@@ -90,6 +90,34 @@ test_endpoint(
     headers={'Content-Type': 'application/json'}
 )
 
+# Test 5: Batch Conversion
+test_endpoint(
+    'Batch Conversion (USD to BTC/ETH/USDT)',
+    'POST',
+    f'{API_URL}/api/convert-batch',
+    json={
+        'amounts': [5000, 250.5, 12],
+        'to_currencies': ['BTC', 'ETH', 'USDT']
+    },
+    headers={'Content-Type': 'application/json'}
+)
+
+# Invalid batches are rejected with 400 and valid JSON errors
+for name, payload in [
+    ('NaN amount', '{"amounts": [NaN], "to_currencies": "BTC"}'),
+    ('Infinite amount', '{"amounts": [Infinity], "to_currencies": "BTC"}'),
+    ('Empty amounts', '{"amounts": [], "to_currencies": "BTC"}'),
+    ('Currency object', '{"amounts": [1], "to_currencies": {"BTC": 1}}'),
+]:
+    try:
+        response = requests.post(f'{API_URL}/api/convert-batch', data=payload,
+                                 headers={'Content-Type': 'application/json'}, timeout=10)
+        status = '✓' if response.status_code == 400 and 'error' in response.json() else '✗'
+        print(f'{status} Batch rejects {name}: {response.status_code} {response.text.strip()}')
+    except requests.exceptions.ConnectionError:
+        print('✗ ERROR: Cannot connect to Flask server')
+        break
+
 print('\n' + '=' * 60)
 print('API Tests Complete!')
 print('=' * 60)
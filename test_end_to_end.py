@@ -4,12 +4,20 @@
 import sys
 import os
 import json
+from decimal import Decimal
 sys.path.insert(0, 'src')
 
 from dotenv import load_dotenv
 load_dotenv()
 
+import tempfile
+import src.converter as converter_module
 from src.converter import crypto_converter
+from src.conversion_storage import ConversionStorage
+
+# Save test conversions to a scratch store, not the live data/conversions
+conversion_storage = ConversionStorage(tempfile.mkdtemp())
+converter_module.conversion_storage = conversion_storage
 
 print('=' * 60)
 print('END-TO-END CONVERSION TEST')
@@ -98,6 +106,97 @@ else:
     print(f'\n✗ Portfolio summary failed: {result3.get("error")}')
     sys.exit(1)
 
+print('\n' + '=' * 60)
+print('TEST 4: Shared Conversion Context')
+print('=' * 60)
+
+from src.converter import ConversionContext
+
+records_before = len(conversion_storage.list_conversions())
+context = ConversionContext(demo_file)
+summary = crypto_converter.get_portfolio_summary(demo_file, context=context)
+again = crypto_converter.convert_balances(demo_file, context=context)
+records_added = len(conversion_storage.list_conversions()) - records_before
+
+if not summary.get('success') or again['conversion_id'] != summary['conversion_id'] or records_added != 1:
+    print(f'\n✗ Shared context saved {records_added} records')
+    sys.exit(1)
+expected_cents = int(sum(Decimal(b['value_decimal']) for b in again['parsed_balances']) * 100)
+if again['total_usd_cents'] != expected_cents or again['base_units'] != summary['base_units']:
+    print(f'\n✗ Reused stages gave a different result: {again["total_usd_cents"]} cents')
+    sys.exit(1)
+print('\n✓ Portfolio summary and conversion shared one parse, one pricing and one saved record')
+
+print('\n' + '=' * 60)
+print('TEST 5: Partial Send Failure')
+print('=' * 60)
+
+wallet = converter_module.wallet_service
+real_send = wallet.send_to_wallet
+attempts = []
+
+def flaky_send(currency, amount, wallet_id=None, base_units=None):
+    """First transfer succeeds, the second raises, the rest fail"""
+    attempts.append(currency)
+    if len(attempts) == 2:
+        raise ConnectionError('node went away')
+    return {'success': len(attempts) == 1, 'currency': currency, 'amount': amount, 'tx_hash': f'0x{currency}'}
+
+try:
+    wallet.send_to_wallet = flaky_send
+    partial = crypto_converter.send_converted_amounts_to_wallet(demo_file)
+    record = conversion_storage.get_conversion(partial.get('conversion_id'))
+    if partial.get('conversion_id') == summary['conversion_id']:
+        print(f'\n✗ Second conversion reused ID {summary["conversion_id"]}')
+        sys.exit(1)
+    if not record or record['sent'] or partial['sent_to_wallet'] or list(record['sent_currencies']) != attempts[:1]:
+        print(f'\n✗ Partial send was not recorded per currency: {record and record.get("sent_currencies")}')
+        sys.exit(1)
+    first_sent = attempts[0]
+    print(f'\n✓ Saved before sending; {first_sent} recorded as sent, conversion still pending')
+
+    def working_send(currency, amount, wallet_id=None, base_units=None):
+        attempts.append(currency)
+        return {'success': True, 'currency': currency, 'amount': amount}
+
+    attempts.clear()
+    wallet.send_to_wallet = working_send
+    retry = crypto_converter.send_saved_conversion(partial['conversion_id'])
+    record = conversion_storage.get_conversion(partial['conversion_id'])
+    if not retry.get('sent_to_wallet') or not record['sent'] or sorted(attempts) != sorted(set(record['conversions']) - {first_sent}):
+        print(f'\n✗ Retry sent {attempts}')
+        sys.exit(1)
+    print(f'✓ Retry sent only the remaining {len(attempts)} currencies and marked the conversion sent')
+
+    # A transfer that cannot be recorded stops the send before the next one
+    attempts.clear()
+    conversion_storage.record_sent = lambda *args: False
+    unrecorded = crypto_converter.send_converted_amounts_to_wallet(demo_file)
+    if 'error' not in unrecorded or len(attempts) != 1:
+        print(f'\n✗ Sending went on after an unrecorded transfer: {attempts}')
+        sys.exit(1)
+    print('✓ Unrecorded transfer stopped the send with an error')
+    del conversion_storage.record_sent
+
+    # Concurrent saves and sends must not lose records or sent currencies
+    from concurrent.futures import ThreadPoolExecutor
+    attempts.clear()
+    wallet.send_to_wallet = working_send
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        saved_ids = list(pool.map(lambda _: conversion_storage.save_conversion(partial), range(8)))
+        list(pool.map(lambda _: crypto_converter.send_saved_conversion(saved_ids[0]), range(4)))
+    records = {c['id']: c for c in conversion_storage._load_conversions()}
+    if len(set(saved_ids)) != 8 or not all(i in records for i in saved_ids):
+        print(f'\n✗ Concurrent saves lost records: {len(records)} stored')
+        sys.exit(1)
+    if sorted(attempts) != sorted(partial['conversions']) or not records[saved_ids[0]]['sent']:
+        print(f'\n✗ Concurrent sends of one conversion sent {attempts}')
+        sys.exit(1)
+    print('✓ Concurrent saves kept every record; concurrent sends sent each currency once')
+finally:
+    wallet.send_to_wallet = real_send
+    conversion_storage.__dict__.pop('record_sent', None)
+
 print('\n' + '=' * 60)
 print('✓ ALL TESTS PASSED!')
 print('=' * 60)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Test script for content-hash parse cache"""
+
+import sys
+import os
+import shutil
+import tempfile
+sys.path.insert(0, 'src')
+
+from docx import Document
+from src.parse_cache import ParseCache
+from src.parser import BalanceParser
+
+print('Testing Parse Cache...')
+print('=' * 60)
+
+tmp_dir = tempfile.mkdtemp()
+first_file = os.path.join(tmp_dir, 'first.docx')
+copy_file = os.path.join(tmp_dir, 'copy_of_first.docx')
+other_file = os.path.join(tmp_dir, 'other.docx')
+
+doc = Document()
+doc.add_paragraph('Checking Account: $5,250.00')
+doc.add_paragraph('Savings Account: $12,800.50')
+doc.save(first_file)
+shutil.copy(first_file, copy_file)
+
+doc = Document()
+doc.add_paragraph('Crypto Wallet: $3,275.25')
+doc.save(other_file)
+
+cache = ParseCache(max_entries=1, disk_dir=os.path.join(tmp_dir, 'store'))
+
+# Identical bytes hash to the same key regardless of file name
+first_digest = cache.file_digest(first_file)
+if first_digest != cache.file_digest(copy_file):
+    print('✗ Identical files produced different digests')
+    sys.exit(1)
+print('✓ Identical uploads share a content digest')
+
+if cache.get(first_digest) is not None:
+    print('✗ Empty cache returned a result')
+    sys.exit(1)
+
+balances = BalanceParser(first_file).parse_compact()
+cache.put(first_digest, balances)
+
+if cache.get(first_digest) is not balances:
+    print('✗ Cached balances differ from parsed balances')
+    sys.exit(1)
+print('✓ Memory hit returns the parsed balances')
+
+# A second entry evicts the first from memory; the disk store still has it
+other_digest = cache.file_digest(other_file)
+cache.put(other_digest, BalanceParser(other_file).parse_compact())
+
+if cache.get(first_digest).to_list() != balances.to_list():
+    print('✗ Evicted entry was not recovered from disk store')
+    sys.exit(1)
+
+stats = cache.get_stats()
+print(f"\nStats: {stats['hits']} hit(s), {stats['misses']} miss(es), {stats['disk_hits']} disk hit(s)")
+
+if (stats['hits'], stats['misses'], stats['disk_hits'], stats['entries']) != (2, 1, 1, 1):
+    print('✗ Unexpected hit/miss counters')
+    sys.exit(1)
+print('✓ LRU bound and disk fallback respected')
+
+# A failed disk write leaves no temp file behind
+blocked = ParseCache(max_entries=1, disk_dir=os.path.join(tmp_dir, 'blocked'))
+os.makedirs(blocked._disk_path(first_digest))  # the entry path is a directory: replace fails
+blocked.put(first_digest, balances)
+if os.listdir(blocked.disk_dir) != [f'{first_digest}.json']:
+    print(f'✗ Failed disk write left {os.listdir(blocked.disk_dir)}')
+    sys.exit(1)
+print('✓ Failed disk write cleaned up its temp file')
+
+shutil.rmtree(tmp_dir)
+
+print('\n' + '=' * 60)
+print('Parse Cache Test: PASSED')
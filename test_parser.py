@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Test script for balance parser engines"""
+
+import sys
+import os
+import tempfile
+from decimal import Decimal
+sys.path.insert(0, 'src')
+
+from docx import Document
+from src.parser import BalanceParser
+
+print('Testing Balance Parser...')
+print('=' * 60)
+
+tmp_dir = tempfile.mkdtemp()
+sample_file = os.path.join(tmp_dir, 'parser_sample.docx')
+
+# Build a document exercising paragraphs, runs, tables and merged cells
+doc = Document()
+doc.add_heading('Account Balances - November 2024', 0)
+doc.add_paragraph('Checking Account: $5,250.00')
+doc.add_paragraph('')
+para = doc.add_paragraph('Savings: ')
+para.add_run('€12.800,50').bold = True
+para.add_run().add_tab()
+para.add_run('Brokerage 45000.00')
+para.add_run().add_break()
+para.add_run('Pending £1,234.56')
+
+table = doc.add_table(rows=3, cols=3)
+table.cell(0, 0).text = 'Account'
+table.cell(0, 1).text = 'Balance'
+table.cell(1, 0).text = 'Emergency Fund'
+table.cell(1, 1).text = '$8,500.00'
+table.cell(1, 2).text = '¥300,000'
+table.cell(2, 0).merge(table.cell(2, 1)).text = 'Merged 3,275.25'
+table.cell(0, 2).merge(table.cell(1, 2))
+nested = table.cell(2, 2).add_table(rows=1, cols=1)
+nested.cell(0, 0).text = 'Nested 999.99'
+
+doc.add_paragraph('Crypto Wallet: $3,275.25')
+
+second = doc.add_table(rows=1, cols=2)
+second.cell(0, 0).text = '₹10,000.00'
+second.cell(0, 1).text = 'Fees 12.50'
+doc.save(sample_file)
+
+# Parse with both engines
+docx_balances = BalanceParser(sample_file).parse()
+stream_balances = BalanceParser(sample_file, streaming=True).parse()
+
+print(f'\npython-docx engine: {len(docx_balances)} balance(s)')
+print(f'streaming engine:   {len(stream_balances)} balance(s)')
+
+if docx_balances != stream_balances:
+    print('\n✗ Streaming engine output differs from python-docx engine')
+    for a, b in zip(docx_balances, stream_balances):
+        if a != b:
+            print(f'  python-docx: {a}')
+            print(f'  streaming:   {b}')
+            break
+    sys.exit(1)
+
+if not docx_balances:
+    print('\n✗ No balances extracted')
+    sys.exit(1)
+
+print('✓ Streaming engine output identical to python-docx engine')
+
+# Tables without a w:tblGrid still yield every cell, merges included
+gridded_file = os.path.join(tmp_dir, 'gridded.docx')
+gridless_file = os.path.join(tmp_dir, 'gridless.docx')
+doc = Document()
+doc.add_paragraph('Grid-less table below')
+table = doc.add_table(rows=3, cols=3)
+table.cell(0, 0).text = 'Checking $1,000.00'
+table.cell(0, 1).text = 'Savings $2,500.50'
+table.cell(1, 0).merge(table.cell(1, 1)).text = 'Spanned 300.00'
+table.cell(1, 2).merge(table.cell(2, 2)).text = 'Merged down $42.00'
+table.cell(2, 0).text = 'Last row 7.25'
+doc.save(gridded_file)
+table._tbl.remove(table._tbl.tblGrid)
+doc.save(gridless_file)
+
+gridless_balances = BalanceParser(gridless_file, streaming=True).parse()
+if gridless_balances != BalanceParser(gridded_file).parse() or len(gridless_balances) != 7:
+    print(f'✗ Grid-less table lost cells: {[b["original_text"] for b in gridless_balances]}')
+    sys.exit(1)
+print('✓ Grid-less table streamed like python-docx reads it with a grid')
+
+# Summaries should match as well
+docx_parser = BalanceParser(sample_file)
+docx_parser.parse()
+stream_parser = BalanceParser(sample_file, streaming=True)
+stream_parser.parse()
+
+if docx_parser.get_summary() != stream_parser.get_summary():
+    print('✗ Summary statistics differ between engines')
+    sys.exit(1)
+
+print('✓ Summary statistics identical')
+
+# Lazy iteration yields the same balances and keeps running statistics
+lazy_parser = BalanceParser(sample_file, streaming=True)
+lazy_balances = list(lazy_parser.iter_balances())
+
+if lazy_balances != docx_balances or lazy_parser.balances:
+    print('✗ iter_balances() output differs from parse()')
+    sys.exit(1)
+
+if lazy_parser.get_summary() != docx_parser.get_summary():
+    print('✗ Running summary differs from parse() summary')
+    sys.exit(1)
+
+expected_total = sum(Decimal(b['value_decimal']) for b in docx_balances)
+if lazy_parser.get_total() != expected_total:
+    print('✗ Running total differs from sum of balances')
+    sys.exit(1)
+
+print('✓ iter_balances() matches parse() with single-pass summary')
+
+# Compact representation materializes to the same dicts
+compact_parser = BalanceParser(sample_file)
+balance_set = compact_parser.parse_compact()
+
+if len(balance_set) != len(docx_balances) or balance_set.to_list() != docx_balances:
+    print('✗ BalanceSet does not materialize to parse() output')
+    sys.exit(1)
+
+if list(balance_set.decimal_values()) != [Decimal(b['value_decimal']) for b in docx_balances]:
+    print('✗ BalanceSet decimal values differ')
+    sys.exit(1)
+
+if compact_parser.get_summary() != docx_parser.get_summary():
+    print('✗ parse_compact() summary differs')
+    sys.exit(1)
+
+expected_cents = int(expected_total * 100)
+if balance_set.total_units(2) != expected_cents or balance_set.total_units(4) != int(expected_total * 10000):
+    print(f'✗ BalanceSet total_units() gave {balance_set.total_units(2)}, expected {expected_cents}')
+    sys.exit(1)
+
+print('✓ parse_compact() BalanceSet matches parse()')
+
+# Summary-only scan keeps nothing but agrees with the Decimal computation
+scan_parser = BalanceParser(sample_file, percentiles=True)
+summary = scan_parser.scan()
+values = [Decimal(b['value_decimal']) for b in docx_balances]
+
+if scan_parser.balances or summary['total_values_found'] != len(values):
+    print('✗ scan() kept balances or miscounted')
+    sys.exit(1)
+
+if (summary['total_sum'], summary['min_value'], summary['max_value'], summary['avg_value']) != (
+        float(sum(values)), float(min(values)), float(max(values)), float(sum(values) / len(values))):
+    print(f'✗ Integer summary differs from Decimal summary: {summary}')
+    sys.exit(1)
+
+median = sorted(values)[(len(values) - 1) // 2]
+if abs(summary['percentiles']['p50'] - float(median)) > float(median) * 0.01:
+    print(f"✗ p50 estimate {summary['percentiles']['p50']} not within 1% of {median}")
+    sys.exit(1)
+
+print('✓ scan() summary exact, percentile sketch within 1%')
+
+# In-memory uploads parse the same as files on disk
+with open(sample_file, 'rb') as f:
+    file_data = f.read()
+
+for streaming in (False, True):
+    memory_balances = BalanceParser('upload.docx', streaming=streaming, file_data=file_data).parse()
+    if memory_balances != docx_balances:
+        print(f'✗ In-memory parse differs from file parse (streaming={streaming})')
+        sys.exit(1)
+
+print('✓ Bytes input parses identically to file input')
+
+# CSV and XLSX exports share the document extraction rules
+csv_file = os.path.join(tmp_dir, 'export.csv')
+with open(csv_file, 'w', newline='') as f:
+    f.write('account,balance,note\n')
+    f.write('Checking,"$5,250.00",\n')
+    f.write('Savings,12800.5,"€12.800,50"\n')
+    f.write('Empty,,\n')
+
+csv_balances = BalanceParser(csv_file).parse()
+csv_values = [b['value_decimal'] for b in csv_balances]
+if csv_values != ['5250.00', '12800.5', '12800.50']:
+    print(f'✗ Unexpected CSV balances: {csv_values}')
+    sys.exit(1)
+print('✓ CSV export parsed row by row')
+
+# Bare numbers count only in money columns, at full precision
+precise_file = os.path.join(tmp_dir, 'holdings.csv')
+with open(precise_file, 'w', newline='') as f:
+    f.write('id,year,quantity,balance (USD),note\n')
+    f.write('1001,2024,3,0.004,\n')
+    f.write('1002,2025,12,0.005,"fee $1.50"\n')
+    f.write('1003,2024,1,1234.56789,\n')
+    f.write('1004,2024,1,0.0000000000000000001,\n')
+
+precise_values = [b['value_decimal'] for b in BalanceParser(precise_file).parse()]
+if precise_values != ['0.004', '0.005', '1.50', '1234.56789']:
+    print(f'✗ Unexpected balances from numeric columns: {precise_values}')
+    sys.exit(1)
+
+headerless_file = os.path.join(tmp_dir, 'headerless.csv')
+with open(headerless_file, 'w', newline='') as f:
+    f.write('2024,15,"$20.00"\n')
+if [b['value_decimal'] for b in BalanceParser(headerless_file).parse()] != ['20.00']:
+    print('✗ Bare numbers without an amount header were read as balances')
+    sys.exit(1)
+print('✓ Sub-cent amounts kept exactly; IDs, years and quantities skipped')
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    print('⚠ openpyxl not installed - skipping XLSX check')
+else:
+    xlsx_file = os.path.join(tmp_dir, 'export.xlsx')
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Balances'
+    sheet.append(['account', 'balance', 'note'])
+    sheet.append(['Checking', '$5,250.00', None])
+    sheet.append(['Savings', 12800.5, '€12.800,50'])
+    sheet.append(['Flag', True, None])
+    sheet.append(['Dust', 0.004, 2024])
+    workbook.save(xlsx_file)
+
+    with open(xlsx_file, 'rb') as f:
+        xlsx_data = f.read()
+
+    xlsx_balances = BalanceParser('upload.xlsx', file_data=xlsx_data).parse()
+    if [b['value_decimal'] for b in xlsx_balances] != csv_values + ['0.004']:
+        print(f'✗ Unexpected XLSX balances: {xlsx_balances}')
+        sys.exit(1)
+    if xlsx_balances[0]['line_ref'] != 'Balances-row-2':
+        print(f"✗ Unexpected XLSX line reference: {xlsx_balances[0]['line_ref']}")
+        sys.exit(1)
+    print('✓ XLSX export parsed in read-only mode')
+
+# parse-batch CLI: every file gets one JSON line, in completion order
+import json
+import subprocess
+
+batch_dir = os.path.join(tmp_dir, 'batch')
+os.makedirs(batch_dir)
+expected_batch = {}
+for idx, amount in enumerate(['1,000.00', '2,500.50', '75.25']):
+    path = os.path.join(batch_dir, f'statement_{idx}.docx')
+    doc = Document()
+    doc.add_paragraph(f'Balance: ${amount}')
+    doc.save(path)
+    expected_batch[path] = amount.replace(',', '')
+broken_file = os.path.join(batch_dir, 'broken.docx')
+with open(broken_file, 'wb') as f:
+    f.write(b'not a zip')
+
+batch_output = os.path.join(tmp_dir, 'batch.jsonl')
+completed = subprocess.run([sys.executable, 'src/cli.py', 'parse-batch', batch_dir, '--workers', '2',
+                            '--chunksize', '1', '--output', batch_output], capture_output=True, text=True)
+with open(batch_output) as f:
+    lines = [json.loads(line) for line in f]
+by_file = {line['file']: line for line in lines}
+
+if completed.returncode != 1 or len(lines) != 4 or set(by_file) != set(expected_batch) | {broken_file}:
+    print(f'✗ parse-batch wrote {len(lines)} lines (exit {completed.returncode})')
+    sys.exit(1)
+if by_file[broken_file]['success'] or any(
+        [b['value_decimal'] for b in by_file[path]['balances']] != [value]
+        for path, value in expected_batch.items()):
+    print(f'✗ Unexpected parse-batch results: {lines}')
+    sys.exit(1)
+print('✓ parse-batch wrote one JSON line per file, failures included')
+
+print('\n' + '=' * 60)
+print('Balance Parser Test: PASSED')
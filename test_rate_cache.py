@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""Test script for rate caching behavior (offline)"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+sys.path.insert(0, 'src')
+
+from src.rate_service import RateService
+from src.shared_rate_cache import SharedRateCache
+from src.rate_snapshot import SnapshotStore
+from src.rate_history import RateHistory
+from src.cross_rates import CrossRateMatrix
+from src.fixed_point import UnitRate, get_asset, rescale, to_units
+from src.balance_set import BalanceSet
+from src.http_session import PooledSession
+from src.stub_price_server import StubPriceServer
+from src.rate_providers import CoinbaseProvider, CoinGeckoProvider, CryptoCompareProvider, split_batches
+
+
+class SlowRateService(RateService):
+    """RateService whose upstream fetch is slow and counted"""
+
+    def __init__(self, delay, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.fetches = 0
+
+    def _fetch_from_api(self):
+        self.fetches += 1
+        time.sleep(self.delay)
+        return {'BTC': Decimal(40000 + self.fetches), 'ETH': Decimal('2500'),
+                'USDT': Decimal('1'), 'SOL': Decimal('150')}
+
+
+def start_stub(delay=0.3, btc=50000):
+    """Start a stub price server on a free local port"""
+    return StubPriceServer(latency=delay, prices={'BTC': btc}).start()
+
+
+print('Testing Rate Cache...')
+print('=' * 60)
+
+tmp_dir = tempfile.mkdtemp()
+fallback = os.path.join(tmp_dir, 'fallback_rates.json')
+
+# Stale-while-revalidate: an expired cache is served immediately
+service = SlowRateService(0.5, fallback_file=fallback, cache_ttl_minutes=0.5 / 60,
+                          refresh_ahead_seconds=0.2, max_staleness_minutes=1)
+first = service.get_rates()
+if service.fetches != 1 or first['BTC'] != Decimal(40001):
+    print('✗ Initial fetch did not populate the cache')
+    sys.exit(1)
+print('✓ Initial fetch populated the cache')
+
+time.sleep(0.6)
+start = time.perf_counter()
+stale = service.get_rates()
+elapsed = time.perf_counter() - start
+if stale['BTC'] != Decimal(40001) or elapsed > 0.1:
+    print(f'✗ Expired cache was not served immediately ({elapsed:.3f}s)')
+    sys.exit(1)
+print(f'✓ Stale rates served in {elapsed * 1000:.1f} ms while refreshing')
+
+# Repeated calls during the refresh do not start another one
+service.get_rates()
+service._refresh_thread.join()
+if service.fetches != 2 or service.get_rates()['BTC'] != Decimal(40002):
+    print(f'✗ Expected one background refresh, saw {service.fetches - 1}')
+    sys.exit(1)
+print('✓ Single background refresh replaced the cached rates')
+
+# Beyond max staleness the request waits for a fresh fetch
+service.max_staleness = timedelta(0)
+time.sleep(0.6)
+start = time.perf_counter()
+service.get_rates()
+if time.perf_counter() - start < 0.4 or service.fetches != 3:
+    print('✗ Rates past max staleness were served without refreshing')
+    sys.exit(1)
+print('✓ Rates past max staleness trigger a blocking fetch')
+
+# Refresher thread keeps the cache warm ahead of expiry
+service = SlowRateService(0.05, fallback_file=fallback, cache_ttl_minutes=0.5 / 60,
+                          refresh_ahead_seconds=0.2)
+service.start_refresher()
+time.sleep(1.2)
+service.stop_refresher()
+if not service._is_cache_valid() or service.fetches < 3:
+    print(f'✗ Refresher did not keep the cache warm ({service.fetches} fetches)')
+    sys.exit(1)
+print(f'✓ Refresher refreshed ahead of expiry ({service.fetches} fetches in 1.2s)')
+
+# Single-flight: concurrent cache misses share one upstream request
+server = start_stub()
+api_url = f'{server.url}/api/v3/simple/price'
+service = RateService(fallback_file=fallback, providers=[CoinGeckoProvider(api_url)])
+
+results = []
+barrier = threading.Barrier(20)
+
+def cold_request():
+    barrier.wait()
+    results.append(service.get_rates())
+
+threads = [threading.Thread(target=cold_request) for _ in range(20)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+
+stats = service.get_stats()
+if server.hits != 1 or len(results) != 20:
+    print(f'✗ Expected 1 upstream hit for 20 concurrent misses, saw {server.hits}')
+    sys.exit(1)
+if any(rates != results[0] for rates in results) or results[0]['BTC'] != Decimal('50000'):
+    print('✗ Coalesced callers received different rates')
+    sys.exit(1)
+if stats['upstream_fetches'] != 1 or stats['coalesced_fetches'] + stats['upstream_fetches'] > 20:
+    print(f'✗ Unexpected fetch counters: {stats}')
+    sys.exit(1)
+print(f"✓ 20 concurrent misses -> 1 upstream hit ({stats['coalesced_fetches']} coalesced)")
+
+# Forced refreshes after completion each reach upstream again
+service.force_refresh()
+if server.hits != 2:
+    print('✗ Refresh after a completed fetch was not sent upstream')
+    sys.exit(1)
+print('✓ Later refreshes are not coalesced with finished ones')
+
+# Pooled session: refreshes reuse one keep-alive connection
+server.latency = 0
+for _ in range(5):
+    service.force_refresh()
+http_stats = service.get_stats()['http']
+if http_stats['connections_opened'] != 1 or http_stats['connections_reused'] < 5:
+    print(f'✗ Connections were not reused: {http_stats}')
+    sys.exit(1)
+print(f"✓ {http_stats['attempts']} requests over {http_stats['connections_opened']} connection "
+      f"({http_stats['connections_reused']} reused)")
+
+# Transient upstream errors are retried with backoff
+service.http.backoff_base = 0.01
+server.fail_next = 2
+hits_before = server.hits
+rates = service.force_refresh()
+http_stats = service.get_stats()['http']
+if server.hits - hits_before != 3 or http_stats['retries'] != 2 or rates['BTC'] != Decimal('50000'):
+    print(f'✗ 503 responses were not retried: {http_stats}')
+    sys.exit(1)
+print('✓ Two 503 responses retried before success')
+
+server.fail_next = 3
+hits_before = server.hits
+if service._refresh() is not None or server.hits - hits_before != 3:
+    print('✗ Retries were not bounded by max_retries')
+    sys.exit(1)
+print('✓ Retries stop after max_retries and the refresh fails')
+server.latency = 0.3
+
+# Shared cache: worker processes share one snapshot and one upstream fetch
+import multiprocessing
+
+server.hits = 0
+db_path = os.path.join(tmp_dir, 'rate_cache.db')
+
+def worker_process(queue):
+    worker = RateService(fallback_file=fallback, shared_cache=SharedRateCache(db_path),
+                         providers=[CoinGeckoProvider(api_url)])
+    queue.put(str(worker.get_rates()['BTC']))
+
+queue = multiprocessing.Queue()
+processes = [multiprocessing.Process(target=worker_process, args=(queue,)) for _ in range(4)]
+for process in processes:
+    process.start()
+worker_rates = [queue.get(timeout=30) for _ in processes]
+for process in processes:
+    process.join()
+
+if server.hits != 1 or worker_rates != ['50000'] * 4:
+    print(f'✗ Expected 1 upstream hit for 4 workers, saw {server.hits}')
+    sys.exit(1)
+print('✓ 4 worker processes -> 1 upstream hit via shared cache')
+
+late = RateService(fallback_file=fallback, shared_cache=SharedRateCache(db_path),
+                   providers=[CoinGeckoProvider(api_url)])
+late.get_rates()
+if server.hits != 1 or late.get_stats()['upstream_fetches'] != 0:
+    print('✗ New worker fetched instead of using the shared snapshot')
+    sys.exit(1)
+print('✓ New worker reuses the shared snapshot without fetching')
+
+class CountingSharedCache(SharedRateCache):
+    """SharedRateCache that counts freshness checks against SQLite"""
+
+    checks = 0
+
+    def fetched_at(self):
+        CountingSharedCache.checks += 1
+        return super().fetched_at()
+
+counted = RateService(fallback_file=fallback, shared_cache=CountingSharedCache(db_path),
+                      providers=[CoinGeckoProvider(api_url)], shared_sync_seconds=0.2)
+counted.get_rates()
+checks_after_load = CountingSharedCache.checks
+for _ in range(1000):
+    counted.get_rates()
+hot_checks = CountingSharedCache.checks - checks_after_load
+time.sleep(0.25)
+counted.get_rates()
+if hot_checks != 0 or CountingSharedCache.checks != checks_after_load + 1:
+    print(f'✗ Fresh cache hits read the shared cache {hot_checks} times')
+    sys.exit(1)
+print('✓ 1000 fresh hits without a shared cache read; re-checked once after the sync interval')
+
+# Hedging: a slow primary is overtaken by the next provider after hedge_delay
+fast = start_stub(delay=0, btc=50010)
+server.latency = 2
+service = RateService(fallback_file=os.path.join(tmp_dir, 'hedge.json'), hedge_delay_seconds=0.1,
+                      providers=[CoinGeckoProvider(api_url),
+                                 CryptoCompareProvider(f'{fast.url}/data/pricemulti')])
+start = time.perf_counter()
+rates = service.get_rates()
+elapsed = time.perf_counter() - start
+source = service.get_stats()['providers']['last_source']
+if rates['BTC'] != Decimal('50010') or elapsed > 1 or source != 'cryptocompare':
+    print(f'✗ Hedged fetch waited on the slow provider ({elapsed:.2f}s, source {source})')
+    sys.exit(1)
+print(f'✓ Slow primary hedged: answer from {source} in {elapsed * 1000:.0f} ms')
+
+# Median: per-currency median across all responders
+server.latency = 0
+third = start_stub(delay=0, btc=50020)
+service = RateService(fallback_file=os.path.join(tmp_dir, 'median.json'), aggregation='median',
+                      providers=[CoinGeckoProvider(api_url),
+                                 CryptoCompareProvider(f'{fast.url}/data/pricemulti'),
+                                 CoinbaseProvider(f'{third.url}/v2/exchange-rates')])
+rates = service.get_rates()
+if abs(rates['BTC'] - Decimal('50010')) > Decimal('0.01') or rates['USDT'] != Decimal('1'):
+    print(f"✗ Median across providers was {rates['BTC']}")
+    sys.exit(1)
+print(f"✓ Median of 3 providers: BTC {rates['BTC']:.2f}")
+
+# Currency universe: large universes are split into even, concurrent batches
+if [len(b) for b in split_batches([str(i) for i in range(120)], 50)] != [40, 40, 40]:
+    print('✗ Batches were not evenly sized')
+    sys.exit(1)
+
+universe = ['BTC', 'ETH', 'USDT', 'SOL'] + [f'T{i:03d}' for i in range(116)]
+fast.hits = 0
+service = RateService(fallback_file=os.path.join(tmp_dir, 'universe.json'), currencies=universe,
+                      providers=[CryptoCompareProvider(f'{fast.url}/data/pricemulti')])
+service.http.max_retries = 0
+rates = service.get_rates()
+if fast.hits != 3 or sorted(rates) != sorted(universe):
+    print(f'✗ Expected 120 rates from 3 batches, got {len(rates)} from {fast.hits}')
+    sys.exit(1)
+print(f'✓ {len(universe)} currencies priced in {fast.hits} batched requests')
+
+# Partial responses: a failed batch keeps the previous rates instead of failing the fetch
+previous = rates
+fast.volatility = 0.01
+fast.fail_next = 1
+rates = service.force_refresh()
+refreshed = sum(1 for code in universe if rates[code] != previous[code])
+if len(rates) != len(universe) or refreshed != 80:
+    print(f'✗ Partial response handling: {len(rates)} rates, {refreshed} refreshed')
+    sys.exit(1)
+print('✓ One failed batch of 3: 80 rates refreshed, 40 kept from the previous snapshot')
+
+for stub in (server, fast, third):
+    stub.stop()
+
+# Snapshots: immutable, content-addressed and deduplicated in the store
+store_file = os.path.join(tmp_dir, 'snapshots.jsonl')
+store = SnapshotStore(store_file)
+first = store.publish({'BTC': Decimal('50000'), 'ETH': Decimal('3000')}, 'coingecko')
+again = store.publish({'ETH': Decimal('3000'), 'BTC': Decimal('50000')}, 'coinbase')
+changed = store.publish({'BTC': Decimal('50001'), 'ETH': Decimal('3000')}, 'coingecko')
+if again.id != first.id or again.rates is not first.rates or changed.id == first.id or changed.version != first.version + 1:
+    print('✗ Identical rates were not deduplicated into one snapshot')
+    sys.exit(1)
+if again.source != 'coinbase' or again.version != first.version or store.get(first.id).source != 'coinbase':
+    print(f'✗ Republished snapshot reports source {again.source}')
+    sys.exit(1)
+
+try:
+    first.rates['BTC'] = Decimal('1')
+    print('✗ Snapshot rates were mutable')
+    sys.exit(1)
+except TypeError:
+    pass
+try:
+    first.source = 'edited'
+    print('✗ Snapshot attributes were mutable')
+    sys.exit(1)
+except AttributeError:
+    pass
+
+reloaded = SnapshotStore(store_file)
+with open(store_file) as f:
+    stored_lines = sum(1 for _ in f)
+if stored_lines != 2 or reloaded.get(first.id).rates != first.rates or len(reloaded) != 2:
+    print(f'✗ Snapshot store persisted {stored_lines} lines')
+    sys.exit(1)
+print(f'✓ 3 publishes -> 2 immutable snapshots ({first.id}, {changed.id}), reloaded from disk')
+
+# Retention: only the most recent snapshots are kept, in memory and on disk
+bounded_file = os.path.join(tmp_dir, 'bounded_snapshots.jsonl')
+bounded = SnapshotStore(bounded_file, max_snapshots=3)
+published = [bounded.publish({'BTC': Decimal(50000 + i)}, 'coingecko') for i in range(10)]
+with open(bounded_file) as f:
+    bounded_lines = sum(1 for _ in f)
+reloaded = SnapshotStore(bounded_file, max_snapshots=3)
+if (len(bounded) != 3 or bounded.get(published[0].id) is not None or bounded_lines > 6
+        or [reloaded.get(s.id) is not None for s in published[-4:]] != [False, True, True, True]):
+    print(f'✗ Snapshot store kept {len(bounded)} snapshots and {bounded_lines} lines')
+    sys.exit(1)
+print(f'✓ 10 publishes with max_snapshots=3 -> 3 kept, {bounded_lines} lines on disk, newest reloaded')
+
+service = SlowRateService(0, fallback_file=fallback, snapshot_store=store)
+snapshot = service.get_snapshot()
+if service.get_snapshot_by_id(snapshot.id) is not snapshot or snapshot.float_rates['BTC'] != 40001.0:
+    print('✗ RateService did not publish its rates as a snapshot')
+    sys.exit(1)
+print(f'✓ RateService publishes snapshot {snapshot.id} v{snapshot.version} with precomputed floats')
+
+# History: sorted binary file, bisect point lookups, range queries, compaction
+history_file = os.path.join(tmp_dir, 'rate_history.bin')
+history = RateHistory(history_file, retention_days=0, compact_every_minutes=0)
+base = 1_700_000_000.0
+for i in range(5000):
+    history.append(base + i * 60, {'BTC': Decimal(40000 + i), 'ETH': Decimal('3000')})
+history.append(base + 5000 * 60, {'BTC': Decimal('1'), 'ETH': Decimal('1'), 'SOL': Decimal('150')})
+skipped = not history.append(base, {'BTC': Decimal('2')})
+
+start = time.perf_counter()
+for _ in range(1000):
+    point = history.at(base + 1234 * 60 + 59)
+lookup_us = (time.perf_counter() - start) * 1000
+if not skipped or point['rates'] != {'BTC': 41234.0, 'ETH': 3000.0} or history.at(base - 1) is not None:
+    print(f'✗ Point-in-time lookup returned {point}')
+    sys.exit(1)
+
+window = history.range(base + 100 * 60, base + 109 * 60, currencies=['btc'])
+latest = RateHistory(history_file).range(limit=1)[0]
+if len(window) != 10 or window[0]['rates'] != {'BTC': 40100.0} or latest['rates'].get('SOL') != 150.0:
+    print(f'✗ Range query returned {len(window)} records, latest {latest}')
+    sys.exit(1)
+print(f'✓ 5001 records, universe grew to {history.get_stats()["currencies"]}; at() {lookup_us:.1f}µs per lookup')
+
+compacting = RateHistory(history_file, retention_days=3, downsample_after_hours=1,
+                         downsample_interval_minutes=60, compact_every_minutes=0)
+removed = compacting.compact(now=base + 5000 * 60)
+hourly = [r['fetched_at'] // 3600 for r in compacting.range(end=base + 4939 * 60)]
+if removed <= 0 or len(hourly) != len(set(hourly)) or hourly[0] < (base + 680 * 60) // 3600:
+    print('✗ Compaction did not downsample old records to one per hour')
+    sys.exit(1)
+print(f'✓ Compaction removed {removed} records; older than 1h kept hourly ({len(hourly)} left)')
+
+service = SlowRateService(0, fallback_file=fallback, history=RateHistory(os.path.join(tmp_dir, 'service_history.bin')))
+service.get_rates()
+service.flush_fallback_rates()
+recorded = service.history.at(time.time())
+if not recorded or recorded['rates']['BTC'] != 40001.0:
+    print('✗ RateService did not record its fetch in the history')
+    sys.exit(1)
+print('✓ RateService appends each upstream fetch to the history')
+
+# A broken history file never turns a good fetch into a fallback
+broken_history = os.path.join(tmp_dir, 'broken_history.bin')
+with open(broken_history, 'wb') as f:
+    f.write(b'not a history file at all')
+broken_fallback = os.path.join(tmp_dir, 'broken_fallback.json')
+service = SlowRateService(0, fallback_file=broken_fallback, history=RateHistory(broken_history))
+snapshot = service.get_snapshot()
+service.flush_fallback_rates()
+if snapshot.source != 'api' or snapshot.rates['BTC'] != Decimal(40001) or not os.path.exists(broken_fallback):
+    print(f'✗ History failure downgraded the fetch to {snapshot.source}')
+    sys.exit(1)
+print('✓ History write failure is logged; fetched rates still served and saved')
+
+# A failed fallback write leaves no temp file behind
+blocked_fallback = os.path.join(tmp_dir, 'blocked', 'fallback_rates.json')
+os.makedirs(blocked_fallback)  # the fallback path is a directory: replace fails
+service = SlowRateService(0, fallback_file=blocked_fallback)
+service.get_snapshot()
+service.flush_fallback_rates()
+if os.listdir(os.path.dirname(blocked_fallback)) != ['fallback_rates.json']:
+    print(f'✗ Failed fallback write left {os.listdir(os.path.dirname(blocked_fallback))}')
+    sys.exit(1)
+print('✓ Failed fallback write cleaned up its temp file')
+
+# Several processes appending to one history: rewrites never lose records
+shared_history = os.path.join(tmp_dir, 'shared_history.bin')
+
+def history_writer(index, queue):
+    writer = RateHistory(shared_history, retention_days=0, compact_every_minutes=0)
+    written = 0
+    for j in range(40):
+        # Each process adds its own currency, forcing concurrent rewrites
+        rates = {'BTC': Decimal(50000 + j), f'C{index}': Decimal(j + 1)}
+        written += writer.append(time.time(), rates)
+    queue.put(written)
+
+queue = multiprocessing.Queue()
+writers = [multiprocessing.Process(target=history_writer, args=(i, queue)) for i in range(4)]
+for process in writers:
+    process.start()
+appended = sum(queue.get(timeout=60) for _ in writers)
+for process in writers:
+    process.join()
+
+merged = RateHistory(shared_history)
+leftovers = [name for name in os.listdir(tmp_dir) if name.endswith('.tmp')]
+stats = merged.get_stats()
+if stats['records'] != appended or set(stats['currencies']) != {'BTC', 'C0', 'C1', 'C2', 'C3'} or leftovers:
+    print(f"✗ {appended} appends but {stats['records']} records, columns {stats['currencies']}, temp files {leftovers}")
+    sys.exit(1)
+print(f"✓ 4 processes appended {appended} records to one history file with concurrent rewrites")
+
+# Cross rates: N×N matrix built once per snapshot, conversions are lookups
+matrix = CrossRateMatrix(first)
+btc_eth = matrix.rate('BTC', 'ETH')
+round_trip = matrix.rate('BTC', 'ETH') * matrix.rate('ETH', 'BTC')
+if abs(btc_eth - 50000 / 3000) > 1e-12 or abs(round_trip - 1) > 1e-12 or matrix.rate('USD', 'BTC') != 1 / 50000:
+    print(f'✗ Cross rate BTC->ETH was {btc_eth}')
+    sys.exit(1)
+if matrix.rate('BTC', 'DOGE') is not None or matrix.row('USD')['ETH'] != 1 / 3000:
+    print('✗ Cross-rate matrix lookups by row or unknown currency failed')
+    sys.exit(1)
+
+service = SlowRateService(0, fallback_file=fallback)
+built = service.get_cross_rates()
+if built.snapshot_id != service.snapshot.id or built.size != len(service.snapshot.rates) + 1 or service.get_cross_rates() is not built:
+    print('✗ RateService did not precompute cross rates once per snapshot')
+    sys.exit(1)
+start = time.perf_counter()
+for _ in range(10000):
+    built.rate('BTC', 'ETH')
+lookup_ns = (time.perf_counter() - start) * 1e5
+print(f'✓ {built.size}×{built.size} cross rates ({built.get_stats()["bytes"]} bytes) precomputed; lookup {lookup_ns:.0f}ns')
+
+# Batch: one gather and one multiply over the whole batch
+batch_to = ['BTC', 'ETH', 'USD', 'DOGE'] * 2500
+batch_from = ['USD', 'BTC', 'ETH', 'USD'] * 2500
+batch_amounts = [float(i) for i in range(10000)]
+offsets = matrix.positions(batch_from, batch_to)
+if offsets[3] != -1 or offsets[:3] != [matrix.index['BTC'], matrix.index['BTC'] * matrix.size + matrix.index['ETH'],
+                                        matrix.index['ETH'] * matrix.size]:
+    print(f'✗ Batch positions were {offsets[:4]}')
+    sys.exit(1)
+priced = [i for i, offset in enumerate(offsets) if offset >= 0]
+start = time.perf_counter()
+converted = matrix.convert_many([batch_amounts[i] for i in priced], [offsets[i] for i in priced])
+batch_ns = (time.perf_counter() - start) / len(priced) * 1e9
+expected = [batch_amounts[i] * matrix.rate(batch_from[i], batch_to[i]) for i in priced]
+if converted.tolist() != expected or len(converted) != 7500:
+    print('✗ Batch conversion differs from per-pair lookups')
+    sys.exit(1)
+print(f'✓ 10000-row batch: 7500 converted, 2500 unpriced flagged; {batch_ns:.0f}ns per row')
+
+# Circuit breaker: during an outage requests get the fallback without upstream waits
+outage = start_stub(delay=0.2)
+outage.fail_next = 10 ** 6
+outage_fallback = os.path.join(tmp_dir, 'outage.json')
+with open(outage_fallback, 'w') as f:
+    json.dump({'timestamp': '2024-01-01T00:00:00', 'rates': {'BTC': '42000', 'ETH': '2000'}}, f)
+service = RateService(fallback_file=outage_fallback, http=PooledSession(max_retries=0),
+                      providers=[CoinGeckoProvider(f'{outage.url}/api/v3/simple/price')],
+                      breaker_failures=2, breaker_reset_seconds=0.3)
+for _ in range(2):
+    service.get_rates()
+hits_at_open = outage.hits
+fetches_at_open = service.upstream_fetches
+start = time.perf_counter()
+for _ in range(20):
+    rates = service.get_rates()
+elapsed = time.perf_counter() - start
+circuit = service.get_stats()['providers']['providers']['coingecko']['circuit']
+if circuit['state'] != 'open' or outage.hits != hits_at_open or rates['BTC'] != Decimal('42000') or elapsed > 0.5:
+    print(f'✗ Open circuit still waited on upstream ({elapsed:.2f}s, {circuit})')
+    sys.exit(1)
+if service.upstream_fetches != fetches_at_open:
+    print(f'✗ {service.upstream_fetches - fetches_at_open} refresh threads started before a probe was due')
+    sys.exit(1)
+print(f'✓ Circuit opened after 2 failures; 20 requests served from fallback in {elapsed * 1000:.1f} ms, 0 upstream calls')
+
+time.sleep(0.35)
+service.get_rates()  # probe due: runs in the background, request still gets the fallback
+service._refresh_thread.join()
+circuit = service.get_stats()['providers']['providers']['coingecko']['circuit']
+if circuit['state'] != 'open' or circuit['cooldown_seconds'] != 0.6 or outage.hits != hits_at_open + 1:
+    print(f'✗ Failed probe did not reopen the circuit with a longer cooldown: {circuit}')
+    sys.exit(1)
+
+outage.fail_next = 0
+time.sleep(0.65)
+service.get_rates()
+service._refresh_thread.join()
+rates = service.get_rates()
+circuit = service.get_stats()['providers']['providers']['coingecko']['circuit']
+if circuit['state'] != 'closed' or rates['BTC'] != Decimal('50000'):
+    print(f'✗ Successful probe did not close the circuit: {circuit}')
+    sys.exit(1)
+print('✓ Failed probe doubled the cooldown to 0.6s; next probe succeeded and closed the circuit')
+outage.stop()
+
+# Fallback file: atomic background writes, newest rates win, reads cached by mtime
+fallback_dir = os.path.join(tmp_dir, 'fallback')
+os.makedirs(fallback_dir)
+service = SlowRateService(0, fallback_file=os.path.join(fallback_dir, 'fallback_rates.json'))
+for i in range(200):
+    service._save_fallback_rates({'BTC': Decimal(60000 + i), 'ETH': Decimal('3000')})
+service.flush_fallback_rates()
+leftovers = [name for name in os.listdir(fallback_dir) if name.endswith('.tmp')]
+with open(service.fallback_file) as f:
+    saved = json.load(f)
+if saved['rates']['BTC'] != '60199' or leftovers:
+    print(f"✗ Fallback file holds {saved['rates']['BTC']}, temp files left: {leftovers}")
+    sys.exit(1)
+
+loaded = service._load_fallback_rates()
+if service._load_fallback_rates() is not loaded:
+    print('✗ Unchanged fallback file was parsed again')
+    sys.exit(1)
+service._save_fallback_rates({'BTC': Decimal('61000')})
+service.flush_fallback_rates()
+if service._load_fallback_rates()['BTC'] != Decimal('61000'):
+    print('✗ Changed fallback file was not re-read')
+    sys.exit(1)
+print('✓ 200 saves coalesced into atomic writes of the newest rates; reads re-parse only after a change')
+
+# Fixed point: USD cents to asset base units with one integer multiply and divide
+btc = UnitRate(get_asset('BTC'), Decimal('50000'))
+eth = UnitRate(get_asset('ETH'), Decimal('3000'))
+if btc.to_base_units(100000) != 2000000 or eth.to_base_units(100) != 333333333333333:
+    print(f'✗ $1000.00 -> {btc.to_base_units(100000)} sat, $1.00 -> {eth.to_base_units(100)} wei')
+    sys.exit(1)
+odd = UnitRate(get_asset('BTC'), Decimal('43210.987'))
+exact = Decimal(12345) / 100 / Decimal('43210.987') * 10 ** 8
+if odd.to_base_units(12345) != int(exact) or odd.to_cents(odd.to_base_units(12345)) > 12345:
+    print('✗ Conversion did not round down to whole base units')
+    sys.exit(1)
+if rescale(2000000, 8, 18) != 2 * 10 ** 16 or rescale(123456789, 8, 2) != 123 or to_units('0.029', 2) != 2:
+    print('✗ rescale()/to_units() did not round down exactly')
+    sys.exit(1)
+
+mixed = BalanceSet()
+segment = mixed.add_segment(1, 'mixed')
+for value in ('0.1', '0.2', '1000000.005', '7'):
+    mixed.add(segment, value, '$', 0, 1)
+if mixed.total_units(2) != 100000730 or mixed.total_units(3) != 1000007305:
+    print(f'✗ Mixed-scale total was {mixed.total_units(2)} cents')
+    sys.exit(1)
+
+snapshot = SlowRateService(0, fallback_file=fallback).get_snapshot()
+if set(snapshot.unit_rates) != {c for c, r in snapshot.rates.items() if r > 0}:
+    print('✗ Snapshot unit rates do not cover its rates')
+    sys.exit(1)
+start = time.perf_counter()
+for _ in range(10000):
+    btc.to_base_units(100000)
+int_ns = (time.perf_counter() - start) * 1e5
+price = Decimal('50000')
+start = time.perf_counter()
+for _ in range(10000):
+    int(Decimal(100000) / 100 / price * 10 ** 8)
+decimal_ns = (time.perf_counter() - start) * 1e5
+print(f'✓ $1000.00 at $50000 -> 2000000 sat exactly; {int_ns:.0f}ns per conversion (Decimal {decimal_ns:.0f}ns)')
+
+print('\n' + '=' * 60)
+print('Rate Cache Test: PASSED')
@@ -1,10 +1,27 @@
 #!/usr/bin/env python3
-"""Test script for rate service"""
+"""Test script for rate service
 
+Runs against the local stub price server; set RATE_LIVE_TEST=1 to query the
+live price APIs instead.
+"""
+
+import os
 import sys
+import tempfile
 sys.path.insert(0, 'src')
 
-from src.rate_service import rate_service
+LIVE = os.getenv('RATE_LIVE_TEST') == '1'
+
+if LIVE:
+    from src.rate_service import rate_service
+    fallback_path = 'data/fallback_rates.json'
+else:
+    from src.rate_service import RateService
+    from src.stub_price_server import StubPriceServer
+    stub = StubPriceServer(latency=0.05, volatility=0.001, seed=1).start()
+    fallback_path = os.path.join(tempfile.mkdtemp(), 'fallback_rates.json')
+    rate_service = RateService(fallback_file=fallback_path,
+                               providers=stub.make_providers(['coingecko', 'coinbase', 'cryptocompare']))
 
 print('Testing Rate Service...')
 print('=' * 60)
@@ -13,14 +30,14 @@ print('=' * 60)
 rates = rate_service.get_rates()
 
 if rates:
-    print('✓ Successfully fetched rates from CoinGecko API')
+    source = rate_service.get_stats()['providers']['last_source']
+    print(f"✓ Successfully fetched rates from {source} ({'live' if LIVE else 'stub'})")
     print(f'\nCurrent Crypto Rates (USD):')
     for currency, rate in rates.items():
         print(f'  {currency}: ${float(rate):,.2f}')
 
     # Check fallback file
-    import os
-    fallback_path = 'data/fallback_rates.json'
+    rate_service.flush_fallback_rates()
     if os.path.exists(fallback_path):
         print(f'\n✓ Fallback rates saved to: {fallback_path}')
     else: